@@ -1,17 +1,34 @@
 # -*- coding: utf-8 -*-
 
+import copy
+from datetime import datetime, timedelta, timezone
 from uuid import uuid4
 from wasabi import msg
-import pandas as pd
 from refinery import authentication, api_calls, settings, exceptions, util
-from typing import List, Optional, Dict, Any
+from refinery.instrumentation import NOOP, Instrumentation
+from typing import (
+    TYPE_CHECKING,
+    Callable,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Dict,
+    Any,
+    Tuple,
+    Union,
+)
 import json
 import os.path
-from tqdm import tqdm
-import spacy
 import time
 from refinery import settings
 
+# pandas and spaCy are imported on first use, so that `import refinery` and `rsdk` start fast
+if TYPE_CHECKING:
+    import pandas as pd
+    import requests
+    from refinery.associations import AssociationWriter
+
 
 class Client:
     """Client object which can be used to directly address the Kern AI refinery API.
@@ -21,18 +38,47 @@ class Client:
         password (str): The respective password. Do not share this!
         project_id (str): The link to your project. This can be found in the URL in an active project.
         uri (str, optional): Link to the host of the application. Defaults to "https://app.kern.ai".
+        retry_policy (Optional[api_calls.RetryPolicy], optional): Policy for retrying transient errors. Defaults to None; in that case, the default `api_calls.RetryPolicy()` is used. Pass `api_calls.NO_RETRY` to disable retries.
+        use_token_cache (bool, optional): If True, session tokens are cached on disk and reused by other processes of the same user. Defaults to True.
+        instrumentation (Optional[instrumentation.Instrumentation], optional): Hooks receiving request metrics and stage timings, e.g. `instrumentation.MetricsCollector()`. Defaults to None; in that case, nothing is measured.
+        http_session (Optional[requests.Session], optional): Session to share a connection pool between clients, see `api_calls.create_http_session`. Defaults to None; in that case, the client creates its own.
+        record_cache_size (int, optional): Number of records fetched by `get_records` that are kept in memory. Defaults to 10000.
 
     Raises:
         exceptions.get_api_exception_class: If your credentials are incorrect, an exception is raised.
     """
 
     def __init__(
-        self, user_name: str, password: str, project_id: str, uri=settings.DEFAULT_URI
+        self,
+        user_name: str,
+        password: str,
+        project_id: str,
+        uri=settings.DEFAULT_URI,
+        retry_policy: Optional[api_calls.RetryPolicy] = None,
+        use_token_cache: bool = True,
+        instrumentation: Optional[Instrumentation] = None,
+        http_session: Optional["requests.Session"] = None,
+        record_cache_size: int = settings.RECORD_CACHE_SIZE_DEFAULT,
     ):
+        if retry_policy is None:
+            retry_policy = api_calls.RetryPolicy()
+        self.retry_policy = retry_policy
+        if instrumentation is None:
+            instrumentation = NOOP
+        self.instrumentation = instrumentation
+        if http_session is None:
+            http_session = api_calls.create_http_session()
+        self.http_session = http_session
+        self.record_cache = util.LRUCache(record_cache_size)
         msg.info(f"Connecting to {uri}")
-        settings.set_base_uri(uri)
-        self.session_token = authentication.create_session_token(
-            user_name=user_name, password=password
+        self.uri = uri
+        settings.BASE_URI = uri
+        self.token_manager = authentication.TokenManager(
+            user_name=user_name,
+            password=password,
+            uri=uri,
+            use_cache=use_token_cache,
+            http_session=http_session,
         )
         if self.session_token is not None:
             msg.good("Logged in to system.")
@@ -44,12 +90,15 @@ class Client:
         self.get_project_details()
 
     @classmethod
-    def from_secrets_file(cls, path_to_file: str, project_id: Optional[str] = None):
+    def from_secrets_file(
+        cls, path_to_file: str, project_id: Optional[str] = None, **kwargs
+    ):
         """Creates a Client object from a secrets file.
 
         Args:
             path_to_file (str): Path to the secrets file.
             project_id (Optional[str], optional): The link to your project. This can be found in the URL in an active project. Defaults to None. In that case, it will read the project id from the file
+            **kwargs: Further arguments passed to the constructor, e.g. `retry_policy`.
 
         Returns:
             refinery.Client: Client object.
@@ -69,20 +118,36 @@ class Client:
             password=content["password"],
             project_id=project_id,
             uri=uri,
+            **kwargs,
         )
 
+    def for_project(self, project_id: str) -> "Client":
+        """Creates a client for another project of the same host, reusing the login and connection pool.
+
+        Args:
+            project_id (str): The link to the other project.
+
+        Returns:
+            refinery.Client: Client object for the other project.
+        """
+        client = copy.copy(self)
+        client.project_id = project_id
+        client.get_project_details()
+        return client
+
+    @property
+    def session_token(self) -> Optional[str]:
+        """Current session token; it is refreshed automatically shortly before it expires."""
+        return self.token_manager.get_token()
+
     def get_project_details(self) -> Dict[str, str]:
         """Collect high-level information about your project: name, description, and tokenizer
 
         Returns:
             Dict[str, str]: dictionary containing the above information
         """
-        url = settings.get_project_url(self.project_id)
-        api_response = api_calls.get_request(
-            url,
-            self.session_token,
-            self.project_id,
-        )
+        url = settings.get_project_url(self.uri, self.project_id)
+        api_response = self.__get_request(url)
         return api_response
 
     def get_primary_keys(self) -> List[str]:
@@ -100,6 +165,78 @@ class Client:
                 primary_keys.append(attribute["name"])
         return primary_keys
 
+    def get_records(
+        self,
+        keys: List[Dict[str, Any]],
+        attributes: Optional[List[str]] = None,
+        use_cache: bool = True,
+    ) -> List[Optional[Dict[str, Any]]]:
+        """Fetches specific records by their primary keys, without exporting the whole project.
+
+        Keys are requested in concurrent batches; fetched records are kept in an LRU
+        cache of the client, which `client.record_cache.clear()` empties.
+
+        Args:
+            keys (List[Dict[str, Any]]): Primary key values of the records, e.g. the indices passed to a callback.
+            attributes (Optional[List[str]], optional): If set, only these columns are fetched; primary keys are always included. Defaults to None.
+            use_cache (bool, optional): If False, all records are fetched from the server. Defaults to True.
+
+        Raises:
+            exceptions.PrimaryKeyError: If a key doesn't contain all primary keys.
+
+        Returns:
+            List[Optional[Dict[str, Any]]]: The records in the order of `keys`; None for keys that don't exist.
+        """
+        from concurrent.futures import ThreadPoolExecutor
+
+        primary_keys = self.get_primary_keys()
+        if attributes is not None:
+            attributes = primary_keys + [
+                name for name in attributes if name not in primary_keys
+            ]
+        cache_attributes = tuple(attributes) if attributes is not None else None
+
+        def get_cache_key(record_key: str) -> Tuple[str, str, Optional[Tuple]]:
+            return self.project_id, record_key, cache_attributes
+
+        records = {}
+        missing_keys = {}
+        for key in keys:
+            if not all(name in key for name in primary_keys):
+                raise exceptions.PrimaryKeyError(
+                    f"Each key must contain the primary keys {primary_keys}."
+                )
+            record_key = util.build_record_key(key, primary_keys)
+            record = (
+                self.record_cache.get(get_cache_key(record_key)) if use_cache else None
+            )
+            if record is not None:
+                records[record_key] = record
+            else:
+                missing_keys[record_key] = {name: key[name] for name in primary_keys}
+
+        url = settings.get_records_url(self.uri, self.project_id)
+        missing_keys = list(missing_keys.values())
+        key_batches = list(
+            util.batch(missing_keys, settings.RECORDS_BATCH_SIZE_DEFAULT)
+        )
+        if key_batches:
+            with ThreadPoolExecutor(
+                max_workers=min(settings.MAX_CONCURRENCY_DEFAULT, len(key_batches))
+            ) as executor:
+                responses = executor.map(
+                    lambda key_batch: self.__post_request(
+                        url, {"keys": key_batch, "attributes": attributes}
+                    ),
+                    key_batches,
+                )
+                for response in responses:
+                    for record in response:
+                        record_key = util.build_record_key(record, primary_keys)
+                        records[record_key] = record
+                        self.record_cache.put(get_cache_key(record_key), record)
+        return [records.get(util.build_record_key(key, primary_keys)) for key in keys]
+
     def get_lookup_list(self, list_id: str) -> Dict[str, str]:
         """Fetches a lookup list of your current project.
 
@@ -109,12 +246,8 @@ class Client:
         Returns:
             Dict[str, str]: Containing the specified lookup list of your project.
         """
-        url = settings.get_lookup_list_url(self.project_id, list_id)
-        api_response = api_calls.get_request(
-            url,
-            self.session_token,
-            self.project_id,
-        )
+        url = settings.get_lookup_list_url(self.uri, self.project_id, list_id)
+        api_response = self.__get_request(url)
         return api_response
 
     def get_lookup_lists(self) -> List[Dict[str, str]]:
@@ -136,60 +269,352 @@ class Client:
         tokenize: Optional[bool] = True,
         keep_attributes: Optional[List[str]] = None,
         dropna: Optional[bool] = False,
-    ) -> pd.DataFrame:
+        optimize_memory: Optional[bool] = False,
+        sample_size: Optional[int] = None,
+        seed: Optional[int] = None,
+        stratify_by: Optional[str] = None,
+    ) -> "pd.DataFrame":
         """Collects the export data of your project (i.e. the same data if you would export in the web app).
 
+        With `sample_size`, a random sample is drawn on the server. If your refinery version
+        doesn't support sampling yet, the export is streamed in partitions through a local
+        reservoir sampler instead, so only the sample is kept in memory.
+
         Args:
             num_samples (Optional[int], optional): If set, only the first `num_samples` records are collected. Defaults to None.
+            download_to (Optional[str], optional): If set, the export is stored as JSON to this path. Defaults to None.
+            tokenize (Optional[bool], optional): If True, TEXT attributes are tokenized with the spaCy tokenizer of the project. Defaults to True.
+            keep_attributes (Optional[List[str]], optional): If set, only these columns are requested from the server and returned. Defaults to None.
+            dropna (Optional[bool], optional): If True, the server is asked to leave out records with null values in the requested columns. Defaults to False.
+            optimize_memory (Optional[bool], optional): If True, columns are converted to memory-efficient dtypes (categorical labels, Arrow-backed strings, downcast numbers). Defaults to False.
+            sample_size (Optional[int], optional): If set, a random sample of this many records is collected; `num_samples` is ignored then. Defaults to None.
+            seed (Optional[int], optional): Seed of the random sample. Defaults to None.
+            stratify_by (Optional[str], optional): If set, the sample keeps the distribution of the values of this column, e.g. a label column. Defaults to None.
 
         Returns:
             pd.DataFrame: DataFrame containing your record data.
         """
-        url = settings.get_export_url(self.project_id)
-        api_response = api_calls.get_request(
-            url, self.session_token, self.project_id, **{"num_samples": num_samples}
+        from refinery import export
+
+        url = settings.get_export_url(self.uri, self.project_id)
+        if sample_size is not None:
+            api_response = self.__get_sampled_export(
+                keep_attributes, dropna, sample_size, seed, stratify_by
+            )
+        else:
+            query_params = export.build_export_query_params(keep_attributes, dropna)
+            with self.instrumentation.stage("export.request"):
+                api_response = self.__get_request(
+                    url, num_samples=num_samples, **query_params
+                )
+        return export.build_export_df(
+            api_response,
+            self.get_project_details(),
+            tokenize=tokenize,
+            keep_attributes=keep_attributes,
+            dropna=dropna,
+            download_to=download_to,
+            instrumentation=self.instrumentation,
+            optimize_memory=optimize_memory,
         )
-        df = pd.DataFrame(api_response)
 
-        if tokenize:
-            tokenize_attributes = []
-            for attribute in self.get_project_details()["attributes"]:
-                if attribute["data_type"] == "TEXT":
-                    tokenize_attributes.append(attribute["name"])
+    def __get_sampled_export(
+        self,
+        keep_attributes: Optional[List[str]],
+        dropna: Optional[bool],
+        sample_size: int,
+        seed: Optional[int],
+        stratify_by: Optional[str],
+    ) -> List[Dict[str, Any]]:
+        from refinery import export
+
+        url = settings.get_export_url(self.uri, self.project_id)
+        if (
+            stratify_by is not None
+            and keep_attributes is not None
+            and stratify_by not in keep_attributes
+        ):
+            keep_attributes = keep_attributes + [stratify_by]
+        query_params = export.build_export_query_params(
+            keep_attributes, dropna, sample_size, seed, stratify_by
+        )
+        # servers that ignore the sampling return more than `sample_size` records
+        with self.instrumentation.stage("export.request", sample_size=sample_size):
+            records = self.__get_request(
+                url, num_samples=sample_size + 1, **query_params
+            )
+        if len(records) <= sample_size:
+            return records
+
+        query_params = export.build_export_query_params(keep_attributes, dropna)
+        sampler = export.ReservoirSampler(sample_size, seed, stratify_by)
+        with self.instrumentation.stage("export.sample", sample_size=sample_size):
+            try:
+                for _, partition in self.__iter_export_partitions(
+                    settings.MAX_CONCURRENCY_DEFAULT,
+                    settings.EXPORT_PARTITION_SIZE_DEFAULT,
+                    lambda idx, records: records,
+                    query_params,
+                ):
+                    sampler.add(partition)
+            except exceptions.UnsupportedServerFeatureError:
+                sampler = export.ReservoirSampler(sample_size, seed, stratify_by)
+                sampler.add(self.__get_request(url, **query_params))
+        return sampler.sample()
+
+    def get_record_export_parallel(
+        self,
+        num_workers: int = settings.MAX_CONCURRENCY_DEFAULT,
+        partition_size: int = settings.EXPORT_PARTITION_SIZE_DEFAULT,
+        download_to: Optional[str] = None,
+        tokenize: Optional[bool] = True,
+        keep_attributes: Optional[List[str]] = None,
+        dropna: Optional[bool] = False,
+        optimize_memory: Optional[bool] = False,
+    ) -> "pd.DataFrame":
+        """Collects the export data of your project in concurrent requests of `partition_size` records each.
 
-            if len(tokenize_attributes) > 0:
-                tokenizer_package = self.get_project_details()["tokenizer"]
-                if not spacy.util.is_package(tokenizer_package):
-                    spacy.cli.download(tokenizer_package)
+        The partitions are fetched and decoded by up to `num_workers` threads at a time and
+        concatenated in the order of the records, so the result equals `get_record_export`.
 
-                nlp = spacy.load(tokenizer_package)
+        Args:
+            num_workers (int, optional): Number of partitions requested at the same time. Defaults to 8.
+            partition_size (int, optional): Number of records per request. Defaults to 10000.
+            download_to (Optional[str], optional): If set, the export is stored as JSON to this path. Defaults to None.
+            tokenize (Optional[bool], optional): If True, TEXT attributes are tokenized with the spaCy tokenizer of the project. Defaults to True.
+            keep_attributes (Optional[List[str]], optional): If set, only these columns are requested from the server and returned. Defaults to None.
+            dropna (Optional[bool], optional): If True, the server is asked to leave out records with null values in the requested columns. Defaults to False.
+            optimize_memory (Optional[bool], optional): If True, columns are converted to memory-efficient dtypes. Defaults to False.
 
-                msg.info(f"Tokenizing data with spaCy '{tokenizer_package}'.")
-                msg.info(
-                    "This will be provided from the server in future versions of refinery."
-                )
+        Returns:
+            pd.DataFrame: DataFrame containing your record data.
+        """
+        from refinery import export
+
+        query_params = export.build_export_query_params(keep_attributes, dropna)
+        api_response = []
+        for _, records in self.__iter_export_partitions(
+            num_workers, partition_size, lambda idx, records: records, query_params
+        ):
+            api_response.extend(records)
+        return export.build_export_df(
+            api_response,
+            self.get_project_details(),
+            tokenize=tokenize,
+            keep_attributes=keep_attributes,
+            dropna=dropna,
+            download_to=download_to,
+            instrumentation=self.instrumentation,
+            optimize_memory=optimize_memory,
+        )
 
-                tqdm.pandas(desc="Applying tokenization locally")
-                for attribute in tokenize_attributes:
-                    df[f"{attribute}__tokenized"] = df[attribute].progress_apply(
-                        lambda x: nlp(x)
-                    )
+    def write_record_export_partitions(
+        self,
+        dir_name: str,
+        num_workers: int = settings.MAX_CONCURRENCY_DEFAULT,
+        partition_size: int = settings.EXPORT_PARTITION_SIZE_DEFAULT,
+        keep_attributes: Optional[List[str]] = None,
+        dropna: Optional[bool] = False,
+    ) -> List[str]:
+        """Writes the export data of your project to a partitioned Parquet dataset, one file per partition.
 
-            else:
-                msg.warn(
-                    "There are no attributes that can be tokenized in this project."
+        Each worker fetches, decodes and writes its partition; files are named
+        `part-00000.parquet`, `part-00001.parquet`, ... in the order of the records.
+        Requires `pyarrow` (or `fastparquet`).
+
+        Args:
+            dir_name (str): Directory of the dataset; it is created if it doesn't exist.
+            num_workers (int, optional): Number of partitions processed at the same time. Defaults to 8.
+            partition_size (int, optional): Number of records per partition. Defaults to 10000.
+            keep_attributes (Optional[List[str]], optional): If set, only these columns are requested from the server. Defaults to None.
+            dropna (Optional[bool], optional): If True, the server is asked to leave out records with null values in the requested columns. Defaults to False.
+
+        Returns:
+            List[str]: Paths of the written files.
+        """
+        import pandas as pd
+        from refinery import export
+
+        os.makedirs(dir_name, exist_ok=True)
+
+        def write_partition(idx: int, records: List[Dict[str, Any]]) -> Optional[str]:
+            if not records:
+                return None
+            path = os.path.join(dir_name, f"part-{idx:05d}.parquet")
+            pd.DataFrame(records).to_parquet(path, index=False)
+            return path
+
+        query_params = export.build_export_query_params(keep_attributes, dropna)
+        paths = [
+            path
+            for _, path in self.__iter_export_partitions(
+                num_workers, partition_size, write_partition, query_params
+            )
+            if path is not None
+        ]
+        msg.good(f"Exported {len(paths)} partitions to {dir_name}")
+        return paths
+
+    def __iter_export_partitions(
+        self,
+        num_workers: int,
+        partition_size: int,
+        process_partition: Callable[[int, List[Dict[str, Any]]], Any],
+        query_params: Dict[str, Any],
+    ) -> Iterator[Tuple[int, Any]]:
+        from collections import deque
+        from concurrent.futures import ThreadPoolExecutor
+
+        url = settings.get_export_url(self.uri, self.project_id)
+
+        def fetch(idx: int) -> Tuple[int, Any, Optional[Dict[str, Any]]]:
+            offset = idx * partition_size
+            with self.instrumentation.stage("export.request", offset=offset):
+                records = self.__get_request(
+                    url, offset=offset, num_samples=partition_size, **query_params
                 )
+            first_record = records[0] if records else None
+            return len(records), process_partition(idx, records), first_record
+
+        with ThreadPoolExecutor(max_workers=num_workers) as executor:
+            # a sliding window keeps `num_workers` partitions in flight
+            pending = deque(executor.submit(fetch, idx) for idx in range(num_workers))
+            next_idx = num_workers
+            first_record = None
+            idx = 0
+            try:
+                while pending:
+                    num_records, result, partition_first_record = (
+                        pending.popleft().result()
+                    )
+                    if idx == 0:
+                        first_record = partition_first_record
+                    elif num_records > 0 and partition_first_record == first_record:
+                        raise exceptions.UnsupportedServerFeatureError(
+                            "The server ignores the `offset` of the export; use `get_record_export` instead."
+                        )
+                    yield num_records, result
+                    if num_records < partition_size:
+                        break
+                    pending.append(executor.submit(fetch, next_idx))
+                    next_idx += 1
+                    idx += 1
+            finally:
+                for future in pending:
+                    future.cancel()
+
+    def get_label_statistics(self) -> Dict[str, Dict[str, Any]]:
+        """Collects label counts per label task and source, and the agreement of manual and weakly supervised labels.
+
+        The counts are aggregated on the server, including labels of model callbacks. If
+        your refinery version doesn't support this yet, only the label columns are exported
+        and counted in a single pass; as the export doesn't contain labels of model
+        callbacks, only manual and weakly supervised labels are counted then.
 
-        if keep_attributes is not None:
-            df = df[keep_attributes]
+        Returns:
+            Dict[str, Dict[str, Any]]: For each label task, e.g. `{"MANUAL": {"positive": 12}, "WEAK_SUPERVISION": {...}, "agreement": {"compared": 12, "agreed": 10, "rate": 0.83}}`.
+        """
+        from refinery import statistics
+
+        url = settings.get_label_statistics_url(self.uri, self.project_id)
+        try:
+            return self.__get_request(url)
+        except exceptions.NotFoundError:
+            pass
+
+        # the columns of a single record tell which label tasks exist
+        export_url = settings.get_export_url(self.uri, self.project_id)
+        sample = self.__get_request(export_url, num_samples=1)
+        label_columns = statistics.get_label_columns(sample[0] if sample else [])
+        if not label_columns:
+            return {}
+        columns = [
+            column for columns in label_columns.values() for column in columns.values()
+        ]
+        with self.instrumentation.stage("export.request"):
+            records = self.__get_request(export_url, attributes=columns)
+        with self.instrumentation.stage("statistics.labels", num_records=len(records)):
+            return statistics.compute_label_statistics(records, label_columns)
+
+    def get_record_export_delta(
+        self, watermark: Optional[str] = None
+    ) -> Tuple[List[Dict[str, Any]], str]:
+        """Collects the records (including their labels) which were created or changed since a watermark.
+
+        The next watermark is the latest `updated_at` of the received records, as set by the
+        server; if the records don't carry it, the local clock is used. In both cases, it is
+        moved back by a safety margin, so that clock skew and changes committed after their
+        timestamp aren't missed. Records in the overlap are received again.
 
-        if dropna:
-            df = df.dropna()
+        Args:
+            watermark (Optional[str], optional): Watermark returned by a previous call. Defaults to None; in that case, all records are collected.
 
-        if download_to is not None:
-            df.to_json(download_to, orient="records")
-            msg.good(f"Downloaded export to {download_to}")
-        return df
+        Returns:
+            Tuple[List[Dict[str, Any]], str]: The changed records as returned by the export endpoint, and the watermark for the next call.
+        """
+        # taken before the request, so changes during the export are collected again next time
+        requested_at = datetime.now(timezone.utc)
+        url = settings.get_export_url(self.uri, self.project_id)
+        with self.instrumentation.stage("export.request"):
+            records = self.__get_request(url, updated_since=watermark)
+        return records, self.__next_watermark(records, watermark, requested_at)
+
+    @staticmethod
+    def __next_watermark(
+        records: List[Dict[str, Any]],
+        watermark: Optional[str],
+        requested_at: datetime,
+    ) -> str:
+        def parse(timestamp: str) -> datetime:
+            parsed = datetime.fromisoformat(timestamp.replace("Z", "+00:00"))
+            if parsed.tzinfo is None:
+                parsed = parsed.replace(tzinfo=timezone.utc)
+            return parsed
+
+        updated_at = [
+            parse(record[settings.UPDATED_AT_FIELD])
+            for record in records
+            if record.get(settings.UPDATED_AT_FIELD) is not None
+        ]
+        if updated_at:
+            latest = max(updated_at)
+        elif watermark is not None and not records:
+            # nothing changed on the server, so the watermark stays
+            return watermark
+        else:
+            latest = requested_at
+        next_watermark = latest - timedelta(seconds=settings.WATERMARK_SAFETY_MARGIN)
+        if watermark is not None:
+            next_watermark = max(next_watermark, parse(watermark))
+        return next_watermark.isoformat()
+
+    def sync_snapshot(self, path: str) -> Dict[str, int]:
+        """Updates a local snapshot of the project with the records changed since its last sync.
+
+        The snapshot is a SQLite file keyed on the primary keys of the project, see `refinery.snapshot.Snapshot`;
+        projects without primary keys are keyed on the `running_id` of the records.
+        Deleted records are not removed from the snapshot.
+
+        Args:
+            path (str): Path of the snapshot file; it is created on the first sync.
+
+        Returns:
+            Dict[str, int]: Number of `received`, `changed` and `unchanged` records.
+        """
+        from refinery.snapshot import Snapshot
+
+        with Snapshot(path) as snapshot:
+            records, watermark = self.get_record_export_delta(snapshot.watermark)
+            with self.instrumentation.stage("snapshot.merge", num_records=len(records)):
+                stats = snapshot.merge(
+                    records,
+                    self.get_primary_keys() or [settings.RUNNING_ID_ATTRIBUTE],
+                )
+            snapshot.watermark = watermark
+        msg.good(
+            f"Synced snapshot {path}: {stats['changed']} of {stats['received']} received records changed."
+        )
+        return stats
 
     def post_associations(
         self,
@@ -208,8 +633,8 @@ class Client:
             label_task_name (str): Name of the label task.
             source_type (Optional[str], optional): Source type of the associations. Defaults to "heuristic".
         """
-        url = settings.get_associations_url(self.project_id)
-        api_response = api_calls.post_request(
+        url = settings.get_associations_url(self.uri, self.project_id)
+        api_response = self.__post_request(
             url,
             {
                 "associations": associations,
@@ -218,94 +643,233 @@ class Client:
                 "label_task_name": label_task_name,
                 "source_type": source_type,
             },
-            self.session_token,
-            self.project_id,
         )
         return api_response
 
-    def post_records(self, records: List[Dict[str, Any]]):
+    def association_writer(self, **kwargs) -> "AssociationWriter":
+        """Creates a writer that coalesces associations of many models and label tasks into large requests.
+
+        Args:
+            **kwargs: Thresholds of the writer, see `refinery.associations.AssociationWriter`.
+
+        Returns:
+            AssociationWriter: the writer; use it as a context manager so it is flushed on exit.
+        """
+        from refinery.associations import AssociationWriter
+
+        return AssociationWriter(self, **kwargs)
+
+    def validate_records(
+        self, records: Union[List[Dict[str, Any]], "pd.DataFrame"]
+    ) -> int:
+        """Checks records against the attributes of your project without uploading them.
+
+        Unknown columns, values not matching the `data_type` of their attribute and missing,
+        null or duplicated primary keys are reported at once.
+
+        Args:
+            records (Union[List[Dict[str, Any]], pd.DataFrame]): Records or DataFrame to check.
+
+        Raises:
+            SchemaValidationError: Containing all problems, if the records are invalid.
+
+        Returns:
+            int: Number of validated records.
+        """
+        from refinery import validation
+
+        if not isinstance(records, list):
+            return validation.validate_records([records], self.get_project_details())
+        return validation.validate_records(
+            util.batch(records, settings.VALIDATION_BATCH_SIZE_DEFAULT),
+            self.get_project_details(),
+        )
+
+    def validate_file_records(self, path: str) -> int:
+        """Checks the records of a JSON Lines, CSV or Parquet file against the attributes of your project in a single streaming pass, see `validate_records`.
+
+        Args:
+            path (str): Path to the file to check.
+
+        Raises:
+            FileImportError: If the file doesn't exist or its type is not supported.
+            SchemaValidationError: Containing all problems, if the records are invalid.
+
+        Returns:
+            int: Number of validated records.
+        """
+        from refinery import file_import, validation
+
+        if not os.path.exists(path):
+            raise exceptions.FileImportError(
+                f"Given filepath is not valid. Path: {path}"
+            )
+        project_details = self.get_project_details()
+        with self.instrumentation.stage("import.validate"):
+            num_records = validation.validate_records(
+                file_import.iter_record_batches(
+                    path,
+                    settings.VALIDATION_BATCH_SIZE_DEFAULT,
+                    file_import.get_data_types(project_details),
+                ),
+                project_details,
+            )
+        msg.good(f"Validated {num_records} records of {path}.")
+        return num_records
+
+    def post_records(self, records: List[Dict[str, Any]], validate: bool = False):
         """Posts records to the server.
 
         Args:
             records (List[Dict[str, str]]): List of records to post.
+            validate (bool, optional): If True, the records are checked with `validate_records` before the first batch is sent. Defaults to False.
+
+        Raises:
+            SchemaValidationError: If `validate` is set and the records are invalid.
         """
+        if validate:
+            self.validate_records(records)
+        return self.__post_record_batches(
+            util.batch(records, settings.BATCH_SIZE_DEFAULT)
+        )
+
+    def post_file_records(
+        self,
+        path: str,
+        batch_size: int = settings.BATCH_SIZE_DEFAULT,
+        validate: bool = False,
+    ) -> List[Any]:
+        """Streams the records of a JSON Lines, CSV or Parquet file to the server with constant memory.
+
+        CSV values are converted to the `data_type` of their attribute, see `file_import.iter_record_batches`.
+
+        Args:
+            path (str): Path to the file to import.
+            batch_size (int, optional): Number of records read and sent at once. Defaults to 1000.
+            validate (bool, optional): If True, the file is checked with `validate_file_records` in a first pass before anything is sent. Defaults to False.
+
+        Raises:
+            FileImportError: If the file doesn't exist or its type is not supported.
+            SchemaValidationError: If `validate` is set and the records are invalid.
+
+        Returns:
+            List[Any]: Responses of the batches.
+        """
+        from refinery import file_import
+
+        if not os.path.exists(path):
+            raise exceptions.FileImportError(
+                f"Given filepath is not valid. Path: {path}"
+            )
+        if validate:
+            self.validate_file_records(path)
+        data_types = file_import.get_data_types(self.get_project_details())
+        batch_responses = self.__post_record_batches(
+            file_import.iter_record_batches(path, batch_size, data_types)
+        )
+        msg.good(f"Imported {path} in {len(batch_responses)} batches.")
+        return batch_responses
+
+    def __post_record_batches(
+        self, record_batches: Iterable[List[Dict[str, Any]]]
+    ) -> List[Any]:
         request_uuid = str(uuid4())
-        url = settings.get_import_json_url(self.project_id)
+        url = settings.get_import_json_url(self.uri, self.project_id)
 
         batch_responses = []
-        for records_batch in util.batch(records, settings.BATCH_SIZE_DEFAULT):
-            api_response = api_calls.post_request(
+        for idx, records_batch in enumerate(record_batches):
+            api_response = self.__post_request(
                 url,
                 {
                     "request_uuid": request_uuid,
                     "records": records_batch,
                     "is_last": False,
                 },
-                self.session_token,
-                self.project_id,
+                idempotency_key=f"{request_uuid}-{idx}",
             )
             batch_responses.append(api_response)
-            time.sleep(0.5)  # wait half a second to avoid server overload
-        api_calls.post_request(
+            time.sleep(settings.IMPORT_BATCH_DELAY)  # avoid server overload
+        self.__post_request(
             url,
             {"request_uuid": request_uuid, "records": [], "is_last": True},
-            self.session_token,
-            self.project_id,
+            idempotency_key=f"{request_uuid}-last",
         )
         return batch_responses
 
-    def post_df(self, df: pd.DataFrame):
+    def post_df(self, df: "pd.DataFrame", validate: bool = False):
         """Posts a DataFrame to the server.
 
         Args:
             df (pd.DataFrame): DataFrame to post.
+            validate (bool, optional): If True, the DataFrame is checked with `validate_records` before the first batch is sent. Defaults to False.
+
+        Raises:
+            SchemaValidationError: If `validate` is set and the records are invalid.
         """
+        if validate:
+            self.validate_records(df)
         records = df.to_dict(orient="records")
-        return self.post_records(records)
+        return self.post_records(records, validate=False)
 
     def post_file_import(
-        self, path: str, import_file_options: Optional[str] = ""
+        self,
+        path: str,
+        import_file_options: Optional[str] = "",
+        streaming: Optional[bool] = None,
+        validate: bool = False,
     ) -> bool:
         """Imports a file into your project.
 
         Args:
             path (str): Path to the file to import.
             import_file_options (Optional[str], optional): Options for the Pandas import. Defaults to None.
+            streaming (Optional[bool], optional): If True, the file is streamed to the JSON import (see `post_file_records`), if False, it is uploaded to object storage. Defaults to None; in that case, JSON Lines, CSV and Parquet files up to 50 MB without import options are streamed if the project has attributes already, so that the first import of a project is always parsed by the server.
+            validate (bool, optional): If True, JSON Lines, CSV and Parquet files without import options are checked with `validate_file_records` before the upload. As the server parses files uploaded to object storage itself, its types may differ from the checked ones. Defaults to False.
 
         Raises:
             FileImportError: If the file could not be imported, an exception is raised.
+            SchemaValidationError: If the file is validated and its records are invalid.
 
         Returns:
             bool: True if the file was imported successfully, False otherwise.
         """
+        from refinery import file_import
+
         if not os.path.exists(path):
             raise exceptions.FileImportError(
                 f"Given filepath is not valid. Path: {path}"
             )
+        if streaming is None:
+            streaming = file_import.should_stream(
+                path,
+                import_file_options,
+                file_import.get_data_types(self.get_project_details()),
+            )
+        if streaming:
+            self.post_file_records(path, validate=validate)
+            return True
+        # import options are only interpreted by the server
+        if validate and file_import.is_streamable(path) and not import_file_options:
+            self.validate_file_records(path)
+
         last_path_part = path.split("/")[-1]
         file_name = f"{last_path_part}_SCALE"
 
         FILE_TYPE = "records"
         # config
-        config_url = settings.get_base_config(self.project_id)
-        config_api_response = api_calls.get_request(
-            config_url,
-            self.session_token,
-            self.project_id,
-        )
+        config_url = settings.get_base_config(self.uri, self.project_id)
+        config_api_response = self.__get_request(config_url)
         endpoint = config_api_response.get("KERN_S3_ENDPOINT")
 
         # credentials
-        credentials_url = settings.get_import_file_url(self.project_id)
-        credentials_api_response = api_calls.post_request(
+        credentials_url = settings.get_import_file_url(self.uri, self.project_id)
+        credentials_api_response = self.__post_request(
             credentials_url,
             {
                 "file_name": file_name,
                 "file_type": FILE_TYPE,
                 "import_file_options": import_file_options,
             },
-            self.session_token,
-            self.project_id,
         )
         credentials = credentials_api_response["Credentials"]
         access_key = credentials["AccessKeyId"]
@@ -330,14 +894,16 @@ class Client:
                 if "/" in upload_task_id
                 else upload_task_id
             )
-            self.__monitor_task(upload_task_id)
+            return self.__monitor_task(upload_task_id)
 
         else:
             msg_text = f"Could not upload {path} to your project."
             msg.fail(msg_text)
             raise exceptions.FileImportError(msg_text)
 
-    def __monitor_task(self, upload_task_id: str) -> None:
+    def __monitor_task(self, upload_task_id: str) -> bool:
+        from tqdm import tqdm
+
         do_monitoring = True
         idx = 0
         last_progress = 0.0
@@ -371,11 +937,52 @@ class Client:
             msg.fail(
                 "Upload failed. Please look into the UI notification center for more details."
             )
+        return print_success_message
+
+    def __get_request(self, url: str, **query_params) -> Any:
+        return self.__with_token_refresh(
+            lambda session_token: api_calls.get_request(
+                url,
+                session_token,
+                self.project_id,
+                retry_policy=self.retry_policy,
+                instrumentation=self.instrumentation,
+                http_session=self.http_session,
+                **query_params,
+            )
+        )
+
+    def __post_request(
+        self, url: str, body: Dict[str, Any], idempotency_key: Optional[str] = None
+    ) -> Any:
+        if idempotency_key is None:
+            # keep the key stable if the request is repeated with a refreshed token
+            idempotency_key = str(uuid4())
+        return self.__with_token_refresh(
+            lambda session_token: api_calls.post_request(
+                url,
+                body,
+                session_token,
+                self.project_id,
+                retry_policy=self.retry_policy,
+                idempotency_key=idempotency_key,
+                instrumentation=self.instrumentation,
+                http_session=self.http_session,
+            )
+        )
+
+    def __with_token_refresh(self, request: Callable[[str], Any]) -> Any:
+        session_token = self.session_token
+        try:
+            return request(session_token)
+        except exceptions.UnauthorizedError:
+            refreshed_token = self.token_manager.refresh(session_token)
+            if refreshed_token is None or refreshed_token == session_token:
+                raise
+            return request(refreshed_token)
 
     def __get_task(self, upload_task_id: str) -> Dict[str, Any]:
-        api_response = api_calls.get_request(
-            settings.get_task(self.project_id, upload_task_id),
-            self.session_token,
-            self.project_id,
+        api_response = self.__get_request(
+            settings.get_task(self.uri, self.project_id, upload_task_id)
         )
         return api_response
@@ -1,9 +1,13 @@
+import hashlib
+import json
 import os
+from json.decoder import JSONDecodeError
 from wasabi import msg
-from typing import Any, List, Optional
+from typing import Any, Dict, List, Optional
 import pandas as pd
 import yaml
 from refinery import Client, exceptions
+from refinery.adapter.util import read_snapshot
 from collections import OrderedDict
 
 # https://stackoverflow.com/questions/8640959/how-can-i-control-what-scalar-form-pyyaml-uses-for-my-data
@@ -27,6 +31,7 @@ yaml.add_representer(OrderedDict, ordered_dict_presenter)
 CONSTANT_OUTSIDE = "OUTSIDE"
 CONSTANT_LABEL_BEGIN = "B-"
 CONSTANT_LABEL_INTERMEDIATE = "I-"
+MANIFEST_SUFFIX = ".manifest.json"
 
 
 def build_literal_from_iterable(iterable: List[Any]) -> str:
@@ -96,6 +101,59 @@ def inject_label_in_text(
     return string
 
 
+def hash_group(df_group: pd.DataFrame, columns: List[str]) -> str:
+    """Computes a content hash for a group of records, used to detect changed groups.
+
+    Args:
+        df_group (pd.DataFrame): records of one intent (and metadata) group
+        columns (List[str]): columns whose values determine the rendered examples
+
+    Returns:
+        str: hex digest of the group content
+    """
+    hasher = hashlib.sha256()
+    for values in df_group[columns].itertuples(index=False, name=None):
+        hasher.update(json.dumps(values, default=str, ensure_ascii=False).encode())
+    return hasher.hexdigest()
+
+
+def build_yaml_block(entry: OrderedDict) -> str:
+    """Renders a single entry of the `nlu` list to its yaml representation.
+
+    Args:
+        entry (OrderedDict): intent or lookup entry
+
+    Returns:
+        str: yaml block of the entry
+    """
+    return yaml.dump([entry], allow_unicode=True)
+
+
+def load_manifest(manifest_path: str, config: Dict[str, Any]) -> Dict[str, Any]:
+    """Loads the manifest of a previous build. If the build configuration changed, the manifest is discarded.
+
+    Args:
+        manifest_path (str): path to the manifest file
+        config (Dict[str, Any]): configuration of the current build
+
+    Returns:
+        Dict[str, Any]: manifest with cached `intents` and `lookups` blocks
+    """
+    empty_manifest = {"config": config, "intents": {}, "lookups": {}}
+    if not os.path.exists(manifest_path):
+        return empty_manifest
+    try:
+        with open(manifest_path, "r") as f:
+            manifest = json.load(f)
+    except (OSError, JSONDecodeError):
+        msg.warn(f"Could not read manifest {manifest_path}, rebuilding all groups.")
+        return empty_manifest
+    if manifest.get("config") != config:
+        msg.info("Build configuration changed, rebuilding all groups.")
+        return empty_manifest
+    return manifest
+
+
 def build_intent_yaml(
     client: Client,
     text_name: str,
@@ -106,6 +164,8 @@ def build_intent_yaml(
     file_name: str = "nlu.yml",
     constant_outside: str = CONSTANT_OUTSIDE,
     version: str = "3.1",
+    incremental: bool = False,
+    snapshot_path: Optional[str] = None,
 ) -> None:
     """builds a Rasa NLU yaml file from your project data via the client object.
 
@@ -119,29 +179,85 @@ def build_intent_yaml(
         file_name (str, optional): name of the file you want to store the data to. Defaults to "nlu.yml".
         constant_outside (str, optional): constant to be used for outside labels in token-level tasks. Defaults to CONSTANT_OUTSIDE.
         version (str, optional): Rasa version. Defaults to "3.1".
+        incremental (bool, optional): if True, a manifest with per-group content hashes is stored next to the file, and only groups whose records changed since the last build are rendered again. Defaults to False.
+        snapshot_path (Optional[str], optional): if set, a local snapshot at this path is synced and only the required columns are read from it instead of downloading the full export. Defaults to None.
 
     Raises:
         exceptions.UnknownItemError: if the item you are looking for is not found.
     """
     msg.info("Building training data for Rasa")
     msg.warn("If you haven't done so yet, please install rasa and run `rasa init`")
-    df = client.get_record_export(tokenize=(tokenized_label_task is not None))
+    attributes = [
+        text_name,
+        intent_label_task,
+        metadata_label_task,
+        tokenized_label_task,
+    ]
+    if snapshot_path is not None:
+        df = read_snapshot(
+            client,
+            snapshot_path,
+            [attribute for attribute in attributes if attribute is not None],
+            not_null=[intent_label_task],
+        )
+    else:
+        # only the groups that are rendered again are tokenized, see below
+        df = client.get_record_export(tokenize=False)
 
-    for attribute in [text_name, intent_label_task, metadata_label_task, tokenized_label_task]:
+    for attribute in attributes:
         if attribute is not None and attribute not in df.columns:
             raise exceptions.UnknownItemError(f"Can't find argument '{attribute}' in the existing export schema: {df.columns.tolist()}")
 
+    if dir_name is not None and not os.path.isdir(dir_name):
+        os.mkdir(dir_name)
+
+    file_path = os.path.join(dir_name, file_name)
+    manifest_path = f"{file_path}{MANIFEST_SUFFIX}"
+    config = OrderedDict(
+        version=version,
+        text_name=text_name,
+        intent_label_task=intent_label_task,
+        metadata_label_task=metadata_label_task,
+        tokenized_label_task=tokenized_label_task,
+        constant_outside=constant_outside,
+    )
+    if incremental:
+        manifest = load_manifest(manifest_path, config)
+    else:
+        manifest = {"config": config, "intents": {}, "lookups": {}}
+    cached_intents = manifest["intents"]
+    cached_lookups = manifest["lookups"]
+
+    hash_columns = [text_name]
     if tokenized_label_task is not None:
-        text_name_injected = f"{text_name}__injected"
-        df[text_name_injected] = df.apply(
-            lambda x: inject_label_in_text(
-                x, text_name, tokenized_label_task, constant_outside
-            ),
-            axis=1,
+        hash_columns.append(tokenized_label_task)
+
+    def tokenize_groups(df_groups: List[pd.DataFrame]) -> List[pd.DataFrame]:
+        # tokenizing is the most expensive step, so all groups are tokenized at once
+        from refinery import export
+
+        if tokenized_label_task is None or len(df_groups) == 0:
+            return df_groups
+        df_tokenized = export.tokenize_df(
+            pd.concat(df_groups),
+            client.get_project_details(),
+            keep_attributes=[f"{text_name}__tokenized"],
         )
-        text_name = text_name_injected
+        return [df_tokenized.loc[df_group.index] for df_group in df_groups]
+
+    def build_examples(df_group: pd.DataFrame) -> literal:
+        if tokenized_label_task is not None:
+            texts = df_group.apply(
+                lambda x: inject_label_in_text(
+                    x, text_name, tokenized_label_task, constant_outside
+                ),
+                axis=1,
+            ).tolist()
+        else:
+            texts = df_group[text_name].tolist()
+        return literal(build_literal_from_iterable(texts))
 
-    nlu_list = []
+    groups = []
     for label, df_sub_label in df.groupby(intent_label_task):
 
         if metadata_label_task is not None:
@@ -149,22 +265,46 @@ def build_intent_yaml(
             for metadata_label, df_sub_label_sub_metadata_label in df_sub_label.groupby(
                 metadata_label_task
             ):
-                literal_string = build_literal_from_iterable(
-                    df_sub_label_sub_metadata_label[text_name].tolist()
-                )
-                nlu_list.append(
-                    OrderedDict(
-                        intent=label,
-                        metadata=OrderedDict(**{metadata_label_name: metadata_label}),
-                        examples=literal(literal_string),
+                groups.append(
+                    (
+                        label,
+                        OrderedDict(**{metadata_label_name: metadata_label}),
+                        df_sub_label_sub_metadata_label,
                     )
                 )
         else:
-            literal_string = build_literal_from_iterable(
-                df_sub_label[text_name].tolist()
+            groups.append((label, None, df_sub_label))
+
+    intent_manifest = {}
+    changed_groups = []
+    for label, metadata, df_group in groups:
+        group_key = json.dumps([label, metadata], default=str, ensure_ascii=False)
+        # the hash covers the raw text and token labels, so it needs no tokenization
+        group_hash = hash_group(df_group, hash_columns)
+        cached_group = cached_intents.get(group_key)
+        if cached_group is not None and cached_group["hash"] == group_hash:
+            intent_manifest[group_key] = cached_group
+        else:
+            intent_manifest[group_key] = {"hash": group_hash, "block": None}
+            changed_groups.append((group_key, label, metadata, df_group))
+
+    df_changed_groups = tokenize_groups(
+        [df_group for _, _, _, df_group in changed_groups]
+    )
+    for (group_key, label, metadata, _), df_group in zip(
+        changed_groups, df_changed_groups
+    ):
+        if metadata is not None:
+            entry = OrderedDict(
+                intent=label, metadata=metadata, examples=build_examples(df_group)
             )
-            nlu_list.append(OrderedDict(intent=label, examples=literal(literal_string)))
+        else:
+            entry = OrderedDict(intent=label, examples=build_examples(df_group))
+        intent_manifest[group_key]["block"] = build_yaml_block(entry)
+    num_rebuilt = len(changed_groups)
+    nlu_blocks = [group["block"] for group in intent_manifest.values()]
 
+    lookup_manifest = {}
     if tokenized_label_task is not None:
 
         def flatten(xss):
@@ -180,22 +320,48 @@ def build_intent_yaml(
         for lookup_list in client.get_lookup_lists():
             if lookup_list["name"] in lookup_list_names:
                 values = [entry["value"] for entry in lookup_list["terms"]]
-                literal_string = build_literal_from_iterable(values)
-                nlu_list.append(
-                    OrderedDict(
-                        lookup=lookup_list["name"], examples=literal(literal_string)
+                lookup_hash = hashlib.sha256(
+                    json.dumps(values, ensure_ascii=False).encode()
+                ).hexdigest()
+                cached_lookup = cached_lookups.get(lookup_list["name"])
+                if cached_lookup is not None and cached_lookup["hash"] == lookup_hash:
+                    block = cached_lookup["block"]
+                else:
+                    literal_string = build_literal_from_iterable(values)
+                    block = build_yaml_block(
+                        OrderedDict(
+                            lookup=lookup_list["name"], examples=literal(literal_string)
+                        )
                     )
-                )
-
-    nlu_dict = OrderedDict(version=version, nlu=nlu_list)
-
-    if dir_name is not None and not os.path.isdir(dir_name):
-        os.mkdir(dir_name)
-
-    file_path = os.path.join(dir_name, file_name)
+                    num_rebuilt += 1
+                lookup_manifest[lookup_list["name"]] = {
+                    "hash": lookup_hash,
+                    "block": block,
+                }
+                nlu_blocks.append(block)
+
+    nlu_yaml = yaml.dump(OrderedDict(version=version), allow_unicode=True)
+    nlu_yaml += "nlu:\n" + "".join(nlu_blocks)
+
+    if incremental:
+        msg.info(
+            f"Rebuilt {num_rebuilt} of {len(intent_manifest) + len(lookup_manifest)} groups."
+        )
+        with open(manifest_path, "w") as f:
+            json.dump(
+                {"config": config, "intents": intent_manifest, "lookups": lookup_manifest},
+                f,
+                ensure_ascii=False,
+            )
+        if num_rebuilt == 0 and os.path.exists(file_path) and (
+            len(intent_manifest) == len(cached_intents)
+            and len(lookup_manifest) == len(cached_lookups)
+        ):
+            msg.good(f"Training data in {file_path} is up to date.")
+            return
 
     with open(file_path, "w") as f:
-        yaml.dump(nlu_dict, f, allow_unicode=True)
+        f.write(nlu_yaml)
         msg.good(f"Saved training data to {file_path}! 🚀")
         msg.warn(
             f"Please make sure to add the project-specific files domain.yml, {os.path.join(dir_name, 'rules.yml')} and {os.path.join(dir_name, 'stories.yml')}."
@@ -1,8 +1,49 @@
-from typing import Any, Dict, Optional
+import os
+from typing import Any, Dict, List, Optional
+import numpy as np
 from embedders.classification.contextual import TransformerSentenceEmbedder
 from refinery import Client
 from refinery.adapter.util import split_train_test_on_weak_supervision
 
+HASHING_FEATURES_DEFAULT = 2**18
+HASHING_CHUNK_SIZE = 10000
+
+
+def hash_texts(
+    texts: List[str],
+    n_features: int = HASHING_FEATURES_DEFAULT,
+    n_jobs: Optional[int] = None,
+):
+    """Featurizes texts with a hashing vectorizer; it needs no fitting, so chunks are vectorized in parallel.
+
+    Args:
+        texts (List[str]): Texts to featurize.
+        n_features (int, optional): Number of features (hash buckets). Defaults to 2**18.
+        n_jobs (Optional[int], optional): Number of processes. Defaults to None; in that case, the number of CPUs is used.
+
+    Returns:
+        scipy.sparse.csr_matrix: float32 matrix with one row per text.
+    """
+    import scipy.sparse
+    from joblib import Parallel, delayed
+    from sklearn.feature_extraction.text import HashingVectorizer
+
+    vectorizer = HashingVectorizer(
+        n_features=n_features, alternate_sign=False, dtype=np.float32
+    )
+    chunks = [
+        texts[idx : idx + HASHING_CHUNK_SIZE]
+        for idx in range(0, len(texts), HASHING_CHUNK_SIZE)
+    ]
+    if len(chunks) <= 1:
+        return vectorizer.transform(texts).tocsr()
+    if n_jobs is None:
+        n_jobs = os.cpu_count() or 1
+    matrices = Parallel(n_jobs=n_jobs)(
+        delayed(vectorizer.transform)(chunk) for chunk in chunks
+    )
+    return scipy.sparse.vstack(matrices, format="csr")
+
 
 def build_classification_dataset(
     client: Client,
@@ -10,6 +51,11 @@ def build_classification_dataset(
     classification_label: str,
     config_string: Optional[str] = None,
     num_train: Optional[int] = None,
+    snapshot_path: Optional[str] = None,
+    sparse: bool = False,
+    n_features: int = HASHING_FEATURES_DEFAULT,
+    seed: Optional[int] = None,
+    n_jobs: Optional[int] = None,
 ) -> Dict[str, Dict[str, Any]]:
     """
     Builds a classification dataset from a refinery client and a config string.
@@ -18,21 +64,37 @@ def build_classification_dataset(
         client (Client): Refinery client
         sentence_input (str): Name of the column containing the sentence input.
         classification_label (str): Name of the label; if this is a task on the full record, enter the string with as "__<label>". Else, input it as "<attribute>__<label>".
-        config_string (Optional[str], optional): Config string for the TransformerSentenceEmbedder. Defaults to None; if None is provided, the text will not be embedded.
+        config_string (Optional[str], optional): Config string for the TransformerSentenceEmbedder; the embeddings are returned as a float32 array. Defaults to None; if None is provided, the text will not be embedded.
         num_train (Optional[int], optional): Number of training examples to use. Defaults to None; if None is provided, all examples will be used.
+        snapshot_path (Optional[str], optional): If set, the data is read from a local snapshot at this path, which is synced first. Defaults to None.
+        seed (Optional[int], optional): Seed of the train sample drawn for `num_train`. Defaults to None.
+        sparse (bool, optional): If True and no `config_string` is given, the texts are featurized with a hashing vectorizer into float32 CSR matrices. Defaults to False.
+        n_features (int, optional): Number of features of the hashing vectorizer. Defaults to 2**18.
+        n_jobs (Optional[int], optional): Number of processes of the hashing vectorizer. Defaults to None; in that case, the number of CPUs is used.
 
     Returns:
         Dict[str, Dict[str, Any]]: Containing the train and test datasets, with embedded inputs.
     """
 
     df_train, df_test, _, primary_keys = split_train_test_on_weak_supervision(
-        client, sentence_input, classification_label, num_train
+        client, sentence_input, classification_label, num_train, snapshot_path, seed
     )
 
+    if config_string is not None and sparse:
+        raise ValueError("Texts are either embedded or hashed, not both.")
+
     if config_string is not None:
         embedder = TransformerSentenceEmbedder(config_string)
-        inputs_train = embedder.transform(df_train[sentence_input].tolist())
-        inputs_test = embedder.transform(df_test[sentence_input].tolist())
+        # contiguous float32 arrays are compact and cheap to slice into batches
+        inputs_train = np.ascontiguousarray(
+            embedder.transform(df_train[sentence_input].tolist()), dtype=np.float32
+        )
+        inputs_test = np.ascontiguousarray(
+            embedder.transform(df_test[sentence_input].tolist()), dtype=np.float32
+        )
+    elif sparse:
+        inputs_train = hash_texts(df_train[sentence_input].tolist(), n_features, n_jobs)
+        inputs_test = hash_texts(df_test[sentence_input].tolist(), n_features, n_jobs)
     else:
         inputs_train = df_train[sentence_input].tolist()
         inputs_test = df_test[sentence_input].tolist()
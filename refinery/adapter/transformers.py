@@ -10,6 +10,8 @@ def build_classification_dataset(
     sentence_input: str,
     classification_label: str,
     num_train: Optional[int] = 100,
+    snapshot_path: Optional[str] = None,
+    seed: Optional[int] = None,
 ):
     """Build a classification dataset from a refinery client and a config string useable for HuggingFace finetuning.
 
@@ -17,6 +19,8 @@ def build_classification_dataset(
         client (Client): Refinery client
         sentence_input (str): Name of the column containing the sentence input.
         classification_label (str): Name of the label; if this is a task on the full record, enter the string with as "__<label>". Else, input it as "<attribute>__<label>".
+        snapshot_path (Optional[str], optional): If set, the data is read from a local snapshot at this path, which is synced first. Defaults to None.
+        seed (Optional[int], optional): Seed of the train sample drawn for `num_train`. Defaults to None.
 
     Returns:
         _type_: HuggingFace dataset
@@ -28,7 +32,7 @@ def build_classification_dataset(
         label_options,
         primary_keys,
     ) = split_train_test_on_weak_supervision(
-        client, sentence_input, classification_label, num_train
+        client, sentence_input, classification_label, num_train, snapshot_path, seed
     )
 
     mapping = {k: v for v, k in enumerate(label_options)}
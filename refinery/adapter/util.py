@@ -4,17 +4,25 @@ import pandas as pd
 
 
 def split_train_test_on_weak_supervision(
-    client: Client, _input: str, _label: str, num_train: Optional[int] = None
+    client: Client,
+    _input: str,
+    _label: str,
+    num_train: Optional[int] = None,
+    snapshot_path: Optional[str] = None,
+    seed: Optional[int] = None,
 ) -> Tuple[pd.DataFrame, pd.DataFrame, List[str]]:
     """
     Puts the data into a train (weakly supervised data) and test set (manually labeled data).
-    Overlapping data is removed from the train set.
+    Overlapping data is removed from the train set. With `num_train`, the train set is a random
+    sample stratified by the weakly supervised label.
 
     Args:
         client (Client): Refinery client
         _input (str): Name of the column containing the sentence input.
         _label (str): Name of the label; if this is a task on the full record, enter the string with as "__<label>". Else, input it as "<attribute>__<label>".
-        num_train (Optional[int], optional): Number of training examples to use. Defaults to None; if None is provided, all examples will be used.
+        num_train (Optional[int], optional): Number of training examples to sample. Defaults to None; if None is provided, all examples will be used.
+        snapshot_path (Optional[str], optional): If set, a local snapshot at this path is synced and queried instead of exporting the data twice. Defaults to None.
+        seed (Optional[int], optional): Seed of the train sample. Defaults to None.
 
     Returns:
         Tuple[pd.DataFrame, pd.DataFrame, List[str]]: Containing the train and test dataframes and the label name options.
@@ -25,6 +33,18 @@ def split_train_test_on_weak_supervision(
     label_attribute_train = f"{_label}__WEAK_SUPERVISION"
     label_attribute_test = f"{_label}__MANUAL"
 
+    if snapshot_path is not None:
+        return _split_snapshot_on_weak_supervision(
+            client,
+            snapshot_path,
+            primary_keys,
+            _input,
+            label_attribute_train,
+            label_attribute_test,
+            num_train,
+            seed,
+        )
+
     df_test = client.get_record_export(
         tokenize=False,
         keep_attributes=primary_keys + [_input, label_attribute_test],
@@ -32,19 +52,24 @@ def split_train_test_on_weak_supervision(
     ).rename(columns={label_attribute_test: "label"})
 
     if num_train is not None:
-        num_samples = num_train + len(df_test)
+        # the sample can't exclude the manually labeled records on the server, so it is
+        # drawn large enough to drop them and subsampled to `num_train` afterwards
+        sample_size = num_train + len(df_test)
     else:
-        num_samples = None
+        sample_size = None
 
     df_train = client.get_record_export(
         tokenize=False,
         keep_attributes=primary_keys + [_input, label_attribute_train],
         dropna=True,
-        num_samples=num_samples,
-    ).rename(columns={label_attribute_train: "label"})
-
-    # Remove overlapping data
-    df_train = df_train.drop(df_test.index.intersection(df_train.index))[:num_train]
+        sample_size=sample_size,
+        seed=seed,
+        stratify_by=label_attribute_train,
+    )
+    df_train = _drop_overlap(df_train, df_test, primary_keys)
+    df_train = _sample_df(df_train, num_train, seed, label_attribute_train).rename(
+        columns={label_attribute_train: "label"}
+    )
 
     label_options = list(
         set(df_test.label.unique().tolist() + df_train.label.unique().tolist())
@@ -56,3 +81,87 @@ def split_train_test_on_weak_supervision(
         label_options,
         primary_keys,
     )
+
+
+def read_snapshot(
+    client: Client,
+    snapshot_path: str,
+    columns: List[str],
+    not_null: Optional[List[str]] = None,
+    is_null: Optional[List[str]] = None,
+    sync: bool = True,
+) -> pd.DataFrame:
+    """
+    Syncs a local snapshot of the project and reads the given columns from it.
+
+    Args:
+        client (Client): Refinery client
+        snapshot_path (str): Path of the snapshot file.
+        columns (List[str]): Columns to read.
+        not_null (Optional[List[str]], optional): Columns that must have a value. Defaults to None.
+        is_null (Optional[List[str]], optional): Columns that must not have a value. Defaults to None.
+        sync (bool, optional): If False, the snapshot is read as it is, e.g. if it was just synced. Defaults to True.
+
+    Returns:
+        pd.DataFrame: The records.
+    """
+    from refinery.snapshot import Snapshot
+
+    if sync:
+        client.sync_snapshot(snapshot_path)
+    with Snapshot(snapshot_path) as snapshot:
+        return snapshot.select_df(columns, not_null=not_null, is_null=is_null)
+
+
+def _split_snapshot_on_weak_supervision(
+    client: Client,
+    snapshot_path: str,
+    primary_keys: List[str],
+    _input: str,
+    label_attribute_train: str,
+    label_attribute_test: str,
+    num_train: Optional[int],
+    seed: Optional[int],
+) -> Tuple[pd.DataFrame, pd.DataFrame, List[str]]:
+    df_test = read_snapshot(
+        client,
+        snapshot_path,
+        primary_keys + [_input, label_attribute_test],
+        not_null=[_input, label_attribute_test],
+    ).rename(columns={label_attribute_test: "label"})
+    # manually labeled records are only part of the test set
+    df_train = read_snapshot(
+        client,
+        snapshot_path,
+        primary_keys + [_input, label_attribute_train],
+        not_null=[_input, label_attribute_train],
+        is_null=[label_attribute_test],
+        sync=False,
+    )
+    df_train = _sample_df(df_train, num_train, seed, label_attribute_train).rename(
+        columns={label_attribute_train: "label"}
+    )
+
+    label_options = list(
+        set(df_test.label.unique().tolist() + df_train.label.unique().tolist())
+    )
+    return df_train, df_test, label_options, primary_keys
+
+
+def _drop_overlap(
+    df_train: pd.DataFrame, df_test: pd.DataFrame, primary_keys: List[str]
+) -> pd.DataFrame:
+    test_keys = pd.MultiIndex.from_frame(df_test[primary_keys])
+    is_test = pd.MultiIndex.from_frame(df_train[primary_keys]).isin(test_keys)
+    return df_train[~is_test]
+
+
+def _sample_df(
+    df: pd.DataFrame, num_samples: Optional[int], seed: Optional[int], stratify_by: str
+) -> pd.DataFrame:
+    from refinery.export import sample_records
+
+    if num_samples is None or len(df) <= num_samples:
+        return df.reset_index(drop=True)
+    records = sample_records(df.to_dict("records"), num_samples, seed, stratify_by)
+    return pd.DataFrame(records, columns=df.columns)
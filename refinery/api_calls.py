@@ -1,29 +1,229 @@
 # -*- coding: utf-8 -*-
 import json
+import random
+import time
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
 from json.decoder import JSONDecodeError
-import pkg_resources
-from refinery import exceptions
+from importlib.metadata import PackageNotFoundError, version as get_version
+from uuid import uuid4
+from refinery import exceptions, settings
+from refinery.instrumentation import Instrumentation, RequestEvent
 import requests
-from typing import Any, Dict
+from urllib3.exceptions import NewConnectionError
+from typing import Any, Callable, Dict, Iterable, Optional, Tuple
 
 try:
-    version = pkg_resources.get_distribution("refinery-python").version
-except pkg_resources.DistributionNotFound:
+    version = get_version("refinery-python-sdk")
+except PackageNotFoundError:
     version = "noversion"
 
 
+class RetryPolicy:
+    """Decides whether and when a failed request is sent again.
+
+    Args:
+        max_retries (int, optional): Maximum number of retries per request. Defaults to 5.
+        backoff_factor (float, optional): Base of the exponential backoff in seconds. Defaults to 0.5.
+        max_backoff (float, optional): Upper bound of a single wait in seconds. Defaults to 30.
+        max_elapsed_time (float, optional): No retry is started after this many seconds since the first attempt. Defaults to 120.
+        status_codes (Iterable[int], optional): Status codes that are considered transient. Defaults to 429, 500, 502, 503 and 504.
+        retry_on_connection_errors (bool, optional): If True, connection errors and timeouts are retried as well. Defaults to True.
+        respect_retry_after (bool, optional): If True, a `Retry-After` header of the server is honored. Defaults to True.
+        retry_posts (bool, optional): If True, POSTs are retried like GETs. This relies on the server dropping duplicates by the `idempotency-key` header. Defaults to False; in that case, POSTs are only retried if they provably weren't processed, i.e. on 429 and 503 responses and on errors while connecting. A 502 or 504 of a proxy may come after the server processed the request, so e.g. `post_records` fails on them unless this is set.
+    """
+
+    def __init__(
+        self,
+        max_retries: int = settings.RETRY_MAX_RETRIES_DEFAULT,
+        backoff_factor: float = settings.RETRY_BACKOFF_FACTOR_DEFAULT,
+        max_backoff: float = settings.RETRY_MAX_BACKOFF_DEFAULT,
+        max_elapsed_time: float = settings.RETRY_MAX_ELAPSED_TIME_DEFAULT,
+        status_codes: Iterable[int] = settings.RETRY_STATUS_CODES_DEFAULT,
+        retry_on_connection_errors: bool = True,
+        respect_retry_after: bool = True,
+        retry_posts: bool = False,
+    ):
+        self.max_retries = max_retries
+        self.backoff_factor = backoff_factor
+        self.max_backoff = max_backoff
+        self.max_elapsed_time = max_elapsed_time
+        self.status_codes = frozenset(status_codes)
+        self.retry_on_connection_errors = retry_on_connection_errors
+        self.respect_retry_after = respect_retry_after
+        self.retry_posts = retry_posts
+
+    def is_retryable_status(self, status_code: int, idempotent: bool = True) -> bool:
+        if status_code not in self.status_codes:
+            return False
+        if idempotent or self.retry_posts:
+            return True
+        return status_code in settings.RETRY_UNPROCESSED_STATUS_CODES
+
+    def is_retryable_error(
+        self, may_have_reached_server: bool, idempotent: bool = True
+    ) -> bool:
+        if not self.retry_on_connection_errors:
+            return False
+        return idempotent or self.retry_posts or not may_have_reached_server
+
+    def get_backoff(self, attempt: int, retry_after: Optional[str] = None) -> float:
+        """Computes the wait before the next attempt using exponential backoff with full jitter.
+
+        Args:
+            attempt (int): Number of the failed attempt, starting at 0.
+            retry_after (Optional[str], optional): Value of the `Retry-After` header. Defaults to None.
+
+        Returns:
+            float: Seconds to wait.
+        """
+        if self.respect_retry_after and retry_after is not None:
+            retry_after_seconds = _parse_retry_after(retry_after)
+            if retry_after_seconds is not None:
+                return min(retry_after_seconds, self.max_elapsed_time)
+        ceiling = min(self.max_backoff, self.backoff_factor * (2**attempt))
+        return random.uniform(0, ceiling)
+
+    def should_retry(self, attempt: int, started_at: float, backoff: float) -> bool:
+        """Checks the retry and time budget of a request.
+
+        Args:
+            attempt (int): Number of the failed attempt, starting at 0.
+            started_at (float): `time.monotonic()` of the first attempt.
+            backoff (float): Seconds the next wait would take.
+
+        Returns:
+            bool: True if another attempt should be made.
+        """
+        if attempt >= self.max_retries:
+            return False
+        elapsed = time.monotonic() - started_at
+        return elapsed + backoff <= self.max_elapsed_time
+
+
+NO_RETRY = RetryPolicy(max_retries=0)
+
+
+def _parse_retry_after(retry_after: str) -> Optional[float]:
+    try:
+        return max(0.0, float(retry_after))
+    except ValueError:
+        pass
+    try:
+        retry_at = parsedate_to_datetime(retry_after)
+    except (TypeError, ValueError):
+        return None
+    if retry_at.tzinfo is None:
+        retry_at = retry_at.replace(tzinfo=timezone.utc)
+    return max(0.0, (retry_at - datetime.now(timezone.utc)).total_seconds())
+
+
 def post_request(
-    url: str, body: Dict[str, Any], session_token: str, project_id: str
+    url: str,
+    body: Dict[str, Any],
+    session_token: str,
+    project_id: str,
+    retry_policy: Optional[RetryPolicy] = None,
+    idempotency_key: Optional[str] = None,
+    instrumentation: Optional[Instrumentation] = None,
+    http_session: Optional[requests.Session] = None,
 ) -> str:
+    http = http_session if http_session is not None else requests
     headers = _build_headers(session_token)
-    response = requests.post(url=url, json=body, headers=headers)
-    return _handle_response(response, project_id)
+    # the same key is sent with every attempt, so a server honoring it can drop duplicates
+    headers["idempotency-key"] = (
+        idempotency_key if idempotency_key is not None else str(uuid4())
+    )
+    started_at = time.perf_counter()
+    response, retries = _send_with_retries(
+        lambda: http.post(url=url, json=body, headers=headers),
+        retry_policy,
+        idempotent=False,
+    )
+    return _handle_response(response, project_id, instrumentation, started_at, retries)
 
 
-def get_request(url: str, session_token: str, project_id: str, **query_params) -> str:
+def get_request(
+    url: str,
+    session_token: str,
+    project_id: str,
+    retry_policy: Optional[RetryPolicy] = None,
+    instrumentation: Optional[Instrumentation] = None,
+    http_session: Optional[requests.Session] = None,
+    **query_params,
+) -> str:
+    http = http_session if http_session is not None else requests
     headers = _build_headers(session_token)
-    response = requests.get(url=url, headers=headers, params=query_params)
-    return _handle_response(response, project_id)
+    started_at = time.perf_counter()
+    response, retries = _send_with_retries(
+        lambda: http.get(url=url, headers=headers, params=query_params),
+        retry_policy,
+    )
+    return _handle_response(response, project_id, instrumentation, started_at, retries)
+
+
+def _may_have_reached_server(error: requests.RequestException) -> bool:
+    if isinstance(error, requests.ConnectTimeout):
+        return False
+    # requests wraps urllib3's MaxRetryError, whose reason tells if connecting failed
+    reason = getattr(error.args[0], "reason", None) if error.args else None
+    return not isinstance(reason, NewConnectionError)
+
+
+def _send_with_retries(
+    send: Callable[[], requests.Response],
+    retry_policy: Optional[RetryPolicy],
+    idempotent: bool = True,
+) -> Tuple[requests.Response, int]:
+    if retry_policy is None:
+        retry_policy = NO_RETRY
+    started_at = time.monotonic()
+    attempt = 0
+    while True:
+        try:
+            response = send()
+        except (requests.ConnectionError, requests.Timeout) as error:
+            if not retry_policy.is_retryable_error(
+                _may_have_reached_server(error), idempotent
+            ):
+                raise
+            backoff = retry_policy.get_backoff(attempt)
+            if not retry_policy.should_retry(attempt, started_at, backoff):
+                raise
+        else:
+            if not retry_policy.is_retryable_status(response.status_code, idempotent):
+                return response, attempt
+            backoff = retry_policy.get_backoff(
+                attempt, response.headers.get("Retry-After")
+            )
+            if not retry_policy.should_retry(attempt, started_at, backoff):
+                return response, attempt
+        time.sleep(backoff)
+        attempt += 1
+
+
+def create_http_session(
+    pool_size: int = settings.MAX_CONCURRENCY_DEFAULT,
+) -> requests.Session:
+    """Creates a session whose connection pool can be shared between clients.
+
+    The pool blocks once all its connections to a host are in use, so the clients sharing
+    the session (e.g. of a `MultiProjectOrchestrator` or created via `Client.for_project`)
+    never send more than `pool_size` concurrent requests to one server.
+
+    Args:
+        pool_size (int, optional): Maximum number of concurrent connections per host. Defaults to 8.
+
+    Returns:
+        requests.Session: the session.
+    """
+    http_session = requests.Session()
+    adapter = requests.adapters.HTTPAdapter(
+        pool_connections=pool_size, pool_maxsize=pool_size, pool_block=True
+    )
+    http_session.mount("http://", adapter)
+    http_session.mount("https://", adapter)
+    return http_session
 
 
 def _build_headers(session_token: str) -> Dict[str, str]:
@@ -35,16 +235,43 @@ def _build_headers(session_token: str) -> Dict[str, str]:
     }
 
 
-def _handle_response(response: requests.Response, project_id: str) -> str:
-    status_code = response.status_code
+def _handle_response(
+    response: requests.Response,
+    project_id: str,
+    instrumentation: Optional[Instrumentation] = None,
+    started_at: Optional[float] = None,
+    retries: int = 0,
+) -> str:
+    if instrumentation is None or not instrumentation.enabled:
+        return _handle_content(response.status_code, response.text, project_id)
+    latency = time.perf_counter() - started_at
+    decode_started_at = time.perf_counter()
+    try:
+        return _handle_content(response.status_code, response.text, project_id)
+    finally:
+        instrumentation.on_request(
+            RequestEvent(
+                method=response.request.method,
+                url=response.url,
+                status_code=response.status_code,
+                latency=latency,
+                bytes_sent=len(response.request.body or b""),
+                bytes_received=len(response.content),
+                decode_time=time.perf_counter() - decode_started_at,
+                retries=retries,
+            )
+        )
+
+
+def _handle_content(status_code: int, content: str, project_id: str) -> str:
     if status_code == 200:
-        json_data = response.json()
+        json_data = json.loads(content)
         if type(json_data) == str:
             json_data = json.loads(json_data)
         return json_data
     else:
         try:
-            json_data = response.json()
+            json_data = json.loads(content)
             error_code = json_data.get("error_code")
             error_message = json_data.get("error_message")
         except JSONDecodeError:
@@ -0,0 +1,131 @@
+# -*- coding: utf-8 -*-
+import json
+import threading
+import time
+from typing import TYPE_CHECKING, Any, Dict, List, Optional, Tuple
+from refinery import settings
+
+if TYPE_CHECKING:
+    from refinery import Client
+
+
+class AssociationWriter:
+    """Buffers associations of any number of models and label tasks and sends them in large batches.
+
+    Associations are grouped by name, label task and source type, since each request
+    carries one of each. A group is sent as soon as it fills a request of `max_records`;
+    all groups are flushed if the buffered bytes reach `max_bytes` or the oldest buffered
+    association is older than `flush_interval`. Use it as a context manager to make sure
+    that everything is sent:
+
+        with client.association_writer() as writer:
+            writer.add(outputs, indices, "my-model", "sentiment")
+            writer.add(other_outputs, indices, "my-model", "topic")
+
+    Args:
+        client (Client): Client of the project.
+        max_records (int, optional): Number of associations per request. Defaults to 1000.
+        max_bytes (int, optional): Approximate buffered JSON bytes that trigger a flush. Defaults to 5 MB.
+        flush_interval (float, optional): Seconds after which buffered associations are flushed on the next `add`. Defaults to 5.
+    """
+
+    def __init__(
+        self,
+        client: "Client",
+        max_records: int = settings.ASSOCIATION_WRITER_MAX_RECORDS_DEFAULT,
+        max_bytes: int = settings.ASSOCIATION_WRITER_MAX_BYTES_DEFAULT,
+        flush_interval: float = settings.ASSOCIATION_WRITER_FLUSH_INTERVAL_DEFAULT,
+    ):
+        self.client = client
+        self.max_records = max_records
+        self.max_bytes = max_bytes
+        self.flush_interval = flush_interval
+        self.buffers: Dict[Tuple[str, str, str], Tuple[List[Any], List[Any]]] = {}
+        self.num_records = 0
+        self.num_bytes = 0
+        self.num_requests = 0
+        self.first_added_at: Optional[float] = None
+        self.lock = threading.Lock()
+
+    def add(
+        self,
+        associations: List[Any],
+        indices: List[Dict[str, Any]],
+        name: str,
+        label_task_name: str,
+        source_type: str = "heuristic",
+    ) -> None:
+        """Buffers associations; this sends all buffered associations if a threshold is reached.
+
+        Args:
+            associations (List[Any]): Associations to post.
+            indices (List[Dict[str, Any]]): Indices of the associated records.
+            name (str): Name of the association set.
+            label_task_name (str): Name of the label task.
+            source_type (str, optional): Source type of the associations. Defaults to "heuristic".
+        """
+        if len(associations) != len(indices):
+            raise ValueError("Each association needs exactly one index.")
+        num_bytes = len(json.dumps([associations, indices], default=str))
+        with self.lock:
+            buffered_associations, buffered_indices = self.buffers.setdefault(
+                (name, label_task_name, source_type), ([], [])
+            )
+            buffered_associations.extend(associations)
+            buffered_indices.extend(indices)
+            self.num_records += len(associations)
+            self.num_bytes += num_bytes
+            if self.first_added_at is None:
+                self.first_added_at = time.monotonic()
+            if (
+                self.num_bytes >= self.max_bytes
+                or time.monotonic() - self.first_added_at >= self.flush_interval
+            ):
+                self.__flush()
+            elif len(buffered_associations) >= self.max_records:
+                # only full requests are sent, the rest keeps waiting for more
+                self.__flush_group((name, label_task_name, source_type), full_only=True)
+
+    def flush(self) -> None:
+        """Sends all buffered associations."""
+        with self.lock:
+            self.__flush()
+
+    def __flush(self) -> None:
+        for key in list(self.buffers):
+            self.__flush_group(key)
+        self.num_records = 0
+        self.num_bytes = 0
+        self.first_added_at = None
+
+    def __flush_group(self, key: Tuple[str, str, str], full_only: bool = False) -> None:
+        name, label_task_name, source_type = key
+        associations, indices = self.buffers.pop(key)
+        num_sent = len(associations)
+        if full_only:
+            num_sent -= num_sent % self.max_records
+            if num_sent < len(associations):
+                self.buffers[key] = (associations[num_sent:], indices[num_sent:])
+        for start in range(0, num_sent, self.max_records):
+            stop = min(start + self.max_records, num_sent)
+            with self.client.instrumentation.stage(
+                "associations.flush", num_records=stop - start
+            ):
+                self.client.post_associations(
+                    associations[start:stop],
+                    indices[start:stop],
+                    name,
+                    label_task_name,
+                    source_type,
+                )
+            self.num_requests += 1
+        if full_only:
+            # the byte count is estimated per add, so it is scaled down proportionally
+            self.num_bytes -= self.num_bytes * num_sent // max(1, self.num_records)
+            self.num_records -= num_sent
+
+    def __enter__(self) -> "AssociationWriter":
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.flush()
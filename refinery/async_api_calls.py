@@ -0,0 +1,176 @@
+# -*- coding: utf-8 -*-
+import asyncio
+import json
+import time
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+from uuid import uuid4
+import aiohttp
+from refinery.api_calls import NO_RETRY, RetryPolicy, _build_headers, _handle_content
+from refinery.instrumentation import Instrumentation, RequestEvent
+
+
+async def post_request(
+    session: aiohttp.ClientSession,
+    url: str,
+    body: Dict[str, Any],
+    session_token: str,
+    project_id: str,
+    semaphore: Optional[asyncio.Semaphore] = None,
+    retry_policy: Optional[RetryPolicy] = None,
+    idempotency_key: Optional[str] = None,
+    instrumentation: Optional[Instrumentation] = None,
+) -> str:
+    headers = _build_headers(session_token)
+    # the same key is sent with every attempt, so a server honoring it can drop duplicates
+    headers["idempotency-key"] = (
+        idempotency_key if idempotency_key is not None else str(uuid4())
+    )
+
+    async def send() -> Tuple[int, str, Optional[str]]:
+        async with _acquire(semaphore):
+            async with session.post(url, json=body, headers=headers) as response:
+                return (
+                    response.status,
+                    await response.text(),
+                    response.headers.get("Retry-After"),
+                )
+
+    started_at = time.perf_counter()
+    status_code, content, retries = await _send_with_retries(
+        send, retry_policy, idempotent=False
+    )
+    return _handle_content_instrumented(
+        "POST",
+        url,
+        status_code,
+        content,
+        project_id,
+        instrumentation,
+        started_at,
+        retries,
+        # aiohttp serializes with json.dumps as well
+        bytes_sent=len(json.dumps(body)) if _is_enabled(instrumentation) else 0,
+    )
+
+
+async def get_request(
+    session: aiohttp.ClientSession,
+    url: str,
+    session_token: str,
+    project_id: str,
+    semaphore: Optional[asyncio.Semaphore] = None,
+    retry_policy: Optional[RetryPolicy] = None,
+    instrumentation: Optional[Instrumentation] = None,
+    **query_params,
+) -> str:
+    headers = _build_headers(session_token)
+    # lists are sent as repeated parameters, like requests does
+    params = [
+        (key, str(item))
+        for key, value in query_params.items()
+        if value is not None
+        for item in (value if isinstance(value, list) else [value])
+    ]
+
+    async def send() -> Tuple[int, str, Optional[str]]:
+        async with _acquire(semaphore):
+            async with session.get(url, headers=headers, params=params) as response:
+                return (
+                    response.status,
+                    await response.text(),
+                    response.headers.get("Retry-After"),
+                )
+
+    started_at = time.perf_counter()
+    status_code, content, retries = await _send_with_retries(send, retry_policy)
+    return _handle_content_instrumented(
+        "GET",
+        url,
+        status_code,
+        content,
+        project_id,
+        instrumentation,
+        started_at,
+        retries,
+    )
+
+
+def _is_enabled(instrumentation: Optional[Instrumentation]) -> bool:
+    return instrumentation is not None and instrumentation.enabled
+
+
+def _handle_content_instrumented(
+    method: str,
+    url: str,
+    status_code: int,
+    content: str,
+    project_id: str,
+    instrumentation: Optional[Instrumentation],
+    started_at: float,
+    retries: int,
+    bytes_sent: int = 0,
+) -> str:
+    if not _is_enabled(instrumentation):
+        return _handle_content(status_code, content, project_id)
+    latency = time.perf_counter() - started_at
+    decode_started_at = time.perf_counter()
+    try:
+        return _handle_content(status_code, content, project_id)
+    finally:
+        instrumentation.on_request(
+            RequestEvent(
+                method=method,
+                url=url,
+                status_code=status_code,
+                latency=latency,
+                bytes_sent=bytes_sent,
+                bytes_received=len(content.encode()),
+                decode_time=time.perf_counter() - decode_started_at,
+                retries=retries,
+            )
+        )
+
+
+async def _send_with_retries(
+    send: Callable[[], Awaitable[Tuple[int, str, Optional[str]]]],
+    retry_policy: Optional[RetryPolicy],
+    idempotent: bool = True,
+) -> Tuple[int, str, int]:
+    if retry_policy is None:
+        retry_policy = NO_RETRY
+    started_at = time.monotonic()
+    attempt = 0
+    while True:
+        try:
+            status_code, content, retry_after = await send()
+        except (aiohttp.ClientConnectionError, asyncio.TimeoutError) as error:
+            # only a failed connect guarantees that the request wasn't sent
+            may_have_reached_server = not isinstance(
+                error, aiohttp.ClientConnectorError
+            )
+            if not retry_policy.is_retryable_error(may_have_reached_server, idempotent):
+                raise
+            backoff = retry_policy.get_backoff(attempt)
+            if not retry_policy.should_retry(attempt, started_at, backoff):
+                raise
+        else:
+            if not retry_policy.is_retryable_status(status_code, idempotent):
+                return status_code, content, attempt
+            backoff = retry_policy.get_backoff(attempt, retry_after)
+            if not retry_policy.should_retry(attempt, started_at, backoff):
+                return status_code, content, attempt
+        # the semaphore is released while waiting, so other requests can proceed
+        await asyncio.sleep(backoff)
+        attempt += 1
+
+
+class _NoLimit:
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *args):
+        return False
+
+
+def _acquire(semaphore: Optional[asyncio.Semaphore]):
+    return semaphore if semaphore is not None else _NoLimit()
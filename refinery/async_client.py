@@ -0,0 +1,447 @@
+# -*- coding: utf-8 -*-
+import asyncio
+import json
+import os.path
+from typing import Any, Dict, List, Optional
+from uuid import uuid4
+import aiohttp
+import pandas as pd
+from wasabi import msg
+from refinery import (
+    api_calls,
+    async_api_calls,
+    authentication,
+    exceptions,
+    export,
+    settings,
+    util,
+)
+from refinery.instrumentation import NOOP, Instrumentation
+
+
+class AsyncClient:
+    """Asyncio-native client mirroring `refinery.Client`. Use it as an async context manager:
+
+        async with AsyncClient(user_name, password, project_id) as client:
+            df = await client.get_record_export(tokenize=False)
+
+    Args:
+        user_name (str): Your username (email) for the application.
+        password (str): The respective password. Do not share this!
+        project_id (str): The link to your project. This can be found in the URL in an active project.
+        uri (str, optional): Link to the host of the application. Defaults to "https://app.kern.ai".
+        max_concurrency (int, optional): Maximum number of requests in flight at the same time. Defaults to 8.
+        session (Optional[aiohttp.ClientSession], optional): Session to share a connection pool between clients. If None, the client creates and closes its own session. Defaults to None.
+        retry_policy (Optional[api_calls.RetryPolicy], optional): Policy for retrying transient errors. Defaults to None; in that case, the default `api_calls.RetryPolicy()` is used.
+        use_token_cache (bool, optional): If True, session tokens are cached on disk and shared with other clients of the same user. Defaults to True.
+        instrumentation (Optional[instrumentation.Instrumentation], optional): Hooks receiving request metrics and stage timings. Defaults to None; in that case, nothing is measured.
+
+    Raises:
+        exceptions.get_api_exception_class: If your credentials are incorrect, an exception is raised.
+    """
+
+    def __init__(
+        self,
+        user_name: str,
+        password: str,
+        project_id: str,
+        uri=settings.DEFAULT_URI,
+        max_concurrency: int = settings.MAX_CONCURRENCY_DEFAULT,
+        session: Optional[aiohttp.ClientSession] = None,
+        retry_policy: Optional[api_calls.RetryPolicy] = None,
+        use_token_cache: bool = True,
+        instrumentation: Optional[Instrumentation] = None,
+    ):
+        if retry_policy is None:
+            retry_policy = api_calls.RetryPolicy()
+        self.retry_policy = retry_policy
+        if instrumentation is None:
+            instrumentation = NOOP
+        self.instrumentation = instrumentation
+        self.token_manager = authentication.TokenManager(
+            user_name=user_name,
+            password=password,
+            uri=uri,
+            use_cache=use_token_cache,
+        )
+        self.project_id = project_id
+        self.uri = uri
+        self.max_concurrency = max_concurrency
+        self.session = session
+        self._owns_session = session is None
+        self._semaphore = None
+
+    @classmethod
+    def from_secrets_file(
+        cls, path_to_file: str, project_id: Optional[str] = None, **kwargs
+    ):
+        """Creates an AsyncClient object from a secrets file.
+
+        Args:
+            path_to_file (str): Path to the secrets file.
+            project_id (Optional[str], optional): The link to your project. Defaults to None. In that case, it will read the project id from the file
+
+        Returns:
+            refinery.async_client.AsyncClient: AsyncClient object.
+        """
+        with open(path_to_file, "r") as file:
+            content = json.load(file)
+
+        uri = content.get("uri")
+        if uri is None:
+            uri = settings.DEFAULT_URI
+
+        if project_id is None:
+            project_id = content["project_id"]
+
+        return cls(
+            user_name=content["user_name"],
+            password=content["password"],
+            project_id=project_id,
+            uri=uri,
+            **kwargs,
+        )
+
+    async def __aenter__(self):
+        await self.connect()
+        return self
+
+    async def __aexit__(self, *args):
+        await self.close()
+
+    async def connect(self) -> None:
+        """Opens the connection pool and logs in to the system.
+
+        Raises:
+            exceptions.get_api_exception_class: If your credentials are incorrect, an exception is raised.
+        """
+        msg.info(f"Connecting to {self.uri}")
+        settings.BASE_URI = self.uri
+        if self.session is None:
+            self.session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=self.max_concurrency)
+            )
+        self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        session_token = await self._run_in_executor(self.token_manager.get_token)
+        if session_token is not None:
+            msg.good("Logged in to system.")
+        else:
+            msg.fail(
+                f"Could not log in at {self.uri}. Please check username and password."
+            )
+            raise exceptions.get_api_exception_class(401)
+
+        await self.get_project_details()
+
+    async def close(self) -> None:
+        """Closes the connection pool if it is owned by this client."""
+        if self._owns_session and self.session is not None:
+            await self.session.close()
+            self.session = None
+
+    @property
+    def session_token(self) -> Optional[str]:
+        """Current session token, None if it is about to expire and needs a refresh."""
+        return self.token_manager.get_valid_token()
+
+    async def _run_in_executor(self, fn, *args):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, fn, *args)
+
+    async def _get(self, url: str, **query_params) -> Any:
+        return await self._with_token_refresh(
+            lambda session_token: async_api_calls.get_request(
+                self.session,
+                url,
+                session_token,
+                self.project_id,
+                semaphore=self._semaphore,
+                retry_policy=self.retry_policy,
+                instrumentation=self.instrumentation,
+                **query_params,
+            )
+        )
+
+    async def _post(
+        self, url: str, body: Dict[str, Any], idempotency_key: Optional[str] = None
+    ) -> Any:
+        if idempotency_key is None:
+            # keep the key stable if the request is repeated with a refreshed token
+            idempotency_key = str(uuid4())
+        return await self._with_token_refresh(
+            lambda session_token: async_api_calls.post_request(
+                self.session,
+                url,
+                body,
+                session_token,
+                self.project_id,
+                semaphore=self._semaphore,
+                retry_policy=self.retry_policy,
+                idempotency_key=idempotency_key,
+                instrumentation=self.instrumentation,
+            )
+        )
+
+    async def _with_token_refresh(self, request) -> Any:
+        session_token = self.token_manager.get_valid_token()
+        if session_token is None:
+            session_token = await self._run_in_executor(self.token_manager.get_token)
+        try:
+            return await request(session_token)
+        except exceptions.UnauthorizedError:
+            refreshed_token = await self._run_in_executor(
+                self.token_manager.refresh, session_token
+            )
+            if refreshed_token is None or refreshed_token == session_token:
+                raise
+            return await request(refreshed_token)
+
+    async def get_project_details(self) -> Dict[str, str]:
+        """Collect high-level information about your project: name, description, and tokenizer
+
+        Returns:
+            Dict[str, str]: dictionary containing the above information
+        """
+        return await self._get(settings.get_project_url(self.uri, self.project_id))
+
+    async def get_primary_keys(self) -> List[str]:
+        """Fetches the primary keys of your current project.
+
+        Returns:
+            List[str]: Containing the primary keys of your project.
+        """
+        project_details = await self.get_project_details()
+        return [
+            attribute["name"]
+            for attribute in project_details["attributes"]
+            if attribute["is_primary_key"]
+        ]
+
+    async def get_lookup_list(self, list_id: str) -> Dict[str, str]:
+        """Fetches a lookup list of your current project.
+
+        Args:
+            list_id (str): The ID of the lookup list.
+
+        Returns:
+            Dict[str, str]: Containing the specified lookup list of your project.
+        """
+        return await self._get(
+            settings.get_lookup_list_url(self.uri, self.project_id, list_id)
+        )
+
+    async def get_lookup_lists(self) -> List[Dict[str, str]]:
+        """Fetches all lookup lists of your current project concurrently.
+
+        Returns:
+            List[Dict[str, str]]: Containing the lookups lists of your project.
+        """
+        project_details = await self.get_project_details()
+        return list(
+            await asyncio.gather(
+                *[
+                    self.get_lookup_list(lookup_list_id)
+                    for lookup_list_id in project_details["knowledge_base_ids"]
+                ]
+            )
+        )
+
+    async def get_record_export(
+        self,
+        num_samples: Optional[int] = None,
+        download_to: Optional[str] = None,
+        tokenize: Optional[bool] = True,
+        keep_attributes: Optional[List[str]] = None,
+        dropna: Optional[bool] = False,
+        optimize_memory: Optional[bool] = False,
+    ) -> pd.DataFrame:
+        """Collects the export data of your project. Tokenization runs in a worker thread so the event loop is not blocked.
+
+        Args:
+            num_samples (Optional[int], optional): If set, only the first `num_samples` records are collected. Defaults to None.
+            optimize_memory (Optional[bool], optional): If True, columns are converted to memory-efficient dtypes (categorical labels, Arrow-backed strings, downcast numbers). Defaults to False.
+
+        Returns:
+            pd.DataFrame: DataFrame containing your record data.
+        """
+        api_response, project_details = await asyncio.gather(
+            self._get(
+                settings.get_export_url(self.uri, self.project_id),
+                num_samples=num_samples,
+                **export.build_export_query_params(keep_attributes, dropna),
+            ),
+            self.get_project_details(),
+        )
+        return await self._run_in_executor(
+            lambda: export.build_export_df(
+                api_response,
+                project_details,
+                tokenize=tokenize,
+                keep_attributes=keep_attributes,
+                dropna=dropna,
+                download_to=download_to,
+                instrumentation=self.instrumentation,
+                optimize_memory=optimize_memory,
+            ),
+        )
+
+    async def post_associations(
+        self,
+        associations,
+        indices,
+        name,
+        label_task_name,
+        source_type: Optional[str] = "heuristic",
+    ):
+        """Posts associations to the server.
+
+        Args:
+            associations (List[Dict[str, str]]): List of associations to post.
+            indices (List[str]): List of indices to post to.
+            name (str): Name of the association set.
+            label_task_name (str): Name of the label task.
+            source_type (Optional[str], optional): Source type of the associations. Defaults to "heuristic".
+        """
+        return await self._post(
+            settings.get_associations_url(self.uri, self.project_id),
+            {
+                "associations": associations,
+                "indices": indices,
+                "name": name,
+                "label_task_name": label_task_name,
+                "source_type": source_type,
+            },
+        )
+
+    async def post_records(self, records: List[Dict[str, Any]]):
+        """Posts records to the server.
+
+        Like the `Client`, batches are throttled: at most 2 batches are in flight at a time,
+        and each keeps its slot for half a second after its response, so large uploads
+        don't burst against the import endpoint.
+
+        Args:
+            records (List[Dict[str, str]]): List of records to post.
+
+        Returns:
+            List[Any]: Responses of the batches, in the order of the batches.
+        """
+        request_uuid = str(uuid4())
+        url = settings.get_import_json_url(self.uri, self.project_id)
+        import_semaphore = asyncio.Semaphore(settings.IMPORT_MAX_CONCURRENCY_DEFAULT)
+
+        async def post_batch(idx: int, records_batch: List[Dict[str, Any]]) -> Any:
+            async with import_semaphore:
+                api_response = await self._post(
+                    url,
+                    {
+                        "request_uuid": request_uuid,
+                        "records": records_batch,
+                        "is_last": False,
+                    },
+                    idempotency_key=f"{request_uuid}-{idx}",
+                )
+                await asyncio.sleep(settings.IMPORT_BATCH_DELAY)
+                return api_response
+
+        # gather returns the responses in the order of the batches
+        batch_responses = await asyncio.gather(
+            *[
+                post_batch(idx, records_batch)
+                for idx, records_batch in enumerate(
+                    util.batch(records, settings.BATCH_SIZE_DEFAULT)
+                )
+            ]
+        )
+        await self._post(
+            url,
+            {"request_uuid": request_uuid, "records": [], "is_last": True},
+            idempotency_key=f"{request_uuid}-last",
+        )
+        return list(batch_responses)
+
+    async def post_df(self, df: pd.DataFrame):
+        """Posts a DataFrame to the server.
+
+        Args:
+            df (pd.DataFrame): DataFrame to post.
+        """
+        return await self.post_records(df.to_dict(orient="records"))
+
+    async def post_file_import(
+        self, path: str, import_file_options: Optional[str] = ""
+    ) -> None:
+        """Imports a file into your project. The upload to the object storage runs in a worker thread.
+
+        Args:
+            path (str): Path to the file to import.
+            import_file_options (Optional[str], optional): Options for the Pandas import. Defaults to None.
+
+        Raises:
+            FileImportError: If the file could not be imported, an exception is raised.
+        """
+        if not os.path.exists(path):
+            raise exceptions.FileImportError(
+                f"Given filepath is not valid. Path: {path}"
+            )
+        last_path_part = path.split("/")[-1]
+        file_name = f"{last_path_part}_SCALE"
+
+        FILE_TYPE = "records"
+        config_api_response, credentials_api_response = await asyncio.gather(
+            self._get(settings.get_base_config(self.uri, self.project_id)),
+            self._post(
+                settings.get_import_file_url(self.uri, self.project_id),
+                {
+                    "file_name": file_name,
+                    "file_type": FILE_TYPE,
+                    "import_file_options": import_file_options,
+                },
+            ),
+        )
+        endpoint = config_api_response.get("KERN_S3_ENDPOINT")
+        credentials = credentials_api_response["Credentials"]
+        upload_task_id = credentials_api_response["uploadTaskId"]
+
+        success = await self._run_in_executor(
+            util.s3_upload,
+            credentials["AccessKeyId"],
+            credentials["SecretAccessKey"],
+            credentials["SessionToken"],
+            credentials_api_response["bucket"],
+            endpoint,
+            upload_task_id,
+            path,
+            file_name,
+        )
+        if success:
+            msg.good(f"Uploaded {path} to object storage.")
+            upload_task_id = (
+                upload_task_id.split("/")[-1]
+                if "/" in upload_task_id
+                else upload_task_id
+            )
+            await self.__monitor_task(upload_task_id)
+        else:
+            msg_text = f"Could not upload {path} to your project."
+            msg.fail(msg_text)
+            raise exceptions.FileImportError(msg_text)
+
+    async def __monitor_task(self, upload_task_id: str) -> None:
+        for _ in range(100):
+            task = await self._get(
+                settings.get_task(self.uri, self.project_id, upload_task_id)
+            )
+            task_state = task.get("state") if task.get("state") else "FAILED"
+            if task_state == "DONE":
+                msg.good("File upload successful.")
+                return
+            if task_state == "FAILED":
+                msg.fail(
+                    "Upload failed. Please look into the UI notification center for more details."
+                )
+                return
+            await asyncio.sleep(0.5)
+        raise exceptions.FileImportError(
+            "Timeout while upload, please check the upload progress in the UI."
+        )
@@ -1,27 +1,219 @@
 # -*- coding: utf-8 -*-
+import hashlib
+import hmac
+import json
+import os
+import re
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from typing import Optional, Tuple
 from refinery import settings
 import requests
 
+try:
+    import fcntl
+except ImportError:  # not available on Windows, only the in-process lock is used
+    fcntl = None
 
-def create_session_token(user_name: str, password: str) -> str:
+
+def create_session_token(
+    user_name: str, password: str, uri: Optional[str] = None
+) -> str:
+    if uri is None:
+        # deprecated fallback to the uri of the latest client
+        uri = settings.BASE_URI
+    session_token, _ = login(user_name, password, uri)
+    return session_token
+
+
+def login(
+    user_name: str,
+    password: str,
+    uri: str,
+    http_session: Optional[requests.Session] = None,
+) -> Tuple[Optional[str], Optional[float]]:
+    """Performs the Kratos API login flow.
+
+    Args:
+        user_name (str): Your username (email) for the application.
+        password (str): The respective password.
+        uri (str): Link to the host of the application.
+        http_session (Optional[requests.Session], optional): Session whose connection pool is used. Defaults to None.
+
+    Returns:
+        Tuple[Optional[str], Optional[float]]: the session token (None if the login failed) and its expiry as unix timestamp (None if unknown).
+    """
+    http = http_session if http_session is not None else requests
     headers = {"Accept": "application/json"}
     action_url = (
-        requests.get(settings.get_authentication_url(), headers=headers)
+        http.get(settings.get_authentication_url(uri), headers=headers)
         .json()
         .get("ui")
         .get("action")
     )
-    session_token = (
-        requests.post(
-            action_url,
-            headers=headers,
-            json={
-                "method": "password",
-                "password": password,
-                "password_identifier": user_name,
-            },
+    login_response = http.post(
+        action_url,
+        headers=headers,
+        json={
+            "method": "password",
+            "password": password,
+            "password_identifier": user_name,
+        },
+    ).json()
+    session_token = login_response.get("session_token")
+    session = login_response.get("session") or {}
+    return session_token, _parse_timestamp(session.get("expires_at"))
+
+
+def _parse_timestamp(timestamp: Optional[str]) -> Optional[float]:
+    if timestamp is None:
+        return None
+    # Kratos sends up to nanosecond precision, which fromisoformat can't parse
+    timestamp = re.sub(r"\.\d+", "", timestamp).replace("Z", "+00:00")
+    try:
+        parsed = datetime.fromisoformat(timestamp)
+    except ValueError:
+        return None
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed.timestamp()
+
+
+class TokenManager:
+    """Provides a valid session token for a user and host.
+
+    Tokens are cached on disk (readable only by the current user), so that other
+    processes of the same user can reuse them instead of logging in again. The cache
+    is keyed by host, user name and password. Tokens are refreshed shortly before
+    they expire, or when the server rejected them.
+    A thread lock and a lock file make sure that only one login happens at a time.
+
+    Args:
+        user_name (str): Your username (email) for the application.
+        password (str): The respective password.
+        uri (str): Link to the host of the application.
+        use_cache (bool, optional): If False, tokens are only kept in memory. Defaults to True.
+        cache_dir (Optional[str], optional): Directory of the token cache. Defaults to None; in that case, `settings.get_token_cache_dir()` is used.
+        http_session (Optional[requests.Session], optional): Session whose connection pool is used for logins. Defaults to None.
+    """
+
+    def __init__(
+        self,
+        user_name: str,
+        password: str,
+        uri: str,
+        use_cache: bool = True,
+        cache_dir: Optional[str] = None,
+        http_session: Optional[requests.Session] = None,
+    ):
+        self.user_name = user_name
+        self.password = password
+        self.uri = uri
+        self.use_cache = use_cache
+        self.http_session = http_session
+        if cache_dir is None:
+            cache_dir = settings.get_token_cache_dir()
+        # keyed by the password, so a client with a wrong or rotated password doesn't
+        # reuse the token of a previous login
+        cache_key = hmac.new(
+            password.encode(), f"{uri}|{user_name}".encode(), hashlib.sha256
+        ).hexdigest()
+        self.cache_path = os.path.join(cache_dir, f"{cache_key}.json")
+        self._lock = threading.Lock()
+        self._token = None
+        self._expires_at = None
+
+    def get_token(self) -> Optional[str]:
+        """Returns the current session token, logging in or refreshing it if needed.
+
+        Returns:
+            Optional[str]: the session token, None if the login failed.
+        """
+        token = self.get_valid_token()
+        if token is not None:
+            return token
+        return self.refresh(self._token)
+
+    def get_valid_token(self) -> Optional[str]:
+        """Returns the in-memory session token without any I/O.
+
+        Returns:
+            Optional[str]: the session token, None if there is none or it is about to expire.
+        """
+        token, expires_at = self._token, self._expires_at
+        if token is not None and not self._is_expiring(expires_at):
+            return token
+        return None
+
+    def refresh(self, stale_token: Optional[str] = None) -> Optional[str]:
+        """Replaces a stale token. If another thread or process already replaced it, no new login is done.
+
+        Args:
+            stale_token (Optional[str], optional): the token that was rejected or expired. Defaults to None.
+
+        Returns:
+            Optional[str]: the new session token, None if the login failed.
+        """
+        with self._lock:
+            if self._token is not None and self._token != stale_token:
+                return self._token
+            with self._file_lock():
+                token, expires_at = self._read_cache()
+                if (
+                    token is None
+                    or token == stale_token
+                    or self._is_expiring(expires_at)
+                ):
+                    token, expires_at = login(
+                        self.user_name, self.password, self.uri, self.http_session
+                    )
+                    if token is not None:
+                        self._write_cache(token, expires_at)
+            self._token, self._expires_at = token, expires_at
+            return token
+
+    @staticmethod
+    def _is_expiring(expires_at: Optional[float]) -> bool:
+        if expires_at is None:
+            return False
+        return expires_at - time.time() < settings.TOKEN_REFRESH_MARGIN
+
+    def _read_cache(self) -> Tuple[Optional[str], Optional[float]]:
+        if not self.use_cache or not os.path.exists(self.cache_path):
+            return None, None
+        try:
+            with open(self.cache_path, "r") as file:
+                content = json.load(file)
+        except (OSError, ValueError):
+            return None, None
+        return content.get("session_token"), content.get("expires_at")
+
+    def _write_cache(self, token: str, expires_at: Optional[float]) -> None:
+        if not self.use_cache:
+            return
+        os.makedirs(os.path.dirname(self.cache_path), mode=0o700, exist_ok=True)
+        tmp_path = f"{self.cache_path}.{os.getpid()}.tmp"
+        file_descriptor = os.open(
+            tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600
         )
-        .json()
-        .get("session_token")
-    )
-    return session_token
+        with os.fdopen(file_descriptor, "w") as file:
+            json.dump({"session_token": token, "expires_at": expires_at}, file)
+        os.replace(tmp_path, self.cache_path)
+
+    @contextmanager
+    def _file_lock(self):
+        if not self.use_cache or fcntl is None:
+            yield
+            return
+        os.makedirs(os.path.dirname(self.cache_path), mode=0o700, exist_ok=True)
+        file_descriptor = os.open(
+            f"{self.cache_path}.lock", os.O_WRONLY | os.O_CREAT, 0o600
+        )
+        try:
+            fcntl.flock(file_descriptor, fcntl.LOCK_EX)
+            yield
+        finally:
+            fcntl.flock(file_descriptor, fcntl.LOCK_UN)
+            os.close(file_descriptor)
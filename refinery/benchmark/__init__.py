@@ -0,0 +1,388 @@
+# -*- coding: utf-8 -*-
+"""Benchmarks of the SDK against a local mock refinery server.
+
+Run them via `python -m refinery.benchmark --sizes 1000 10000 --output results.json`.
+"""
+
+import json
+import math
+import multiprocessing
+import os
+import platform
+import queue
+import re
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+from functools import partial
+from typing import Any, Callable, Dict, List, Optional, Tuple
+import numpy as np
+from refinery import api_calls
+from refinery.benchmark.server import (
+    LABEL_TASK,
+    PROJECT_ID,
+    TEXT_ATTRIBUTE,
+    MockRefineryServer,
+)
+
+try:
+    import resource
+except ImportError:  # not available on Windows
+    resource = None
+
+# seconds between checks whether a benchmark process is still alive
+RESULT_POLL_INTERVAL = 1.0
+# seconds `import refinery` may take before the benchmark suite fails
+MAX_IMPORT_TIME_DEFAULT = 1.0
+# heavy dependencies which are only imported on the code paths using them
+LAZY_IMPORTS = ("pandas", "spacy", "transformers", "torch", "boto3", "tqdm")
+
+
+def percentile(values: List[float], q: float) -> float:
+    """Computes the nearest-rank percentile of a list of values.
+
+    Args:
+        values (List[float]): Measured values.
+        q (float): Percentile between 0 and 100.
+
+    Returns:
+        float: The percentile.
+    """
+    ordered = sorted(values)
+    rank = max(0, math.ceil(q / 100 * len(ordered)) - 1)
+    return ordered[rank]
+
+
+def summarize_latencies(latencies: List[float]) -> Dict[str, float]:
+    return {
+        "min": min(latencies),
+        "mean": sum(latencies) / len(latencies),
+        "p50": percentile(latencies, 50),
+        "p95": percentile(latencies, 95),
+        "p99": percentile(latencies, 99),
+        "max": max(latencies),
+    }
+
+
+def get_peak_rss_mb() -> Optional[float]:
+    if resource is None:
+        return None
+    peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is reported in bytes on macOS and in kilobytes elsewhere
+    if sys.platform == "darwin":
+        return peak_rss / 1024**2
+    return peak_rss / 1024
+
+
+def _connect(uri: str):
+    from refinery import Client
+
+    return Client(
+        "benchmark@kern.ai",
+        "benchmark",
+        PROJECT_ID,
+        uri=uri,
+        retry_policy=api_calls.NO_RETRY,
+        use_token_cache=False,
+    )
+
+
+def bench_get_record_export(client, server_records: List[Dict[str, Any]]) -> Callable:
+    return lambda: client.get_record_export(tokenize=False)
+
+
+def bench_post_records(client, server_records: List[Dict[str, Any]]) -> Callable:
+    records = [
+        {"running_id": record["running_id"], TEXT_ATTRIBUTE: record[TEXT_ATTRIBUTE]}
+        for record in server_records
+    ]
+    return lambda: client.post_records(records)
+
+
+def bench_model_callback(client, server_records: List[Dict[str, Any]]) -> Callable:
+    from refinery.callbacks.inference import ModelCallback
+
+    callback = ModelCallback(
+        client,
+        "benchmark-model",
+        LABEL_TASK,
+        inference_fn=lambda inputs: [["greet", 0.9] for _ in inputs],
+    )
+    inputs = [record[TEXT_ATTRIBUTE] for record in server_records]
+    indices = [{"running_id": record["running_id"]} for record in server_records]
+    return lambda: callback.run(inputs, indices)
+
+
+def cpu_bound_inference(inputs: Any) -> List[List[Any]]:
+    # stands in for a CPU-bound model; elementwise numpy ops don't use extra threads
+    outputs = inputs
+    for _ in range(200):
+        outputs = np.tanh(outputs + 0.1)
+    return [["greet", float(confidence)] for confidence in outputs.mean(axis=1)]
+
+
+def bench_model_callback_parallel(
+    client, server_records: List[Dict[str, Any]], num_workers: int
+) -> Callable:
+    from refinery.callbacks.inference import ModelCallback
+
+    callback = ModelCallback(
+        client,
+        "benchmark-model",
+        LABEL_TASK,
+        inference_fn=cpu_bound_inference,
+        num_workers=num_workers,
+    )
+    inputs = np.random.default_rng(42).random(
+        (len(server_records), 64), dtype=np.float32
+    )
+    indices = [{"running_id": record["running_id"]} for record in server_records]
+    return lambda: callback.run(inputs, indices)
+
+
+def padded_inference(inputs: List[str]) -> List[List[Any]]:
+    # like a transformer, the cost of a batch grows with its longest input
+    width = max(len(text) for text in inputs)
+    outputs = np.ones((len(inputs), width * 64), dtype=np.float32)
+    for _ in range(50):
+        outputs = np.tanh(outputs)
+    return [["greet", 0.9] for _ in inputs]
+
+
+def bench_model_callback_padded(
+    client, server_records: List[Dict[str, Any]], bucket_by_length: bool
+) -> Callable:
+    from refinery.callbacks.inference import ModelCallback
+
+    callback = ModelCallback(
+        client, "benchmark-model", LABEL_TASK, inference_fn=padded_inference
+    )
+    inputs = [record[TEXT_ATTRIBUTE] for record in server_records]
+    indices = [{"running_id": record["running_id"]} for record in server_records]
+    if bucket_by_length:
+        return lambda: callback.run_by_length(inputs, indices)
+    return lambda: callback.run(inputs, indices)
+
+
+def bench_build_intent_yaml(client, server_records: List[Dict[str, Any]]) -> Callable:
+    from refinery.adapter import rasa
+
+    dir_name = tempfile.mkdtemp(prefix="refinery-benchmark-")
+    return lambda: rasa.build_intent_yaml(
+        client,
+        TEXT_ATTRIBUTE,
+        f"{LABEL_TASK}__WEAK_SUPERVISION",
+        dir_name=dir_name,
+    )
+
+
+BENCHMARKS: Dict[str, Callable] = {
+    "get_record_export": bench_get_record_export,
+    "post_records": bench_post_records,
+    "model_callback_run": bench_model_callback,
+    "model_callback_parallel_1": partial(bench_model_callback_parallel, num_workers=1),
+    "model_callback_parallel_2": partial(bench_model_callback_parallel, num_workers=2),
+    "model_callback_parallel_4": partial(bench_model_callback_parallel, num_workers=4),
+    "model_callback_padded": partial(
+        bench_model_callback_padded, bucket_by_length=False
+    ),
+    "model_callback_bucketed": partial(
+        bench_model_callback_padded, bucket_by_length=True
+    ),
+    "build_intent_yaml": bench_build_intent_yaml,
+}
+
+
+def _run_case(
+    name: str,
+    uri: str,
+    num_records: int,
+    repeats: int,
+    result_queue: multiprocessing.Queue,
+) -> None:
+    from wasabi import msg
+
+    msg.no_print = True
+    try:
+        from refinery.benchmark.server import build_records
+
+        client = _connect(uri)
+        run = BENCHMARKS[name](client, build_records(num_records))
+        # the first call pays for lazy imports and is not measured
+        run()
+        latencies = []
+        for _ in range(repeats):
+            start = time.perf_counter()
+            run()
+            latencies.append(time.perf_counter() - start)
+        result_queue.put(
+            {
+                "benchmark": name,
+                "num_records": num_records,
+                "repeats": repeats,
+                "latency_seconds": summarize_latencies(latencies),
+                "throughput_records_per_second": num_records
+                / (sum(latencies) / len(latencies)),
+                "peak_rss_mb": get_peak_rss_mb(),
+            }
+        )
+    except Exception as e:
+        result_queue.put(
+            {"benchmark": name, "num_records": num_records, "error": repr(e)}
+        )
+
+
+def run_case(
+    name: str,
+    uri: str,
+    num_records: int,
+    repeats: int,
+    timeout: Optional[float] = None,
+) -> Dict[str, Any]:
+    """Runs one benchmark in a fresh process, so that its peak RSS is measured in isolation.
+
+    If the process dies without a result (e.g. killed by the OOM killer) or exceeds
+    `timeout`, an error result is returned instead of waiting forever.
+
+    Args:
+        name (str): Name of the benchmark, one of `BENCHMARKS`.
+        uri (str): URI of the (mock) refinery server.
+        num_records (int): Number of records served by the server.
+        repeats (int): How often the benchmarked call is repeated.
+        timeout (Optional[float], optional): Seconds after which the process is terminated. Defaults to None.
+
+    Returns:
+        Dict[str, Any]: Latency, throughput and peak RSS of the benchmark.
+    """
+    context = multiprocessing.get_context("spawn")
+    result_queue = context.Queue()
+    process = context.Process(
+        target=_run_case, args=(name, uri, num_records, repeats, result_queue)
+    )
+    process.start()
+    started_at = time.monotonic()
+    result = None
+    while result is None:
+        try:
+            result = result_queue.get(timeout=RESULT_POLL_INTERVAL)
+        except queue.Empty:
+            if not process.is_alive():
+                # the result may have been sent right before the process exited
+                try:
+                    result = result_queue.get(timeout=RESULT_POLL_INTERVAL)
+                except queue.Empty:
+                    error = f"benchmark process exited with code {process.exitcode}"
+                    break
+            elif timeout is not None and time.monotonic() - started_at > timeout:
+                process.terminate()
+                error = f"benchmark exceeded the timeout of {timeout} seconds"
+                break
+    process.join()
+    if result is None:
+        result = {"benchmark": name, "num_records": num_records, "error": error}
+    return result
+
+
+def measure_import_time(module: str = "refinery") -> Dict[str, Any]:
+    """Measures the import time of a module in a fresh interpreter via `python -X importtime`.
+
+    Args:
+        module (str, optional): Module to import. Defaults to "refinery".
+
+    Returns:
+        Dict[str, Any]: Cumulative import time of the module, the slowest imported packages and the lazy dependencies imported anyway (see `find_eager_imports`).
+    """
+    completed = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    cumulative = {}
+    for line in completed.stderr.splitlines():
+        match = re.match(r"import time:\s+(\d+) \|\s+(\d+) \|(\s+)(\S+)", line)
+        if match is not None:
+            cumulative[match.group(4)] = int(match.group(2))
+    slowest = sorted(
+        ((name, us) for name, us in cumulative.items() if "." not in name),
+        key=lambda item: item[1],
+        reverse=True,
+    )[:10]
+    return {
+        "benchmark": "import_time",
+        "module": module,
+        "import_time_seconds": cumulative.get(module, 0) / 1e6,
+        "slowest_imports_seconds": {name: us / 1e6 for name, us in slowest},
+        "eager_imports": find_eager_imports(module),
+    }
+
+
+def find_eager_imports(
+    module: str = "refinery", lazy_imports: Tuple[str, ...] = LAZY_IMPORTS
+) -> List[str]:
+    """Imports a module in a fresh interpreter and lists which lazy dependencies it imported anyway.
+
+    Args:
+        module (str, optional): Module to import. Defaults to "refinery".
+        lazy_imports (Tuple[str, ...], optional): Packages that must not be imported. Defaults to `LAZY_IMPORTS`.
+
+    Returns:
+        List[str]: The packages of `lazy_imports` that were imported.
+    """
+    completed = subprocess.run(
+        [
+            sys.executable,
+            "-c",
+            f"import sys, {module}; print('\\n'.join(sys.modules))",
+        ],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    imported = set(completed.stdout.split())
+    return [name for name in lazy_imports if name in imported]
+
+
+def run_benchmarks(
+    sizes: List[int],
+    repeats: int = 3,
+    benchmarks: Optional[List[str]] = None,
+    timeout: Optional[float] = None,
+) -> Dict[str, Any]:
+    """Runs the benchmark suite against a local mock server for each data size.
+
+    Args:
+        sizes (List[int]): Numbers of records to benchmark with.
+        repeats (int, optional): How often each call is repeated. Defaults to 3.
+        benchmarks (Optional[List[str]], optional): Names of the benchmarks to run. Defaults to None; in that case, all benchmarks are run.
+        timeout (Optional[float], optional): Seconds after which a single benchmark is aborted. Defaults to None.
+
+    Returns:
+        Dict[str, Any]: Machine-readable results including metadata of the environment.
+    """
+    if benchmarks is None:
+        benchmarks = list(BENCHMARKS)
+    results = [measure_import_time()]
+    for num_records in sizes:
+        with MockRefineryServer(num_records=num_records) as server:
+            for name in benchmarks:
+                results.append(
+                    run_case(name, server.uri, num_records, repeats, timeout)
+                )
+    return {
+        "metadata": {
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "sdk_version": api_calls.version,
+            "python_version": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+        },
+        "results": results,
+    }
+
+
+def write_results(results: Dict[str, Any], path: str) -> None:
+    with open(path, "w") as file:
+        json.dump(results, file, indent=2)
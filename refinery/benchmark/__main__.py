@@ -0,0 +1,67 @@
+# -*- coding: utf-8 -*-
+import argparse
+import json
+import sys
+from wasabi import msg
+from refinery.benchmark import (
+    BENCHMARKS,
+    MAX_IMPORT_TIME_DEFAULT,
+    run_benchmarks,
+    write_results,
+)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        prog="python -m refinery.benchmark",
+        description="Benchmarks the refinery SDK against a local mock server.",
+    )
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000])
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument(
+        "--benchmarks", nargs="+", choices=list(BENCHMARKS), default=None
+    )
+    parser.add_argument("--output", help="Path of the JSON file to write results to.")
+    parser.add_argument(
+        "--timeout",
+        type=float,
+        default=None,
+        help="Abort a single benchmark after this many seconds.",
+    )
+    parser.add_argument(
+        "--max-import-time",
+        type=float,
+        default=MAX_IMPORT_TIME_DEFAULT,
+        help="Fail if `import refinery` takes longer than this many seconds.",
+    )
+    args = parser.parse_args()
+
+    results = run_benchmarks(args.sizes, args.repeats, args.benchmarks, args.timeout)
+    if args.output is not None:
+        write_results(results, args.output)
+        msg.good(f"Wrote benchmark results to {args.output}")
+    else:
+        print(json.dumps(results, indent=2))
+
+    failed = [result for result in results["results"] if "error" in result]
+    for result in failed:
+        msg.fail(f"{result['benchmark']} ({result['num_records']}): {result['error']}")
+
+    import_result = results["results"][0]
+    import_time = import_result["import_time_seconds"]
+    if import_time > args.max_import_time:
+        msg.fail(
+            f"`import refinery` took {import_time:.3f}s, more than the allowed {args.max_import_time:.3f}s."
+        )
+        sys.exit(1)
+    if import_result["eager_imports"]:
+        msg.fail(
+            f"`import refinery` imported {', '.join(import_result['eager_imports'])}, which should be imported lazily."
+        )
+        sys.exit(1)
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,271 @@
+# -*- coding: utf-8 -*-
+import json
+import random
+import re
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional
+from urllib.parse import parse_qs, urlparse
+
+PROJECT_ID = "benchmark-project"
+SESSION_TOKEN = "benchmark-session-token"
+TEXT_ATTRIBUTE = "text"
+LABEL_TASK = "__intent"
+INTENTS = ["greet", "goodbye", "check_balance", "transfer_money", "affirm", "deny"]
+WORDS = [
+    "how",
+    "much",
+    "money",
+    "is",
+    "on",
+    "my",
+    "savings",
+    "account",
+    "please",
+    "transfer",
+    "to",
+    "checking",
+    "hello",
+    "bye",
+    "yes",
+    "no",
+    "credit",
+    "card",
+]
+
+
+def build_records(num_records: int, seed: int = 42) -> List[Dict[str, Any]]:
+    """Builds deterministic records in the shape of a refinery export.
+
+    Args:
+        num_records (int): Number of records.
+        seed (int, optional): Seed of the random generator. Defaults to 42.
+
+    Returns:
+        List[Dict[str, Any]]: Records with a primary key, a text attribute and one labeling task.
+    """
+    rng = random.Random(seed)
+    records = []
+    for idx in range(num_records):
+        intent = rng.choice(INTENTS)
+        records.append(
+            {
+                "running_id": idx,
+                TEXT_ATTRIBUTE: " ".join(rng.choices(WORDS, k=rng.randint(3, 20))),
+                f"{LABEL_TASK}__MANUAL": intent if rng.random() < 0.2 else None,
+                f"{LABEL_TASK}__WEAK_SUPERVISION": intent,
+                f"{LABEL_TASK}__WEAK_SUPERVISION__confidence": f"{rng.random():.4f}",
+            }
+        )
+    return records
+
+
+class MockRefineryServer:
+    """Local stand-in for a refinery instance, serving the endpoints used by the SDK.
+
+    Usable as context manager; the server listens on a free port of 127.0.0.1.
+
+    Args:
+        num_records (int, optional): Number of records served by the export endpoint. Defaults to 1000.
+        num_lookup_terms (int, optional): Number of terms of the served lookup list. Defaults to 100.
+        supports_sampling (bool, optional): If False, the sampling parameters of the export are ignored, like older refinery versions do. Defaults to True.
+    """
+
+    def __init__(
+        self,
+        num_records: int = 1000,
+        num_lookup_terms: int = 100,
+        supports_sampling: bool = True,
+    ):
+        self.records = build_records(num_records)
+        self.supports_sampling = supports_sampling
+        self.project_details = {
+            "id": PROJECT_ID,
+            "name": "benchmark",
+            "description": "Project served by the refinery benchmark server",
+            "tokenizer": "en_core_web_sm",
+            "attributes": [
+                {"name": "running_id", "data_type": "INTEGER", "is_primary_key": True},
+                {"name": TEXT_ATTRIBUTE, "data_type": "TEXT", "is_primary_key": False},
+            ],
+            "knowledge_base_ids": ["benchmark-lookup-list"],
+        }
+        self.lookup_list = {
+            "id": "benchmark-lookup-list",
+            "name": "account",
+            "terms": [{"value": f"term {idx}"} for idx in range(num_lookup_terms)],
+        }
+        # serialized once, so the server is not the bottleneck of the export benchmark
+        self.export_body = json.dumps(self.records).encode()
+        self.requests_received = 0
+        self.bytes_received = 0
+        self._lock = threading.Lock()
+        self._server = None
+        self._thread = None
+
+    @property
+    def uri(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> "MockRefineryServer":
+        handler = type("Handler", (_Handler,), {"mock": self})
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+    def __enter__(self) -> "MockRefineryServer":
+        return self.start()
+
+    def __exit__(self, *args) -> None:
+        self.stop()
+
+    def build_export(self, query: Dict[str, List[str]]) -> Any:
+        """Applies the supported export parameters `offset`, `num_samples`, `attributes`, `dropna` and, if `supports_sampling` is set, `sample_size`, `seed` and `stratify_by`."""
+        if not query:
+            return self.export_body
+        records = self.records
+        sampled = self.supports_sampling and "sample_size" in query
+        if sampled:
+            from refinery.export import sample_records
+
+            seed = int(query["seed"][0]) if "seed" in query else None
+            stratify_by = query.get("stratify_by", [None])[0]
+            if query.get("dropna") == ["true"]:
+                records = [
+                    record
+                    for record in records
+                    if all(
+                        record.get(name) is not None
+                        for name in query.get("attributes", record.keys())
+                    )
+                ]
+            records = sample_records(
+                records, int(query["sample_size"][0]), seed, stratify_by
+            )
+        if "offset" in query:
+            records = records[int(query["offset"][0]) :]
+        if "num_samples" in query:
+            records = records[: int(query["num_samples"][0])]
+        attributes = query.get("attributes")
+        if attributes is not None:
+            records = [
+                {name: record.get(name) for name in attributes} for record in records
+            ]
+        if query.get("dropna") == ["true"] and not sampled:
+            records = [
+                record
+                for record in records
+                if all(value is not None for value in record.values())
+            ]
+        return records
+
+    def get_records(self, body: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """Looks up records by `running_id`, optionally projected to `attributes`."""
+        records = []
+        for key in body["keys"]:
+            running_id = key.get("running_id")
+            if isinstance(running_id, int) and 0 <= running_id < len(self.records):
+                records.append(self.records[running_id])
+        attributes = body.get("attributes")
+        if attributes is not None:
+            records = [
+                {name: record.get(name) for name in attributes} for record in records
+            ]
+        return records
+
+    def count_request(self, num_bytes: int) -> None:
+        with self._lock:
+            self.requests_received += 1
+            self.bytes_received += num_bytes
+
+
+def _get_project_path(path: str) -> Optional[str]:
+    match = re.match(r"/api/project/[^/]+", path)
+    return match.group(0) if match is not None else None
+
+
+class _Handler(BaseHTTPRequestHandler):
+    mock: MockRefineryServer
+    protocol_version = "HTTP/1.1"
+    # headers and body are written separately; with Nagle's algorithm, every response
+    # of a kept-alive connection would wait for the client's delayed ACK
+    disable_nagle_algorithm = True
+
+    def log_message(self, *args) -> None:
+        pass
+
+    def _send(self, body: Any, status_code: int = 200) -> None:
+        if not isinstance(body, bytes):
+            body = json.dumps(body).encode()
+        self.send_response(status_code)
+        self.send_header("content-type", "application/json")
+        self.send_header("content-length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _read_body(self) -> Optional[Dict[str, Any]]:
+        length = int(self.headers.get("content-length", 0))
+        content = self.rfile.read(length) if length > 0 else b""
+        self.mock.count_request(length)
+        return json.loads(content) if content else None
+
+    def _is_authorized(self) -> bool:
+        if self.headers.get("authorization") == f"Bearer {SESSION_TOKEN}":
+            return True
+        self._send({"error_code": "UNRECOGNIZED_USER"}, 401)
+        return False
+
+    def do_GET(self) -> None:
+        self.mock.count_request(0)
+        parsed = urlparse(self.path)
+        path = parsed.path
+        if path == "/.ory/kratos/public/self-service/login/api":
+            host, port = self.server.server_address[:2]
+            return self._send(
+                {"ui": {"action": f"http://{host}:{port}/.ory/kratos/public/login"}}
+            )
+        if not self._is_authorized():
+            return
+        # every project id is served with the same data
+        project_path = _get_project_path(path)
+        if path == project_path:
+            return self._send(self.mock.project_details)
+        if path == f"{project_path}/export":
+            return self._send(self.mock.build_export(parse_qs(parsed.query)))
+        if re.fullmatch(f"{project_path}/lookup_list/[^/]+", path):
+            return self._send(self.mock.lookup_list)
+        if path == f"{project_path}/import/base_config":
+            return self._send({"KERN_S3_ENDPOINT": None})
+        if re.fullmatch(f"{project_path}/import/task/[^/]+", path):
+            return self._send({"state": "DONE", "progress": 100.0})
+        self._send({"error_code": "NOT_FOUND"}, 404)
+
+    def do_POST(self) -> None:
+        body = self._read_body()
+        path = urlparse(self.path).path
+        if path == "/.ory/kratos/public/login":
+            return self._send(
+                {
+                    "session_token": SESSION_TOKEN,
+                    "session": {"expires_at": "2099-01-01T00:00:00Z"},
+                }
+            )
+        if not self._is_authorized():
+            return
+        project_path = _get_project_path(path)
+        if path == f"{project_path}/import_json":
+            return self._send({"num_records": len(body.get("records", []))})
+        if path == f"{project_path}/records":
+            return self._send(self.mock.get_records(body))
+        if path == f"{project_path}/associations":
+            return self._send({"num_associations": len(body.get("associations", []))})
+        self._send({"error_code": "NOT_FOUND"}, 404)
@@ -1,7 +1,79 @@
 from email.generator import Generator
-from typing import Any, Callable, Dict, List, Optional
-import pandas as pd
+import json
+import os
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from itertools import islice
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
 from refinery import Client, exceptions
+from refinery.associations import AssociationWriter
+
+BATCH_SIZE = 32
+# tasks submitted to the process pool per worker before the oldest one is awaited
+MAX_PENDING_TASKS_PER_WORKER = 2
+
+# state of the inference worker processes, set once per process by the initializer
+_worker_state: Dict[str, Any] = {}
+
+
+def _to_json_serializable(value: Any) -> Any:
+    # model outputs often contain numpy scalars or arrays
+    if hasattr(value, "tolist"):
+        return value.tolist()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def _is_numeric_array(inputs: Any) -> bool:
+    import numpy as np
+
+    return isinstance(inputs, np.ndarray) and inputs.dtype.kind in "biuf"
+
+
+def _share_array(array: Any) -> Tuple[Any, Tuple[str, Tuple[int, ...], str]]:
+    import numpy as np
+    from multiprocessing import shared_memory
+
+    buffer = shared_memory.SharedMemory(create=True, size=max(1, array.nbytes))
+    np.ndarray(array.shape, dtype=array.dtype, buffer=buffer.buf)[:] = array
+    return buffer, (buffer.name, array.shape, array.dtype.str)
+
+
+def _check_lengths(inputs: Any, indices: List[Dict[str, Any]]) -> None:
+    # sparse matrices have no len
+    num_inputs = inputs.shape[0] if hasattr(inputs, "shape") else len(inputs)
+    if num_inputs != len(indices):
+        raise ValueError(f"Got {num_inputs} inputs, but {len(indices)} indices.")
+
+
+def _batch_bounds(num_records: int) -> List[Tuple[int, int]]:
+    return [
+        (start, min(start + BATCH_SIZE, num_records))
+        for start in range(0, num_records, BATCH_SIZE)
+    ]
+
+
+def _initialize_worker(
+    inference_fn: Callable, shared_inputs: Optional[Tuple[str, Tuple[int, ...], str]]
+) -> None:
+    _worker_state["inference_fn"] = inference_fn
+    if shared_inputs is not None:
+        import numpy as np
+        from multiprocessing import shared_memory
+
+        name, shape, dtype = shared_inputs
+        buffer = shared_memory.SharedMemory(name=name)
+        # the buffer must stay referenced as long as the array is used
+        _worker_state["buffer"] = buffer
+        _worker_state["inputs"] = np.ndarray(shape, dtype=dtype, buffer=buffer.buf)
+
+
+def _infer_batches(batches: List[Any]) -> List[Any]:
+    return [_worker_state["inference_fn"](batched_inputs) for batched_inputs in batches]
+
+
+def _infer_shared_slices(bounds: List[Tuple[int, int]]) -> List[Any]:
+    inputs = _worker_state["inputs"]
+    return [_worker_state["inference_fn"](inputs[start:stop]) for start, stop in bounds]
 
 
 class ModelCallback:
@@ -14,7 +86,8 @@ class ModelCallback:
         initialize_fn: Optional[Callable] = None,
         preprocessing_fn: Optional[Callable] = None,
         postprocessing_fn: Optional[Callable] = None,
-        **kwargs
+        num_workers: Optional[int] = None,
+        **kwargs,
     ):
         """
 
@@ -26,6 +99,7 @@ class ModelCallback:
             initialize_fn (Optional[Callable], optional): Function to execute to compute internal states. Defaults to None.
             preprocessing_fn (Optional[Callable], optional): Function to preprocess model inputs. Defaults to None.
             postprocessing_fn (Optional[Callable], optional): Function to postprocess model outputs. Defaults to None.
+            num_workers (Optional[int], optional): If set, `run` shards the inference across this many processes, see `run_parallel`. Defaults to None.
         """
         self.model_name = model_name
         self.label_task_name = label_task_name
@@ -35,22 +109,32 @@ class ModelCallback:
         self.preprocessing_fn = preprocessing_fn
         self.postprocessing_fn = postprocessing_fn
         self.primary_keys = client.get_primary_keys()
+        self.num_workers = num_workers
         self.kwargs = kwargs
 
     @staticmethod
-    def __batch(documents: List[Any]) -> Generator:
-        """Batch documents into chunks of BATCH_SIZE.
+    def __batch(records: Iterable[Any]) -> Generator:
+        """Batch records into chunks of BATCH_SIZE without materializing the iterable.
 
         Args:
-            documents (List[Any]): List of documents
+            records (Iterable[Any]): Iterable of records
 
         Yields:
             Generator: Generator of batches
         """
-        BATCH_SIZE = 32
-        length = len(documents)
-        for idx in range(0, length, BATCH_SIZE):
-            yield documents[idx : min(idx + BATCH_SIZE, length)]
+        iterator = iter(records)
+        while True:
+            batch = list(islice(iterator, BATCH_SIZE))
+            if not batch:
+                return
+            yield batch
+
+    def __validate_indices(self, indices: List[Dict[str, Any]]) -> None:
+        for index in indices:
+            if not all(key in index for key in self.primary_keys):
+                raise exceptions.PrimaryKeyError(
+                    "Errorneous primary keys given for index."
+                )
 
     def initialize(
         self, inputs: Optional[List[Any]], labels: Optional[List[Any]] = None
@@ -64,33 +148,252 @@ class ModelCallback:
         if self.initialize_fn:
             self.kwargs = self.initialize_fn(inputs, labels, **self.kwargs)
 
-    def run(self, inputs: List[Any], indices: List[Dict[str, Any]]) -> None:
+    def run(self, inputs: Any, indices: List[Dict[str, Any]]) -> None:
         """Run the pipeline and send the results to refinery.
 
+        Args:
+            inputs (Any): Inputs that can be sliced, e.g. a list, a numpy array or a sparse matrix
+            indices (List[Dict[str, Any]]): List of indices
+
+        Raises:
+            ValueError: If the number of inputs and indices differ
+            exceptions.PrimaryKeyError: If the primary key is not found in the indices
+        """
+        _check_lengths(inputs, indices)
+        if self.num_workers is not None:
+            self.run_parallel(inputs, indices, self.num_workers)
+            return
+        self.__validate_indices(indices)
+        with self.client.association_writer() as writer:
+            # slicing keeps arrays and sparse matrices intact, instead of splitting them into rows
+            for start, stop in _batch_bounds(len(indices)):
+                batched_outputs = self.__process_batch(inputs[start:stop], stop - start)
+                self.__post_batch(writer, batched_outputs, indices[start:stop])
+
+    def run_parallel(
+        self,
+        inputs: Any,
+        indices: List[Dict[str, Any]],
+        num_workers: Optional[int] = None,
+    ) -> None:
+        """Run the inference in a process pool and send the results to refinery in order.
+
+        Pre- and postprocessing run in the calling process. If there is no preprocessing
+        and `inputs` is a numeric numpy array, it is placed in shared memory once instead
+        of being pickled batch by batch. Batches are only preprocessed and submitted while
+        fewer than two tasks per worker are pending, so memory doesn't grow with the inputs. `inference_fn` must be picklable (e.g. a bound
+        method of a model or a module-level function) on platforms that spawn workers.
+
+        Args:
+            inputs (Any): Inputs that can be sliced, e.g. a list or a numpy array
+            indices (List[Dict[str, Any]]): List of indices
+            num_workers (Optional[int], optional): Number of worker processes. Defaults to None; in that case, the number of CPUs is used.
+
+        Raises:
+            ValueError: If the number of inputs and indices differ
+            exceptions.PrimaryKeyError: If the primary key is not found in the indices
+        """
+        _check_lengths(inputs, indices)
+        self.__validate_indices(indices)
+        if num_workers is None:
+            num_workers = os.cpu_count() or 1
+        bounds = _batch_bounds(len(indices))
+        # fewer, larger tasks keep the inter-process overhead low
+        chunksize = max(1, len(bounds) // (num_workers * 4))
+        tasks = [
+            bounds[idx : idx + chunksize] for idx in range(0, len(bounds), chunksize)
+        ]
+
+        shared_memory = None
+        shared_inputs = None
+        if self.preprocessing_fn is None and _is_numeric_array(inputs):
+            shared_memory, shared_inputs = _share_array(inputs)
+        try:
+            with ProcessPoolExecutor(
+                max_workers=num_workers,
+                initializer=_initialize_worker,
+                initargs=(self.inference_fn, shared_inputs),
+            ) as executor, self.client.association_writer() as writer:
+                pending = deque()
+                for task_bounds in tasks:
+                    if shared_inputs is not None:
+                        future = executor.submit(_infer_shared_slices, task_bounds)
+                    else:
+                        future = executor.submit(
+                            _infer_batches,
+                            [
+                                self.__preprocess(inputs[start:stop])
+                                for start, stop in task_bounds
+                            ],
+                        )
+                    pending.append((task_bounds, future))
+                    # the oldest task is awaited first, so outputs are sent in order
+                    if len(pending) >= MAX_PENDING_TASKS_PER_WORKER * num_workers:
+                        self.__post_task(writer, *pending.popleft(), indices)
+                while pending:
+                    self.__post_task(writer, *pending.popleft(), indices)
+        finally:
+            if shared_memory is not None:
+                shared_memory.close()
+                shared_memory.unlink()
+
+    def run_by_length(
+        self,
+        inputs: List[Any],
+        indices: List[Dict[str, Any]],
+        lengths: Optional[List[int]] = None,
+    ) -> None:
+        """Run the pipeline on batches of inputs with similar length, and send the results in the original order.
+
+        Models padding each batch to its longest input (e.g. transformers) waste less
+        compute on padding this way. The postprocessed outputs of a batch must contain
+        one entry per input.
+
         Args:
             inputs (List[Any]): List of inputs
             indices (List[Dict[str, Any]]): List of indices
+            lengths (Optional[List[int]], optional): Length of each input, e.g. its number of tokens. Defaults to None; in that case, `len` of the inputs is used.
 
         Raises:
             exceptions.PrimaryKeyError: If the primary key is not found in the indices
         """
-        indices_df = pd.DataFrame(indices)
-        if not all([key in indices_df.columns for key in self.primary_keys]):
-            raise exceptions.PrimaryKeyError("Errorneous primary keys given for index.")
+        self.__validate_indices(indices)
+        if lengths is None:
+            lengths = [len(input) for input in inputs]
+        order = sorted(range(len(inputs)), key=lengths.__getitem__)
+
+        outputs = [None] * len(inputs)
+        for positions in ModelCallback.__batch(order):
+            batched_outputs = self.__process_batch(
+                [inputs[position] for position in positions], len(positions)
+            )
+            for position, output in zip(positions, batched_outputs):
+                outputs[position] = output
 
-        index_generator = ModelCallback.__batch(indices)
-        for batched_inputs in ModelCallback.__batch(inputs):
-            batched_indices = next(index_generator)
+        with self.client.association_writer() as writer:
+            for start in range(0, len(indices), BATCH_SIZE):
+                self.__post_batch(
+                    writer,
+                    outputs[start : start + BATCH_SIZE],
+                    indices[start : start + BATCH_SIZE],
+                )
+
+    def run_stream(
+        self,
+        records: Iterable[Tuple[Any, Dict[str, Any]]],
+        spool_to: Optional[str] = None,
+    ) -> int:
+        """Run the pipeline on an iterable of (input, index) pairs, batch by batch.
 
-            if self.preprocessing_fn is not None:
-                batched_inputs = self.preprocessing_fn(batched_inputs, **self.kwargs)
+        Only one batch is held in memory at a time, so generators over very large
+        datasets can be scored. If `spool_to` is set, the outputs are appended to
+        this file instead of being sent, and can be uploaded later with `upload_spool`.
 
+        Args:
+            records (Iterable[Tuple[Any, Dict[str, Any]]]): Pairs of input and index
+            spool_to (Optional[str], optional): Path of an append-only JSON lines file for the outputs. Defaults to None.
+
+        Raises:
+            exceptions.PrimaryKeyError: If the primary key is not found in the indices
+
+        Returns:
+            int: Number of processed records
+        """
+        spool_file = open(spool_to, "a") if spool_to is not None else None
+        writer = self.client.association_writer()
+        num_records = 0
+        try:
+            for batch in ModelCallback.__batch(records):
+                batched_inputs = [input for input, _ in batch]
+                batched_indices = [index for _, index in batch]
+                self.__validate_indices(batched_indices)
+
+                batched_outputs = self.__process_batch(
+                    batched_inputs, len(batched_indices)
+                )
+
+                if spool_file is not None:
+                    spool_file.write(
+                        json.dumps(
+                            {
+                                "associations": batched_outputs,
+                                "indices": batched_indices,
+                            },
+                            default=_to_json_serializable,
+                        )
+                        + "\n"
+                    )
+                    spool_file.flush()
+                else:
+                    self.__post_batch(writer, batched_outputs, batched_indices)
+                num_records += len(batched_indices)
+        finally:
+            writer.flush()
+            if spool_file is not None:
+                spool_file.close()
+        return num_records
+
+    def upload_spool(self, spool_path: str) -> int:
+        """Send the outputs spooled by `run_stream` to refinery, one batch at a time.
+
+        Args:
+            spool_path (str): Path of the spool file
+
+        Returns:
+            int: Number of uploaded records
+        """
+        num_records = 0
+        with self.client.association_writer() as writer:
+            with open(spool_path, "r") as spool_file:
+                for line in spool_file:
+                    if not line.strip():
+                        continue
+                    batch = json.loads(line)
+                    self.__post_batch(writer, batch["associations"], batch["indices"])
+                    num_records += len(batch["indices"])
+        return num_records
+
+    def __process_batch(self, batched_inputs: List[Any], num_records: int) -> Any:
+        batched_inputs = self.__preprocess(batched_inputs)
+        with self.client.instrumentation.stage(
+            "callback.inference", num_records=num_records
+        ):
             batched_outputs = self.inference_fn(batched_inputs)
+        return self.__postprocess(batched_outputs)
+
+    def __preprocess(self, batched_inputs: Any) -> Any:
+        if self.preprocessing_fn is None:
+            return batched_inputs
+        with self.client.instrumentation.stage("callback.preprocessing"):
+            return self.preprocessing_fn(batched_inputs, **self.kwargs)
 
-            if self.postprocessing_fn is not None:
-                batched_outputs = self.postprocessing_fn(batched_outputs, **self.kwargs)
+    def __postprocess(self, batched_outputs: Any) -> Any:
+        if self.postprocessing_fn is None:
+            return batched_outputs
+        with self.client.instrumentation.stage("callback.postprocessing"):
+            return self.postprocessing_fn(batched_outputs, **self.kwargs)
+
+    def __post_task(
+        self,
+        writer: AssociationWriter,
+        task_bounds: List[Tuple[int, int]],
+        future: Future,
+        indices: List[Dict[str, Any]],
+    ) -> None:
+        for (start, stop), batched_outputs in zip(task_bounds, future.result()):
+            self.__post_batch(
+                writer, self.__postprocess(batched_outputs), indices[start:stop]
+            )
 
-            self.client.post_associations(
+    def __post_batch(
+        self,
+        writer: AssociationWriter,
+        batched_outputs: Any,
+        batched_indices: List[Dict[str, Any]],
+    ) -> None:
+        # the writer coalesces the batches into large requests
+        with self.client.instrumentation.stage("callback.post_associations"):
+            writer.add(
                 batched_outputs,
                 batched_indices,
                 self.model_name,
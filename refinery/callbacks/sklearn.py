@@ -1,4 +1,5 @@
-from typing import List, Any, Dict
+from typing import List, Any, Dict, Optional
+import numpy as np
 from refinery import Client
 from refinery.callbacks.inference import ModelCallback
 from sklearn.base import BaseEstimator
@@ -9,13 +10,12 @@ def initialize_fn(inputs, labels, **kwargs):
 
 
 def postprocessing_fn(outputs, **kwargs):
-    named_outputs = []
-    for prediction in outputs:
-        pred_index = prediction.argmax()
-        label = kwargs["clf"].classes_[pred_index]
-        confidence = prediction[pred_index]
-        named_outputs.append([label, confidence])
-    return named_outputs
+    pred_indices = outputs.argmax(axis=1)
+    # tolist converts numpy scalars (e.g. float32 probabilities of sparse float32
+    # inputs, integer classes) to JSON-serializable Python values
+    labels = kwargs["clf"].classes_[pred_indices].tolist()
+    confidences = outputs[np.arange(len(outputs)), pred_indices].tolist()
+    return [[label, confidence] for label, confidence in zip(labels, confidences)]
 
 
 class SklearnCallback(ModelCallback):
@@ -24,6 +24,7 @@ class SklearnCallback(ModelCallback):
         client: Client,
         sklearn_model: BaseEstimator,
         labeling_task_name: str,
+        num_workers: Optional[int] = None,
     ) -> None:
         """Callback for sklearn models.
 
@@ -31,6 +32,7 @@ class SklearnCallback(ModelCallback):
             client (Client): Refinery client
             sklearn_model (BaseEstimator): Sklearn model
             labeling_task_name (str): Name of the labeling task
+            num_workers (Optional[int], optional): If set, `predict_proba` runs in this many processes. Defaults to None.
         """
 
         super().__init__(
@@ -40,6 +42,7 @@ class SklearnCallback(ModelCallback):
             inference_fn=sklearn_model.predict_proba,
             initialize_fn=initialize_fn,
             postprocessing_fn=postprocessing_fn,
+            num_workers=num_workers,
         )
         self.sklearn_model = sklearn_model
         self.initialized = False
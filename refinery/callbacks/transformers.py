@@ -1,6 +1,8 @@
+from functools import partial
 from typing import List, Any, Dict
+from wasabi import msg
 from refinery import Client
-from refinery.callbacks.inference import ModelCallback
+from refinery.callbacks.inference import BATCH_SIZE, ModelCallback
 from transformers import pipeline
 
 
@@ -18,6 +20,22 @@ def postprocessing_fn(outputs, **kwargs):
     return named_outputs
 
 
+def quantize_model(transformer_model: pipeline) -> None:
+    """Quantizes the linear layers of a pipeline's model to int8 dynamically, if it runs on CPU.
+
+    Args:
+        transformer_model (pipeline): HuggingFace pipeline
+    """
+    import torch
+
+    if transformer_model.device.type != "cpu":
+        msg.warn("Dynamic quantization only applies on CPU; the model is unchanged.")
+        return
+    transformer_model.model = torch.quantization.quantize_dynamic(
+        transformer_model.model, {torch.nn.Linear}, dtype=torch.qint8
+    )
+
+
 class TransformerCallback(ModelCallback):
     def __init__(
         self,
@@ -25,23 +43,37 @@ class TransformerCallback(ModelCallback):
         transformer_model: pipeline,
         labeling_task_name: str,
         mapping: Dict[str, str],
+        bucket_by_length: bool = False,
+        quantize: bool = False,
     ) -> None:
-        """Callback for sklearn models.
+        """Callback for HuggingFace pipelines.
 
         Args:
             client (Client): Refinery client
-            sklearn_model (BaseEstimator): Sklearn model
+            transformer_model (pipeline): HuggingFace pipeline
             labeling_task_name (str): Name of the labeling task
+            mapping (Dict[str, str]): Mapping of the model labels to the labels of the task
+            bucket_by_length (bool, optional): If True, inputs are sorted by their number of tokens and passed to the pipeline in batches of 32, so little is padded. Defaults to False.
+            quantize (bool, optional): If True, the linear layers of the model are quantized to int8 dynamically; only applies on CPU. Defaults to False.
         """
 
+        if quantize:
+            quantize_model(transformer_model)
+        if bucket_by_length:
+            # the pipeline pads each batch to its longest input
+            inference_fn = partial(transformer_model.__call__, batch_size=BATCH_SIZE)
+        else:
+            inference_fn = transformer_model.__call__
+
         super().__init__(
             client,
             transformer_model.__class__.__name__,
             labeling_task_name,
-            inference_fn=transformer_model.__call__,
+            inference_fn=inference_fn,
             initialize_fn=initialize_fn,
             postprocessing_fn=postprocessing_fn,
         )
+        self.bucket_by_length = bucket_by_length
         self.sklearn_model = transformer_model
         self.initialized = False
         self.kwargs = {"mapping": mapping}
@@ -50,4 +82,12 @@ class TransformerCallback(ModelCallback):
         if not self.initialized:
             self.initialize(None, None)
             self.initialized = True
-        super().run(inputs, indices)
+        if self.bucket_by_length:
+            tokenizer = self.sklearn_model.tokenizer
+            lengths = [
+                len(ids)
+                for ids in tokenizer(list(inputs), truncation=True)["input_ids"]
+            ]
+            self.run_by_length(inputs, indices, lengths)
+        else:
+            super().run(inputs, indices)
@@ -1,4 +1,5 @@
 from refinery import Client
+import re
 import sys
 from wasabi import msg
 
@@ -10,6 +11,16 @@ def pull():
     client.get_record_export(download_to=download_to)
 
 
+def sync(snapshot_path=None):
+    client = Client.from_secrets_file("secrets.json")
+    if snapshot_path is None:
+        project_name = client.get_project_details()["name"]
+        # the name may contain e.g. "/" or "..", which must not leave the directory
+        file_name = re.sub(r"[^\w\-]+", "_", project_name).strip("_")
+        snapshot_path = f"{file_name or client.project_id}.db"
+    client.sync_snapshot(snapshot_path)
+
+
 def push(file_path):
     client = Client.from_secrets_file("secrets.json")
     client.post_file_import(file_path)
@@ -22,6 +33,9 @@ def help():
     msg.info(
         "- rsdk pull: Download the record export of the project defined in `settings.json` to your local storage."
     )
+    msg.info(
+        "- rsdk sync [path]: Create or update an indexed local snapshot (SQLite) of the project defined in `settings.json`, which adapters can read from."
+    )
     msg.info(
         "- rsdk push <path>: Upload a record file to the project defined in `settings.json` from your local storage."
     )
@@ -37,6 +51,11 @@ def main():
         command = cli_args[0]
         if command == "pull":
             pull()
+        elif command == "sync":
+            if len(cli_args) > 2:
+                msg.fail("Please provide at most one path when running rsdk sync.")
+            else:
+                sync(cli_args[1] if len(cli_args) == 2 else None)
         elif command == "push":
             if len(cli_args) != 2:
                 msg.fail("Please provide a path to a file when running rsdk push.")
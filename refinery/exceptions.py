@@ -1,5 +1,5 @@
 # -*- coding: utf-8 -*-
-from typing import Optional
+from typing import Any, Dict, List, Optional
 
 
 class LocalError(Exception):
@@ -14,6 +14,32 @@ class PrimaryKeyError(LocalError):
     pass
 
 
+class UnsupportedServerFeatureError(LocalError):
+    pass
+
+
+class SchemaValidationError(LocalError):
+    def __init__(self, problems: List[str], num_records: int):
+        self.problems = problems
+        self.num_records = num_records
+        super().__init__(
+            f"{len(problems)} problem(s) found in {num_records} records:\n"
+            + "\n".join(f"- {problem}" for problem in problems)
+        )
+
+
+class MultiProjectError(LocalError):
+    def __init__(self, errors: Dict[str, Exception], results: Dict[str, Any]):
+        self.errors = errors
+        self.results = results
+        super().__init__(
+            f"{len(errors)} project(s) failed: "
+            + ", ".join(
+                f"{project_id} ({error!r})" for project_id, error in errors.items()
+            )
+        )
+
+
 # https://developer.mozilla.org/en-US/docs/Web/HTTP/Status#client_error_responses
 class APIError(Exception):
     def __init__(self, project_id: str, message: Optional[str] = None):
@@ -0,0 +1,366 @@
+# -*- coding: utf-8 -*-
+import functools
+import random
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    Dict,
+    Hashable,
+    Iterable,
+    List,
+    Optional,
+    Tuple,
+)
+from wasabi import msg
+import pandas as pd
+from refinery.instrumentation import NOOP, Instrumentation
+
+if TYPE_CHECKING:
+    from spacy.language import Language
+
+TOKENIZED_SUFFIX = "__tokenized"
+CONFIDENCE_SUFFIX = "__confidence"
+LABEL_SUFFIXES = ("__MANUAL", "__WEAK_SUPERVISION")
+
+
+def get_tokenize_attributes(
+    project_details: Dict[str, Any], keep_attributes: Optional[List[str]] = None
+) -> List[str]:
+    """Collects the names of all attributes that can be tokenized.
+
+    Args:
+        project_details (Dict[str, Any]): project details as returned by the API.
+        keep_attributes (Optional[List[str]], optional): If set, only attributes whose tokenized column is kept are returned. Defaults to None.
+
+    Returns:
+        List[str]: names of the TEXT attributes of the project.
+    """
+    tokenize_attributes = []
+    for attribute in project_details["attributes"]:
+        if attribute["data_type"] == "TEXT":
+            name = attribute["name"]
+            if (
+                keep_attributes is None
+                or f"{name}{TOKENIZED_SUFFIX}" in keep_attributes
+            ):
+                tokenize_attributes.append(name)
+    return tokenize_attributes
+
+
+def build_export_query_params(
+    keep_attributes: Optional[List[str]] = None,
+    dropna: Optional[bool] = False,
+    sample_size: Optional[int] = None,
+    seed: Optional[int] = None,
+    stratify_by: Optional[str] = None,
+) -> Dict[str, Any]:
+    """Builds the query parameters for column projection, null filtering and sampling on the server.
+
+    Tokenized columns are computed locally, so their source attribute is requested instead.
+
+    Args:
+        keep_attributes (Optional[List[str]], optional): Columns to keep. Defaults to None.
+        dropna (Optional[bool], optional): If True, rows containing null values are dropped. Defaults to False.
+        sample_size (Optional[int], optional): If set, a random sample of this many records is requested. Defaults to None.
+        seed (Optional[int], optional): Seed of the random sample. Defaults to None.
+        stratify_by (Optional[str], optional): Column whose value distribution the sample keeps. Defaults to None.
+
+    Returns:
+        Dict[str, Any]: query parameters for the export endpoint.
+    """
+    query_params = {}
+    if keep_attributes is not None:
+        attributes = []
+        for name in keep_attributes:
+            if name.endswith(TOKENIZED_SUFFIX):
+                name = name[: -len(TOKENIZED_SUFFIX)]
+            if name not in attributes:
+                attributes.append(name)
+        query_params["attributes"] = attributes
+    if dropna:
+        query_params["dropna"] = "true"
+    if sample_size is not None:
+        query_params["sample_size"] = sample_size
+        if seed is not None:
+            query_params["seed"] = seed
+        if stratify_by is not None:
+            query_params["stratify_by"] = stratify_by
+    return query_params
+
+
+class ReservoirSampler:
+    """Draws a uniform random sample of fixed size from a stream of records in a single pass.
+
+    With `stratify_by`, one reservoir is kept per value of that column, and the sample is
+    allocated proportionally to the number of records seen per value (largest remainder).
+    The sampled records are returned in the order of the stream.
+    """
+
+    def __init__(
+        self,
+        sample_size: int,
+        seed: Optional[int] = None,
+        stratify_by: Optional[str] = None,
+    ):
+        """
+
+        Args:
+            sample_size (int): Number of records to sample.
+            seed (Optional[int], optional): Seed of the random generator. Defaults to None.
+            stratify_by (Optional[str], optional): Column to stratify the sample by. Defaults to None.
+        """
+        self.sample_size = sample_size
+        self.stratify_by = stratify_by
+        self.num_records = 0
+        self._random = random.Random(seed)
+        self._reservoirs: Dict[Hashable, List[Tuple[int, Dict[str, Any]]]] = {}
+        self._counts: Dict[Hashable, int] = {}
+
+    def add(self, records: Iterable[Dict[str, Any]]) -> None:
+        for record in records:
+            stratum = (
+                record.get(self.stratify_by) if self.stratify_by is not None else None
+            )
+            if not isinstance(stratum, Hashable):
+                stratum = str(stratum)
+            reservoir = self._reservoirs.setdefault(stratum, [])
+            count = self._counts.get(stratum, 0) + 1
+            self._counts[stratum] = count
+            if len(reservoir) < self.sample_size:
+                reservoir.append((self.num_records, record))
+            else:
+                # Algorithm R: keep the record with probability sample_size / count
+                position = self._random.randrange(count)
+                if position < self.sample_size:
+                    reservoir[position] = (self.num_records, record)
+            self.num_records += 1
+
+    def sample(self) -> List[Dict[str, Any]]:
+        """Returns the sampled records.
+
+        Returns:
+            List[Dict[str, Any]]: At most `sample_size` records, in the order they were added.
+        """
+        sample_size = min(self.sample_size, self.num_records)
+        shares = {
+            stratum: sample_size * count / self.num_records
+            for stratum, count in self._counts.items()
+        }
+        allocation = {stratum: int(share) for stratum, share in shares.items()}
+        remaining = sample_size - sum(allocation.values())
+        for stratum in sorted(
+            shares,
+            key=lambda stratum: shares[stratum] - allocation[stratum],
+            reverse=True,
+        )[:remaining]:
+            allocation[stratum] += 1
+
+        sampled = []
+        for stratum, reservoir in self._reservoirs.items():
+            # a random subset of a uniform sample is a uniform sample
+            sampled.extend(self._random.sample(reservoir, allocation[stratum]))
+        return [record for _, record in sorted(sampled, key=lambda item: item[0])]
+
+
+def sample_records(
+    records: Iterable[Dict[str, Any]],
+    sample_size: int,
+    seed: Optional[int] = None,
+    stratify_by: Optional[str] = None,
+) -> List[Dict[str, Any]]:
+    """Draws a (stratified) random sample of records, see `ReservoirSampler`.
+
+    Args:
+        records (Iterable[Dict[str, Any]]): Records to sample from.
+        sample_size (int): Number of records to sample.
+        seed (Optional[int], optional): Seed of the random generator. Defaults to None.
+        stratify_by (Optional[str], optional): Column to stratify the sample by. Defaults to None.
+
+    Returns:
+        List[Dict[str, Any]]: The sampled records, in their original order.
+    """
+    sampler = ReservoirSampler(sample_size, seed, stratify_by)
+    sampler.add(records)
+    return sampler.sample()
+
+
+@functools.lru_cache(maxsize=None)
+def load_tokenizer(tokenizer_package: str) -> "Language":
+    """Loads the spaCy pipeline of a project, downloading it if needed; it is loaded once per process.
+
+    Args:
+        tokenizer_package (str): Name of the spaCy package, as in the project details.
+
+    Returns:
+        Language: the spaCy pipeline.
+    """
+    import spacy
+
+    if not spacy.util.is_package(tokenizer_package):
+        spacy.cli.download(tokenizer_package)
+    return spacy.load(tokenizer_package)
+
+
+def tokenize_df(
+    df: pd.DataFrame,
+    project_details: Dict[str, Any],
+    keep_attributes: Optional[List[str]] = None,
+) -> pd.DataFrame:
+    """Adds a `<attribute>__tokenized` column for each TEXT attribute using the project tokenizer.
+
+    Args:
+        df (pd.DataFrame): DataFrame containing the record data.
+        project_details (Dict[str, Any]): project details as returned by the API.
+        keep_attributes (Optional[List[str]], optional): If set, only attributes whose tokenized column is kept are tokenized. Defaults to None.
+
+    Returns:
+        pd.DataFrame: DataFrame with the tokenized columns.
+    """
+    from tqdm import tqdm
+
+    tokenize_attributes = [
+        attribute
+        for attribute in get_tokenize_attributes(project_details, keep_attributes)
+        if attribute in df.columns
+    ]
+
+    if len(tokenize_attributes) > 0:
+        tokenizer_package = project_details["tokenizer"]
+        nlp = load_tokenizer(tokenizer_package)
+
+        msg.info(f"Tokenizing data with spaCy '{tokenizer_package}'.")
+        msg.info(
+            "This will be provided from the server in future versions of refinery."
+        )
+
+        tqdm.pandas(desc="Applying tokenization locally")
+        for attribute in tokenize_attributes:
+            df[f"{attribute}__tokenized"] = df[attribute].progress_apply(
+                lambda x: nlp(x)
+            )
+
+    else:
+        msg.warn("There are no attributes that can be tokenized in this project.")
+    return df
+
+
+def get_string_dtype() -> str:
+    try:
+        import pyarrow  # noqa: F401
+
+        return "string[pyarrow]"
+    except ImportError:
+        return "string"
+
+
+def is_label_column(name: str) -> bool:
+    return name.endswith(LABEL_SUFFIXES)
+
+
+def _downcast_float(column: pd.Series) -> pd.Series:
+    # float32 is only used if it keeps every value, e.g. not for 1.123456789
+    column = pd.to_numeric(column)
+    downcast = pd.to_numeric(column, downcast="float")
+    if downcast.dtype != column.dtype and not column.equals(
+        downcast.astype(column.dtype)
+    ):
+        return column
+    return downcast
+
+
+def optimize_dtypes(df: pd.DataFrame, project_details: Dict[str, Any]) -> pd.DataFrame:
+    """Converts the columns of an export to memory-efficient dtypes.
+
+    Classification label columns become categoricals, confidences float32, TEXT
+    attributes (Arrow-backed) strings and numeric attributes are downcast, based on
+    the `data_type` of the attributes; FLOAT attributes (and INTEGER attributes with
+    nulls) only become float32 if no precision is lost. Token-level label columns are
+    left unchanged.
+
+    Args:
+        df (pd.DataFrame): DataFrame containing the record data.
+        project_details (Dict[str, Any]): project details as returned by the API.
+
+    Returns:
+        pd.DataFrame: DataFrame with converted columns.
+    """
+    data_types = {
+        attribute["name"]: attribute["data_type"]
+        for attribute in project_details["attributes"]
+    }
+    string_dtype = get_string_dtype()
+    df = df.copy()
+    for name in df.columns:
+        column = df[name]
+        data_type = data_types.get(name)
+        if data_type == "TEXT":
+            df[name] = column.astype(string_dtype)
+        elif data_type == "CATEGORY":
+            df[name] = column.astype("category")
+        elif data_type == "INTEGER":
+            if column.notna().all():
+                df[name] = pd.to_numeric(column, downcast="integer")
+            else:
+                df[name] = _downcast_float(column)
+        elif name.endswith(CONFIDENCE_SUFFIX):
+            df[name] = pd.to_numeric(column, downcast="float")
+        elif data_type == "FLOAT":
+            df[name] = _downcast_float(column)
+        elif data_type == "BOOLEAN":
+            df[name] = column.astype("boolean")
+        elif is_label_column(name):
+            values = column.dropna()
+            # token-level labels are lists and can't be categorical
+            if len(values) == 0 or isinstance(values.iloc[0], str):
+                df[name] = column.astype("category")
+    return df
+
+
+def build_export_df(
+    api_response: List[Dict[str, Any]],
+    project_details: Dict[str, Any],
+    tokenize: Optional[bool] = True,
+    keep_attributes: Optional[List[str]] = None,
+    dropna: Optional[bool] = False,
+    download_to: Optional[str] = None,
+    instrumentation: Instrumentation = NOOP,
+    optimize_memory: Optional[bool] = False,
+) -> pd.DataFrame:
+    """Builds the export DataFrame from the raw export response.
+
+    Args:
+        api_response (List[Dict[str, Any]]): records as returned by the export endpoint.
+        project_details (Dict[str, Any]): project details as returned by the API.
+        tokenize (Optional[bool], optional): If True, TEXT attributes are tokenized with the project tokenizer. Defaults to True.
+        keep_attributes (Optional[List[str]], optional): If set, only these columns are kept. This is applied locally as well, in case the server ignored the projection. Defaults to None.
+        dropna (Optional[bool], optional): If True, rows containing null values are dropped, also applied locally. Defaults to False.
+        download_to (Optional[str], optional): If set, the DataFrame is stored as JSON to this path. Defaults to None.
+        instrumentation (Instrumentation, optional): Receives the timings of the processing stages. Defaults to NOOP.
+        optimize_memory (Optional[bool], optional): If True, columns are converted to memory-efficient dtypes, see `optimize_dtypes`. Defaults to False.
+
+    Returns:
+        pd.DataFrame: DataFrame containing the record data.
+    """
+    with instrumentation.stage("export.dataframe", num_records=len(api_response)):
+        df = pd.DataFrame(api_response)
+
+    if tokenize:
+        with instrumentation.stage("export.tokenize", num_records=len(df)):
+            df = tokenize_df(df, project_details, keep_attributes)
+
+    with instrumentation.stage("export.filter"):
+        if keep_attributes is not None:
+            df = df[keep_attributes]
+
+        if dropna:
+            df = df.dropna()
+
+    if optimize_memory:
+        with instrumentation.stage("export.optimize_dtypes"):
+            df = optimize_dtypes(df, project_details)
+
+    if download_to is not None:
+        with instrumentation.stage("export.download"):
+            df.to_json(download_to, orient="records")
+        msg.good(f"Downloaded export to {download_to}")
+    return df
@@ -0,0 +1,174 @@
+# -*- coding: utf-8 -*-
+import datetime
+import decimal
+import json
+import os
+from typing import Any, Dict, Iterator, List, Optional
+from refinery import exceptions, settings
+
+STREAMING_FILE_EXTENSIONS = (".jsonl", ".ndjson", ".csv", ".parquet")
+# columns of these types (as inferred by pandas) are serializable as they are
+JSON_INFERRED_TYPES = ("string", "integer", "floating", "boolean", "empty")
+
+
+def is_streamable(path: str) -> bool:
+    return path.lower().endswith(STREAMING_FILE_EXTENSIONS)
+
+
+def get_data_types(project_details: Dict[str, Any]) -> Dict[str, str]:
+    return {
+        attribute["name"]: attribute["data_type"]
+        for attribute in project_details["attributes"]
+    }
+
+
+def should_stream(
+    path: str,
+    import_file_options: str = "",
+    data_types: Optional[Dict[str, str]] = None,
+) -> bool:
+    """Decides whether a file is imported via the JSON endpoint instead of object storage.
+
+    Small files skip the credential exchange, upload and polling of the object storage
+    route; import options are only interpreted by the server, so they require it. Files
+    are only streamed if the project has attributes: the first import of a project stays
+    on the object storage route, where the server infers the attributes, and CSV values
+    can be converted to the `data_type` of their attribute.
+
+    Args:
+        path (str): Path to the file to import.
+        import_file_options (str, optional): Options for the Pandas import on the server. Defaults to "".
+        data_types (Optional[Dict[str, str]], optional): `data_type` per attribute of the project. Defaults to None.
+
+    Returns:
+        bool: True if the file should be streamed to the JSON endpoint.
+    """
+    if not data_types:
+        return False
+    return (
+        is_streamable(path)
+        and not import_file_options
+        and os.path.getsize(path) <= settings.STREAMING_IMPORT_MAX_FILE_SIZE
+    )
+
+
+def iter_record_batches(
+    path: str,
+    batch_size: int = settings.BATCH_SIZE_DEFAULT,
+    data_types: Optional[Dict[str, str]] = None,
+) -> Iterator[List[Dict[str, Any]]]:
+    """Reads a JSON Lines, CSV or Parquet file incrementally in batches of records.
+
+    Only one batch is held in memory at a time. CSV values are read as strings and only
+    converted for INTEGER, FLOAT and BOOLEAN attributes, so e.g. leading zeros of TEXT
+    attributes are kept; values that can't be converted are kept as strings. Dates,
+    timestamps and decimals (e.g. of Parquet files) are sent as ISO strings and floats.
+
+    Args:
+        path (str): Path to the file.
+        batch_size (int, optional): Number of records per batch. Defaults to 1000.
+        data_types (Optional[Dict[str, str]], optional): `data_type` per attribute of the project, used to convert CSV values. Defaults to None; in that case, all CSV values are strings.
+
+    Raises:
+        FileImportError: If the file type is not supported.
+
+    Yields:
+        List[Dict[str, Any]]: Batches of records.
+    """
+    extension = os.path.splitext(path)[1].lower()
+    if extension in (".jsonl", ".ndjson"):
+        yield from _iter_json_lines(path, batch_size)
+    elif extension == ".csv":
+        yield from _iter_csv(path, batch_size, data_types or {})
+    elif extension == ".parquet":
+        yield from _iter_parquet(path, batch_size)
+    else:
+        raise exceptions.FileImportError(
+            f"Files of type {extension} can't be streamed; supported are {', '.join(STREAMING_FILE_EXTENSIONS)}."
+        )
+
+
+def _iter_json_lines(path: str, batch_size: int) -> Iterator[List[Dict[str, Any]]]:
+    batch = []
+    with open(path, "r", encoding="utf-8") as file:
+        for line in file:
+            if not line.strip():
+                continue
+            batch.append(json.loads(line))
+            if len(batch) == batch_size:
+                yield batch
+                batch = []
+    if batch:
+        yield batch
+
+
+def _iter_csv(
+    path: str, batch_size: int, data_types: Dict[str, str]
+) -> Iterator[List[Dict[str, Any]]]:
+    import pandas as pd
+
+    # pandas' type inference would e.g. turn the TEXT "01234" into the integer 1234
+    with pd.read_csv(
+        path, chunksize=batch_size, dtype=str, keep_default_na=False, na_values=[""]
+    ) as reader:
+        for chunk in reader:
+            for name in chunk.columns:
+                data_type = data_types.get(name)
+                if data_type in ("INTEGER", "FLOAT", "BOOLEAN"):
+                    chunk[name] = _convert_csv_column(chunk[name], data_type)
+            yield _df_to_records(chunk)
+
+
+def _convert_csv_column(column, data_type: str):
+    import pandas as pd
+
+    is_null = column.isna()
+    if data_type == "BOOLEAN":
+        converted = column.str.lower().map({"true": True, "false": False})
+    else:
+        converted = pd.to_numeric(column, errors="coerce")
+        if data_type == "INTEGER":
+            is_whole = converted.notna() & (converted % 1 == 0)
+            converted = converted.where(is_whole).astype("Int64")
+    converted = converted.astype(object)
+    # values that don't fit the data type are kept, so that validation reports them
+    return converted.where(converted.notna() | is_null, column)
+
+
+def _iter_parquet(path: str, batch_size: int) -> Iterator[List[Dict[str, Any]]]:
+    try:
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise exceptions.FileImportError(
+            "Streaming Parquet files requires pyarrow; install it via `pip install pyarrow`."
+        )
+
+    parquet_file = pq.ParquetFile(path)
+    for record_batch in parquet_file.iter_batches(batch_size=batch_size):
+        yield _df_to_records(record_batch.to_pandas())
+
+
+def _to_json_value(value: Any) -> Any:
+    # pd.Timestamp is a datetime
+    if isinstance(value, (datetime.datetime, datetime.date, datetime.time)):
+        return value.isoformat()
+    if isinstance(value, decimal.Decimal):
+        return float(value)
+    if hasattr(value, "tolist"):
+        # numpy scalars and arrays, e.g. list columns of Parquet files
+        return value.tolist()
+    if isinstance(value, datetime.timedelta):
+        return str(value)
+    return value
+
+
+def _df_to_records(df) -> List[Dict[str, Any]]:
+    import pandas as pd
+
+    is_null = df.isna()
+    df = df.astype(object)
+    for name in df.columns:
+        if pd.api.types.infer_dtype(df[name], skipna=True) not in JSON_INFERRED_TYPES:
+            df[name] = df[name].map(_to_json_value, na_action="ignore")
+    # NaN isn't valid JSON, missing values are sent as null
+    return df.astype(object).where(~is_null, None).to_dict(orient="records")
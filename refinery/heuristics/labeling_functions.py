@@ -0,0 +1,207 @@
+# -*- coding: utf-8 -*-
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import TYPE_CHECKING, Any, Callable, Dict, List, NamedTuple, Optional, Tuple
+from wasabi import msg
+from refinery import Client
+
+if TYPE_CHECKING:
+    import numpy as np
+
+ABSTAIN = -1
+CHUNK_SIZE = 1000
+
+
+class LabelingFunctionResults(NamedTuple):
+    """Votes of labeling functions; `votes[i, j]` is the index into `labels` of function j on record i, or -1."""
+
+    votes: "np.ndarray"
+    labels: List[str]
+    function_names: List[str]
+    indices: List[Dict[str, Any]]
+    timings: Dict[str, float]
+
+
+# labeling functions of the worker processes, set once per process by the initializer
+_worker_functions: List[Callable] = []
+
+
+def _initialize_worker(labeling_functions: List[Callable]) -> None:
+    global _worker_functions
+    _worker_functions = labeling_functions
+
+
+def _apply_chunk(
+    records: List[Dict[str, Any]],
+) -> Tuple["np.ndarray", List[str], List[float]]:
+    return apply_labeling_functions(_worker_functions, records)
+
+
+def apply_labeling_functions(
+    labeling_functions: List[Callable], records: List[Dict[str, Any]]
+) -> Tuple["np.ndarray", List[str], List[float]]:
+    """Applies labeling functions to records.
+
+    Args:
+        labeling_functions (List[Callable]): Functions taking a record and returning a label or None to abstain.
+        records (List[Dict[str, Any]]): Records as returned by the export.
+
+    Returns:
+        Tuple[np.ndarray, List[str], List[float]]: Votes as indices into the labels (-1 for abstain), the labels, and the seconds spent in each function.
+    """
+    import numpy as np
+
+    votes = np.full((len(records), len(labeling_functions)), ABSTAIN, dtype=np.int32)
+    label_codes = {}
+    timings = []
+    for column, labeling_function in enumerate(labeling_functions):
+        started_at = time.perf_counter()
+        for row, record in enumerate(records):
+            label = labeling_function(record)
+            if label is not None:
+                votes[row, column] = label_codes.setdefault(label, len(label_codes))
+        timings.append(time.perf_counter() - started_at)
+    return votes, list(label_codes), timings
+
+
+def get_function_names(
+    labeling_functions: List[Callable], names: Optional[List[str]] = None
+) -> List[str]:
+    """Names the association set of each labeling function.
+
+    Args:
+        labeling_functions (List[Callable]): Labeling functions.
+        names (Optional[List[str]], optional): One name per function. Defaults to None; in that case, the `__name__` of each function is used (its repr for e.g. partials).
+
+    Raises:
+        ValueError: If the number of names doesn't match or names are duplicated (e.g. of several lambdas).
+
+    Returns:
+        List[str]: The names of the functions.
+    """
+    if names is None:
+        names = [
+            getattr(function, "__name__", repr(function))
+            for function in labeling_functions
+        ]
+    elif len(names) != len(labeling_functions):
+        raise ValueError(
+            f"Got {len(names)} names for {len(labeling_functions)} labeling functions."
+        )
+    duplicates = sorted({name for name in names if names.count(name) > 1})
+    if duplicates:
+        raise ValueError(
+            f"Labeling function names must be unique, as each is posted as its own association set; duplicated: {', '.join(duplicates)}. Pass `names` to name them."
+        )
+    return list(names)
+
+
+def run_labeling_functions(
+    client: Client,
+    label_task_name: str,
+    labeling_functions: List[Callable],
+    keep_attributes: Optional[List[str]] = None,
+    num_workers: Optional[int] = None,
+    post: bool = True,
+    names: Optional[List[str]] = None,
+) -> LabelingFunctionResults:
+    """Runs labeling functions over the records of your project and posts their votes as heuristic associations.
+
+    The export is split into chunks of 1000 records which are labeled in a process pool;
+    the votes are collected in one integer array. Each function is posted as its own
+    association set, named after the function (or by `names`), in large coalesced batches.
+
+    Args:
+        client (Client): connected Client object for your project
+        label_task_name (str): name of the classification label task
+        labeling_functions (List[Callable]): functions taking a record (dict) and returning a label or None to abstain. They must be picklable (e.g. module-level functions) on platforms that spawn workers.
+        keep_attributes (Optional[List[str]], optional): if set, only these attributes are exported and passed to the functions. Defaults to None.
+        num_workers (Optional[int], optional): number of worker processes. Defaults to None; in that case, the number of CPUs is used.
+        post (bool, optional): if False, the votes are only returned. Defaults to True.
+        names (Optional[List[str]], optional): names of the association sets, one per function. Defaults to None; in that case, the names of the functions are used.
+
+    Raises:
+        ValueError: If the names of the functions are not unique.
+
+    Returns:
+        LabelingFunctionResults: votes, labels and the seconds spent in each function.
+    """
+    import numpy as np
+
+    # checked before the export, so that duplicated lambdas fail fast
+    function_names = get_function_names(labeling_functions, names)
+    primary_keys = client.get_primary_keys()
+    if keep_attributes is not None:
+        keep_attributes = primary_keys + [
+            name for name in keep_attributes if name not in primary_keys
+        ]
+    records = client.get_record_export(
+        tokenize=False, keep_attributes=keep_attributes
+    ).to_dict("records")
+    indices = [{key: record[key] for key in primary_keys} for record in records]
+
+    chunks = [
+        records[idx : idx + CHUNK_SIZE] for idx in range(0, len(records), CHUNK_SIZE)
+    ]
+    if num_workers is None:
+        num_workers = os.cpu_count() or 1
+    with client.instrumentation.stage(
+        "heuristics.labeling_functions", num_records=len(records)
+    ):
+        if num_workers <= 1 or len(chunks) <= 1:
+            results = [
+                apply_labeling_functions(labeling_functions, chunk) for chunk in chunks
+            ]
+        else:
+            with ProcessPoolExecutor(
+                max_workers=num_workers,
+                initializer=_initialize_worker,
+                initargs=(labeling_functions,),
+            ) as executor:
+                results = list(executor.map(_apply_chunk, chunks))
+
+    # every chunk has its own label codes, which are mapped to a common list
+    label_codes = {}
+    timings = np.zeros(len(labeling_functions))
+    vote_chunks = []
+    for chunk_votes, chunk_labels, chunk_timings in results:
+        mapping = np.array(
+            [label_codes.setdefault(label, len(label_codes)) for label in chunk_labels]
+            + [ABSTAIN],
+            dtype=np.int32,
+        )
+        # ABSTAIN (-1) indexes the last entry, which maps to itself
+        vote_chunks.append(mapping[chunk_votes])
+        timings += chunk_timings
+    labels = list(label_codes)
+    votes = (
+        np.concatenate(vote_chunks)
+        if vote_chunks
+        else np.empty((0, len(labeling_functions)), dtype=np.int32)
+    )
+    results = LabelingFunctionResults(
+        votes=votes,
+        labels=labels,
+        function_names=function_names,
+        indices=indices,
+        timings=dict(zip(function_names, timings.tolist())),
+    )
+
+    for name, seconds in sorted(
+        results.timings.items(), key=lambda item: item[1], reverse=True
+    ):
+        msg.info(f"{name}: {seconds:.3f}s")
+
+    if post:
+        with client.association_writer() as writer:
+            for column, name in enumerate(function_names):
+                (rows,) = np.nonzero(votes[:, column] != ABSTAIN)
+                writer.add(
+                    [[labels[votes[row, column]], 1.0] for row in rows],
+                    [indices[row] for row in rows],
+                    name,
+                    label_task_name,
+                    "heuristic",
+                )
+    return results
@@ -0,0 +1,282 @@
+# -*- coding: utf-8 -*-
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import TYPE_CHECKING, Any, Dict, Iterable, List, Optional, Sequence, Tuple
+from wasabi import msg
+from refinery import Client, exceptions
+from refinery.adapter.rasa import (
+    CONSTANT_LABEL_BEGIN,
+    CONSTANT_LABEL_INTERMEDIATE,
+    CONSTANT_OUTSIDE,
+)
+from refinery.export import TOKENIZED_SUFFIX, load_tokenizer
+
+if TYPE_CHECKING:
+    from spacy.language import Language
+
+CHUNK_SIZE = 1000
+
+
+class TokenAutomaton:
+    """Aho-Corasick automaton over token sequences, matching any number of terms in one pass.
+
+    Terms are matched on token boundaries only, so the states are tokens instead of
+    characters, which keeps the automaton small for lists with many terms.
+
+    Args:
+        terms (Iterable[Tuple[Sequence[str], str]]): Tokens of each term and its label. If a term occurs several times, its first label is kept.
+        case_sensitive (bool, optional): If False, tokens are compared in lower case. Defaults to False.
+    """
+
+    def __init__(
+        self, terms: Iterable[Tuple[Sequence[str], str]], case_sensitive: bool = False
+    ):
+        self.case_sensitive = case_sensitive
+        self.transitions: List[Dict[str, int]] = [{}]
+        # (number of tokens, label) of the longest term ending in a state
+        self.outputs: List[Optional[Tuple[int, str]]] = [None]
+        self.fail: List[int] = [0]
+        # next state on the fail path which has an output
+        self.output_links: List[int] = [0]
+        for tokens, label in terms:
+            self.__add_term(tokens, label)
+        self.__build_links()
+
+    def __normalize(self, token: str) -> str:
+        return token if self.case_sensitive else token.lower()
+
+    def __add_term(self, tokens: Sequence[str], label: str) -> None:
+        if len(tokens) == 0:
+            return
+        state = 0
+        for token in tokens:
+            token = self.__normalize(token)
+            next_state = self.transitions[state].get(token)
+            if next_state is None:
+                next_state = len(self.transitions)
+                self.transitions[state][token] = next_state
+                self.transitions.append({})
+                self.outputs.append(None)
+                self.fail.append(0)
+                self.output_links.append(0)
+            state = next_state
+        if self.outputs[state] is None:
+            self.outputs[state] = (len(tokens), label)
+
+    def __build_links(self) -> None:
+        queue = list(self.transitions[0].values())
+        idx = 0
+        while idx < len(queue):
+            state = queue[idx]
+            idx += 1
+            for token, next_state in self.transitions[state].items():
+                queue.append(next_state)
+                fail_state = self.fail[state]
+                while fail_state != 0 and token not in self.transitions[fail_state]:
+                    fail_state = self.fail[fail_state]
+                fail_state = self.transitions[fail_state].get(token, 0)
+                self.fail[next_state] = fail_state
+                self.output_links[next_state] = (
+                    fail_state
+                    if self.outputs[fail_state] is not None
+                    else self.output_links[fail_state]
+                )
+
+    def find(self, tokens: Sequence[str]) -> List[Tuple[int, int, str]]:
+        """Finds all occurrences of the terms.
+
+        Args:
+            tokens (Sequence[str]): Tokens of a text.
+
+        Returns:
+            List[Tuple[int, int, str]]: Start and end token index and label of each match.
+        """
+        matches = []
+        state = 0
+        for position, token in enumerate(tokens):
+            token = self.__normalize(token)
+            while state != 0 and token not in self.transitions[state]:
+                state = self.fail[state]
+            state = self.transitions[state].get(token, 0)
+            output_state = state if self.outputs[state] is not None else None
+            if output_state is None:
+                output_state = self.output_links[state] or None
+            while output_state is not None:
+                length, label = self.outputs[output_state]
+                matches.append((position - length + 1, position + 1, label))
+                output_state = self.output_links[output_state] or None
+        return matches
+
+    def tag(
+        self, tokens: Sequence[str], constant_outside: str = CONSTANT_OUTSIDE
+    ) -> List[str]:
+        """Labels the tokens of a text in the B-/I- format of token-level label tasks.
+
+        Overlapping matches are resolved leftmost-longest.
+
+        Args:
+            tokens (Sequence[str]): Tokens of a text.
+            constant_outside (str, optional): Label of tokens outside of any match. Defaults to "OUTSIDE".
+
+        Returns:
+            List[str]: One label per token.
+        """
+        labels = [constant_outside] * len(tokens)
+        end_of_last_match = 0
+        for start, end, label in sorted(
+            self.find(tokens), key=lambda match: (match[0], match[0] - match[1])
+        ):
+            if start < end_of_last_match:
+                continue
+            labels[start] = f"{CONSTANT_LABEL_BEGIN}{label}"
+            for idx in range(start + 1, end):
+                labels[idx] = f"{CONSTANT_LABEL_INTERMEDIATE}{label}"
+            end_of_last_match = end
+        return labels
+
+
+def build_automaton(
+    lookup_lists: List[Dict[str, Any]],
+    nlp: "Language",
+    case_sensitive: bool = False,
+) -> TokenAutomaton:
+    """Compiles lookup lists into one automaton; the name of each list is used as label.
+
+    Args:
+        lookup_lists (List[Dict[str, Any]]): Lookup lists as returned by `Client.get_lookup_lists`.
+        nlp (Language): spaCy pipeline of the project, used to tokenize the terms like the records.
+        case_sensitive (bool, optional): If False, terms match regardless of case. Defaults to False.
+
+    Returns:
+        TokenAutomaton: the automaton.
+    """
+    terms = []
+    labels = []
+    for lookup_list in lookup_lists:
+        for term in lookup_list["terms"]:
+            terms.append(term["value"])
+            labels.append(lookup_list["name"])
+    return TokenAutomaton(
+        (
+            ([token.text for token in doc], label)
+            for doc, label in zip(nlp.tokenizer.pipe(terms), labels)
+        ),
+        case_sensitive=case_sensitive,
+    )
+
+
+# automaton of the worker processes, set once per process by the initializer
+_worker_automaton: Optional[TokenAutomaton] = None
+
+
+def _initialize_worker(automaton: TokenAutomaton) -> None:
+    global _worker_automaton
+    _worker_automaton = automaton
+
+
+def _tag_chunk(chunk: List[List[str]]) -> List[List[str]]:
+    return [_worker_automaton.tag(tokens) for tokens in chunk]
+
+
+def tag_texts(
+    automaton: TokenAutomaton,
+    tokenized_texts: List[List[str]],
+    num_workers: Optional[int] = None,
+) -> List[List[str]]:
+    """Tags tokenized texts, in a process pool if there is more than one worker.
+
+    Args:
+        automaton (TokenAutomaton): compiled lookup lists.
+        tokenized_texts (List[List[str]]): Tokens of each text.
+        num_workers (Optional[int], optional): Number of worker processes. Defaults to None; in that case, the number of CPUs is used.
+
+    Returns:
+        List[List[str]]: Labels of each text.
+    """
+    if num_workers is None:
+        num_workers = os.cpu_count() or 1
+    if num_workers <= 1 or len(tokenized_texts) <= CHUNK_SIZE:
+        return [automaton.tag(tokens) for tokens in tokenized_texts]
+
+    chunks = [
+        tokenized_texts[idx : idx + CHUNK_SIZE]
+        for idx in range(0, len(tokenized_texts), CHUNK_SIZE)
+    ]
+    # the automaton is sent once per worker instead of once per chunk
+    with ProcessPoolExecutor(
+        max_workers=num_workers,
+        initializer=_initialize_worker,
+        initargs=(automaton,),
+    ) as executor:
+        return [
+            labels for chunk in executor.map(_tag_chunk, chunks) for labels in chunk
+        ]
+
+
+def run_lookup_list_tagger(
+    client: Client,
+    text_name: str,
+    label_task_name: str,
+    name: str = "lookup_lists",
+    lookup_list_names: Optional[List[str]] = None,
+    case_sensitive: bool = False,
+    num_workers: Optional[int] = None,
+) -> int:
+    """Tags the lookup list terms in a text attribute and posts them as heuristic associations.
+
+    All lookup lists are compiled into a single Aho-Corasick automaton over tokens, so
+    each text is scanned once in linear time, no matter how many terms there are. The
+    label of a term is the name of its lookup list.
+
+    Args:
+        client (Client): connected Client object for your project
+        text_name (str): name of the TEXT attribute to tag
+        label_task_name (str): name of the token-level label task of the attribute
+        name (str, optional): name of the association set. Defaults to "lookup_lists".
+        lookup_list_names (Optional[List[str]], optional): if set, only these lookup lists are used. Defaults to None.
+        case_sensitive (bool, optional): if False, terms match regardless of case. Defaults to False.
+        num_workers (Optional[int], optional): number of processes tagging the texts. Defaults to None; in that case, the number of CPUs is used.
+
+    Raises:
+        exceptions.UnknownItemError: if a lookup list is not found.
+
+    Returns:
+        int: number of tagged records.
+    """
+    lookup_lists = client.get_lookup_lists()
+    if lookup_list_names is not None:
+        lookup_lists = [
+            lookup_list
+            for lookup_list in lookup_lists
+            if lookup_list["name"] in lookup_list_names
+        ]
+        missing = set(lookup_list_names) - {
+            lookup_list["name"] for lookup_list in lookup_lists
+        }
+        if missing:
+            raise exceptions.UnknownItemError(
+                f"Can't find lookup lists {sorted(missing)} in the project."
+            )
+
+    primary_keys = client.get_primary_keys()
+    tokenized_name = f"{text_name}{TOKENIZED_SUFFIX}"
+    df = client.get_record_export(
+        tokenize=True, keep_attributes=primary_keys + [tokenized_name]
+    )
+    # terms are split by the project tokenizer as well, so they align with the records;
+    # the pipeline was already loaded to tokenize the export
+    nlp = load_tokenizer(client.get_project_details()["tokenizer"])
+
+    with client.instrumentation.stage("heuristics.compile"):
+        automaton = build_automaton(lookup_lists, nlp, case_sensitive)
+    tokenized_texts = [[token.text for token in doc] for doc in df[tokenized_name]]
+    with client.instrumentation.stage("heuristics.tag", num_records=len(df)):
+        labels = tag_texts(automaton, tokenized_texts, num_workers)
+
+    indices = df[primary_keys].to_dict("records")
+    with client.association_writer() as writer:
+        writer.add(labels, indices, name, label_task_name, "heuristic")
+    msg.good(
+        f"Tagged {len(labels)} records with {len(automaton.transitions) - 1} lookup list states."
+    )
+    return len(labels)
@@ -0,0 +1,172 @@
+# -*- coding: utf-8 -*-
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+from typing import Any, Callable, Dict, List, NamedTuple
+
+
+class RequestEvent(NamedTuple):
+    method: str
+    url: str
+    status_code: int
+    latency: float  # seconds, including retries and backoff
+    bytes_sent: int
+    bytes_received: int
+    decode_time: float  # seconds spent decoding the JSON response
+    retries: int
+
+
+class StageEvent(NamedTuple):
+    name: str
+    duration: float  # seconds
+    attributes: Dict[str, Any]
+
+
+_NULL_CONTEXT = nullcontext()
+
+
+class Instrumentation:
+    """Hook interface for requests and processing stages of the SDK.
+
+    The base class does nothing and is the default of the `Client`; the SDK checks
+    `enabled` before taking any measurement, so the default adds no overhead.
+    Subclass it and override `on_request` and `on_stage` to collect metrics.
+    """
+
+    enabled: bool = False
+
+    def on_request(self, event: RequestEvent) -> None:
+        pass
+
+    def on_stage(self, event: StageEvent) -> None:
+        pass
+
+    def stage(self, name: str, **attributes):
+        """Context manager measuring the duration of a processing stage.
+
+        Args:
+            name (str): Name of the stage, e.g. "export.tokenize".
+            **attributes: Additional information about the stage, e.g. the number of records.
+        """
+        if not self.enabled:
+            return _NULL_CONTEXT
+        return self._measure_stage(name, attributes)
+
+    @contextmanager
+    def _measure_stage(self, name: str, attributes: Dict[str, Any]):
+        started_at = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.on_stage(
+                StageEvent(name, time.perf_counter() - started_at, attributes)
+            )
+
+
+NOOP = Instrumentation()
+
+
+class CallbackInstrumentation(Instrumentation):
+    """Forwards every request and stage event to a callback.
+
+    Args:
+        callback (Callable[[Any], None]): Called with each `RequestEvent` and `StageEvent`.
+    """
+
+    enabled = True
+
+    def __init__(self, callback: Callable[[Any], None]):
+        self.callback = callback
+
+    def on_request(self, event: RequestEvent) -> None:
+        self.callback(event)
+
+    def on_stage(self, event: StageEvent) -> None:
+        self.callback(event)
+
+
+class MetricsCollector(Instrumentation):
+    """Collects all events in memory and aggregates them via `summary()`. Thread-safe."""
+
+    enabled = True
+
+    def __init__(self):
+        self.requests: List[RequestEvent] = []
+        self.stages: List[StageEvent] = []
+        self._lock = threading.Lock()
+
+    def on_request(self, event: RequestEvent) -> None:
+        with self._lock:
+            self.requests.append(event)
+
+    def on_stage(self, event: StageEvent) -> None:
+        with self._lock:
+            self.stages.append(event)
+
+    def reset(self) -> None:
+        with self._lock:
+            self.requests = []
+            self.stages = []
+
+    def summary(self) -> Dict[str, Any]:
+        """Aggregates the collected events.
+
+        Returns:
+            Dict[str, Any]: Totals of the requests, and count, total and mean duration per stage.
+        """
+        with self._lock:
+            requests, stages = list(self.requests), list(self.stages)
+        stage_summary = {}
+        for event in stages:
+            entry = stage_summary.setdefault(event.name, {"count": 0, "total": 0.0})
+            entry["count"] += 1
+            entry["total"] += event.duration
+        for entry in stage_summary.values():
+            entry["mean"] = entry["total"] / entry["count"]
+        return {
+            "requests": {
+                "count": len(requests),
+                "latency": sum(event.latency for event in requests),
+                "bytes_sent": sum(event.bytes_sent for event in requests),
+                "bytes_received": sum(event.bytes_received for event in requests),
+                "decode_time": sum(event.decode_time for event in requests),
+                "retries": sum(event.retries for event in requests),
+            },
+            "stages": stage_summary,
+        }
+
+
+class OpenTelemetryInstrumentation(Instrumentation):
+    """Records requests and stages as OpenTelemetry spans.
+
+    Args:
+        tracer: An OpenTelemetry tracer, e.g. `opentelemetry.trace.get_tracer("refinery")`.
+    """
+
+    enabled = True
+
+    def __init__(self, tracer):
+        self.tracer = tracer
+
+    def on_request(self, event: RequestEvent) -> None:
+        end_time = time.time_ns()
+        span = self.tracer.start_span(
+            f"HTTP {event.method}",
+            start_time=end_time - int(event.latency * 1e9),
+            attributes={
+                "http.method": event.method,
+                "http.url": event.url,
+                "http.status_code": event.status_code,
+                "refinery.bytes_sent": event.bytes_sent,
+                "refinery.bytes_received": event.bytes_received,
+                "refinery.decode_time": event.decode_time,
+                "refinery.retries": event.retries,
+            },
+        )
+        span.end(end_time=end_time)
+
+    def stage(self, name: str, **attributes):
+        # spans are opened as current span, so requests of a stage become its children
+        return self.tracer.start_as_current_span(
+            name, attributes={f"refinery.{k}": v for k, v in attributes.items()}
+        )
@@ -0,0 +1,145 @@
+# -*- coding: utf-8 -*-
+from concurrent.futures import ThreadPoolExecutor
+from typing import TYPE_CHECKING, Any, Callable, Dict, List, Optional
+from wasabi import msg
+from refinery import Client, api_calls, exceptions, settings
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+
+class MultiProjectOrchestrator:
+    """Runs exports and imports of many projects concurrently from a single process.
+
+    All clients should share one connection pool (see `from_credentials`), which caps
+    the concurrent requests per server, also when a function sends requests from several
+    threads; the number of projects processed at the same time is capped by `max_workers`.
+
+    Args:
+        clients (List[Client]): Connected clients, one per project. Clients may point to different hosts.
+        max_workers (int, optional): Maximum number of projects processed concurrently. Defaults to 8.
+    """
+
+    def __init__(
+        self,
+        clients: List[Client],
+        max_workers: int = settings.MAX_CONCURRENCY_DEFAULT,
+    ):
+        self.clients = {client.project_id: client for client in clients}
+        if len(self.clients) != len(clients):
+            raise ValueError("Each project can only be given once.")
+        self.max_workers = max_workers
+
+    @classmethod
+    def from_credentials(
+        cls,
+        user_name: str,
+        password: str,
+        project_ids: List[str],
+        uri: str = settings.DEFAULT_URI,
+        max_workers: int = settings.MAX_CONCURRENCY_DEFAULT,
+        **client_kwargs,
+    ) -> "MultiProjectOrchestrator":
+        """Logs in once and creates clients for all projects sharing the login and one connection pool.
+
+        Args:
+            user_name (str): Your username (email) for the application.
+            password (str): The respective password.
+            project_ids (List[str]): The projects to work with.
+            uri (str, optional): Link to the host of the application. Defaults to "https://app.kern.ai".
+            max_workers (int, optional): Maximum number of projects processed concurrently. Defaults to 8.
+            **client_kwargs: Further arguments passed to the `Client`, e.g. `retry_policy`.
+
+        Returns:
+            MultiProjectOrchestrator: the orchestrator.
+        """
+        if "http_session" not in client_kwargs:
+            client_kwargs["http_session"] = api_calls.create_http_session(max_workers)
+        client = Client(user_name, password, project_ids[0], uri=uri, **client_kwargs)
+        clients = [client] + [
+            client.for_project(project_id) for project_id in project_ids[1:]
+        ]
+        return cls(clients, max_workers=max_workers)
+
+    def map(
+        self, fn: Callable[[Client], Any], project_ids: Optional[List[str]] = None
+    ) -> Dict[str, Any]:
+        """Applies a function to the client of each project concurrently.
+
+        Args:
+            fn (Callable[[Client], Any]): Function receiving the client of a project.
+            project_ids (Optional[List[str]], optional): Projects to process. Defaults to None; in that case, all projects are processed.
+
+        Raises:
+            exceptions.MultiProjectError: If the function failed for any project; it contains the errors and the results of all other projects.
+
+        Returns:
+            Dict[str, Any]: Results per project id.
+        """
+        if project_ids is None:
+            project_ids = list(self.clients)
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            futures = {
+                project_id: executor.submit(fn, self.clients[project_id])
+                for project_id in project_ids
+            }
+        results, errors = {}, {}
+        for project_id, future in futures.items():
+            error = future.exception()
+            if error is not None:
+                msg.fail(f"Project {project_id} failed: {error!r}")
+                errors[project_id] = error
+            else:
+                results[project_id] = future.result()
+        if errors:
+            raise exceptions.MultiProjectError(errors, results)
+        return results
+
+    def export_all(
+        self, project_ids: Optional[List[str]] = None, **export_kwargs
+    ) -> Dict[str, "pd.DataFrame"]:
+        """Collects the record exports of all projects concurrently.
+
+        Args:
+            project_ids (Optional[List[str]], optional): Projects to export. Defaults to None; in that case, all projects are exported.
+            **export_kwargs: Arguments passed to `Client.get_record_export`, e.g. `tokenize=False`.
+
+        Returns:
+            Dict[str, pd.DataFrame]: Exports per project id.
+        """
+        return self.map(
+            lambda client: client.get_record_export(**export_kwargs), project_ids
+        )
+
+    def import_all(self, records: Dict[str, List[Dict[str, Any]]]) -> Dict[str, Any]:
+        """Posts records to several projects concurrently.
+
+        Args:
+            records (Dict[str, List[Dict[str, Any]]]): Records to post per project id.
+
+        Returns:
+            Dict[str, Any]: Batch responses per project id.
+        """
+        return self.map(
+            lambda client: client.post_records(records[client.project_id]),
+            list(records),
+        )
+
+    def import_files(
+        self, paths: Dict[str, str], import_file_options: Optional[str] = ""
+    ) -> Dict[str, Any]:
+        """Imports files into several projects concurrently.
+
+        Args:
+            paths (Dict[str, str]): Path of the file to import per project id.
+            import_file_options (Optional[str], optional): Options for the Pandas import. Defaults to "".
+
+        Returns:
+            Dict[str, Any]: Results per project id.
+        """
+        return self.map(
+            lambda client: client.post_file_import(
+                paths[client.project_id], import_file_options
+            ),
+            list(paths),
+        )
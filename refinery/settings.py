@@ -1,11 +1,60 @@
 # -*- coding: utf-8 -*-
-BASE_URI: str
+import os
+import warnings
+
 DEFAULT_URI: str = "https://app.kern.ai"
+# deprecated: clients keep their own uri; set to the uri of the latest client for code
+# that still reads it
+BASE_URI: str = DEFAULT_URI
 
 BATCH_SIZE_DEFAULT: int = 1000
+MAX_CONCURRENCY_DEFAULT: int = 8
+EXPORT_PARTITION_SIZE_DEFAULT: int = 10000
+RECORDS_BATCH_SIZE_DEFAULT: int = 100
+RECORD_CACHE_SIZE_DEFAULT: int = 10000
+# smaller files are streamed to the JSON import instead of being uploaded to object storage
+STREAMING_IMPORT_MAX_FILE_SIZE: int = 50 * 1024**2
+VALIDATION_BATCH_SIZE_DEFAULT: int = 100000
+# record imports are throttled, so that large uploads don't overload the import endpoint
+IMPORT_MAX_CONCURRENCY_DEFAULT: int = 2
+IMPORT_BATCH_DELAY: float = 0.5
+
+RETRY_MAX_RETRIES_DEFAULT: int = 5
+RETRY_BACKOFF_FACTOR_DEFAULT: float = 0.5
+RETRY_MAX_BACKOFF_DEFAULT: float = 30.0
+RETRY_MAX_ELAPSED_TIME_DEFAULT: float = 120.0
+RETRY_STATUS_CODES_DEFAULT = (429, 500, 502, 503, 504)
+# status codes of requests the server rejected without processing them
+RETRY_UNPROCESSED_STATUS_CODES = (429, 503)
+
+ASSOCIATION_WRITER_MAX_RECORDS_DEFAULT: int = 1000
+ASSOCIATION_WRITER_MAX_BYTES_DEFAULT: int = 5 * 1024**2
+ASSOCIATION_WRITER_FLUSH_INTERVAL_DEFAULT: float = 5.0
+
+TOKEN_REFRESH_MARGIN: int = 60  # seconds before expiry at which a token is refreshed
+# seconds a delta export watermark is moved back, against clock skew and late commits
+WATERMARK_SAFETY_MARGIN: int = 300
+UPDATED_AT_FIELD: str = "updated_at"
+# added by refinery to every project, identifies records if no primary key is set
+RUNNING_ID_ATTRIBUTE: str = "running_id"
+
+
+def get_token_cache_dir() -> str:
+    cache_home = os.environ.get("XDG_CACHE_HOME", os.path.expanduser("~/.cache"))
+    return os.path.join(cache_home, "refinery", "tokens")
 
 
 def set_base_uri(uri: str):
+    """Deprecated: the URL helpers take the base uri as argument, and clients keep their own uri.
+
+    Args:
+        uri (str): Link to the host of the application.
+    """
+    warnings.warn(
+        "settings.set_base_uri is deprecated; pass the uri to the Client or the URL helpers instead.",
+        DeprecationWarning,
+        stacklevel=2,
+    )
     global BASE_URI
     BASE_URI = uri
 
@@ -22,41 +71,45 @@ def add_query_params(url: str, **kwargs) -> str:
     return url
 
 
-def get_authentication_url() -> str:
-    return f"{BASE_URI}/.ory/kratos/public/self-service/login/api"
+def get_authentication_url(base_uri: str) -> str:
+    return f"{base_uri}/.ory/kratos/public/self-service/login/api"
+
+
+def get_project_url(base_uri: str, project_id: str) -> str:
+    return f"{base_uri}/api/project/{project_id}"
 
 
-def get_project_url(project_id: str) -> str:
-    return f"{BASE_URI}/api/project/{project_id}"
+def get_lookup_list_url(base_uri: str, project_id: str, lookup_list_id: str) -> str:
+    return f"{get_project_url(base_uri, project_id)}/lookup_list/{lookup_list_id}"
 
 
-def get_lookup_list_url(project_id: str, lookup_list_id: str) -> str:
-    return f"{get_project_url(project_id)}/lookup_list/{lookup_list_id}"
+def get_records_url(base_uri: str, project_id: str) -> str:
+    return f"{get_project_url(base_uri, project_id)}/records"
 
 
-def get_records_url(project_id: str) -> str:
-    return f"{get_project_url(project_id)}/records"
+def get_export_url(base_uri: str, project_id: str) -> str:
+    return f"{get_project_url(base_uri, project_id)}/export"
 
 
-def get_export_url(project_id: str) -> str:
-    return f"{get_project_url(project_id)}/export"
+def get_label_statistics_url(base_uri: str, project_id: str) -> str:
+    return f"{get_project_url(base_uri, project_id)}/label_statistics"
 
 
-def get_import_file_url(project_id: str) -> str:
-    return f"{get_project_url(project_id)}/import_file"
+def get_import_file_url(base_uri: str, project_id: str) -> str:
+    return f"{get_project_url(base_uri, project_id)}/import_file"
 
 
-def get_import_json_url(project_id: str) -> str:
-    return f"{get_project_url(project_id)}/import_json"
+def get_import_json_url(base_uri: str, project_id: str) -> str:
+    return f"{get_project_url(base_uri, project_id)}/import_json"
 
 
-def get_associations_url(project_id: str) -> str:
-    return f"{get_project_url(project_id)}/associations"
+def get_associations_url(base_uri: str, project_id: str) -> str:
+    return f"{get_project_url(base_uri, project_id)}/associations"
 
 
-def get_base_config(project_id: str) -> str:
-    return f"{get_project_url(project_id)}/import/base_config"
+def get_base_config(base_uri: str, project_id: str) -> str:
+    return f"{get_project_url(base_uri, project_id)}/import/base_config"
 
 
-def get_task(project_id: str, task_id: str) -> str:
-    return f"{get_project_url(project_id)}/import/task/{task_id}"
+def get_task(base_uri: str, project_id: str, task_id: str) -> str:
+    return f"{get_project_url(base_uri, project_id)}/import/task/{task_id}"
@@ -0,0 +1,274 @@
+# -*- coding: utf-8 -*-
+import hashlib
+import json
+import sqlite3
+from typing import TYPE_CHECKING, Any, Dict, Iterable, List, Optional
+from refinery.util import build_record_key
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+KEY_COLUMN = "__key"
+HASH_COLUMN = "__hash"
+RECORDS_TABLE = "records"
+META_TABLE = "meta"
+# label columns are indexed, since adapters filter on them
+INDEXED_COLUMN_SUFFIXES = ("__MANUAL", "__WEAK_SUPERVISION")
+
+
+def quote_identifier(name: str) -> str:
+    return '"' + name.replace('"', '""') + '"'
+
+
+def hash_record(record: Dict[str, Any]) -> str:
+    content = json.dumps(record, sort_keys=True, default=str, ensure_ascii=False)
+    return hashlib.sha1(content.encode()).hexdigest()
+
+
+class Snapshot:
+    """Locally persisted copy of a project's records in a SQLite file, keyed on the primary keys.
+
+    Every attribute and label column of the export is stored in its own column; lists
+    (e.g. token-level labels) are stored as JSON. A content hash per record makes sure
+    that merging only writes records that actually changed. Primary key and label
+    columns are indexed, so filtering them with `select_df` doesn't scan all records.
+
+    Args:
+        path (str): Path of the SQLite file; it is created if it doesn't exist.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        self.connection.execute(
+            f"CREATE TABLE IF NOT EXISTS {META_TABLE} (key TEXT PRIMARY KEY, value TEXT)"
+        )
+        self.connection.execute(
+            f"CREATE TABLE IF NOT EXISTS {RECORDS_TABLE} "
+            f"({quote_identifier(KEY_COLUMN)} TEXT PRIMARY KEY, {quote_identifier(HASH_COLUMN)} TEXT)"
+        )
+        self.connection.commit()
+
+    def close(self) -> None:
+        self.connection.close()
+
+    def __enter__(self) -> "Snapshot":
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.close()
+
+    def get_meta(self, key: str) -> Optional[Any]:
+        row = self.connection.execute(
+            f"SELECT value FROM {META_TABLE} WHERE key = ?", (key,)
+        ).fetchone()
+        return json.loads(row[0]) if row is not None else None
+
+    def set_meta(self, key: str, value: Any) -> None:
+        self.connection.execute(
+            f"INSERT INTO {META_TABLE} (key, value) VALUES (?, ?) "
+            "ON CONFLICT(key) DO UPDATE SET value = excluded.value",
+            (key, json.dumps(value)),
+        )
+        self.connection.commit()
+
+    @property
+    def watermark(self) -> Optional[str]:
+        """Watermark of the last successful sync, None if the snapshot is empty."""
+        return self.get_meta("watermark")
+
+    @watermark.setter
+    def watermark(self, value: str) -> None:
+        self.set_meta("watermark", value)
+
+    @property
+    def primary_keys(self) -> Optional[List[str]]:
+        return self.get_meta("primary_keys")
+
+    @property
+    def columns(self) -> List[str]:
+        rows = self.connection.execute(f"PRAGMA table_info({RECORDS_TABLE})").fetchall()
+        return [row[1] for row in rows if row[1] not in (KEY_COLUMN, HASH_COLUMN)]
+
+    @property
+    def json_columns(self) -> List[str]:
+        return self.get_meta("json_columns") or []
+
+    def __len__(self) -> int:
+        return self.connection.execute(
+            f"SELECT COUNT(*) FROM {RECORDS_TABLE}"
+        ).fetchone()[0]
+
+    def merge(
+        self, records: Iterable[Dict[str, Any]], primary_keys: List[str]
+    ) -> Dict[str, int]:
+        """Inserts new records and updates changed ones; unchanged records are not written.
+
+        Args:
+            records (Iterable[Dict[str, Any]]): Records as returned by the export endpoint.
+            primary_keys (List[str]): Primary keys of the project.
+
+        Raises:
+            ValueError: If there are no primary keys, a record lacks one, or the snapshot is keyed on other primary keys.
+
+        Returns:
+            Dict[str, int]: Number of `received`, `changed` (inserted or updated) and `unchanged` records.
+        """
+        if not primary_keys:
+            # every record would get the same key and overwrite the previous one
+            raise ValueError("A snapshot needs at least one primary key.")
+        stored_primary_keys = self.primary_keys
+        if stored_primary_keys is None:
+            self.set_meta("primary_keys", primary_keys)
+        elif stored_primary_keys != primary_keys:
+            raise ValueError(
+                f"Snapshot is keyed on {stored_primary_keys}, but got {primary_keys}."
+            )
+
+        records = list(records)
+        columns = self.columns
+        json_columns = set(self.json_columns)
+        for record in records:
+            missing = [key for key in primary_keys if record.get(key) is None]
+            if missing:
+                raise ValueError(
+                    f"Record has no value for primary key(s) {', '.join(missing)}."
+                )
+            for name, value in record.items():
+                if name not in columns:
+                    self.connection.execute(
+                        f"ALTER TABLE {RECORDS_TABLE} ADD COLUMN {quote_identifier(name)}"
+                    )
+                    columns.append(name)
+                if isinstance(value, (list, dict)):
+                    json_columns.add(name)
+        self.set_meta("json_columns", sorted(json_columns))
+        for name in columns:
+            if name not in json_columns and (
+                name in primary_keys or name.endswith(INDEXED_COLUMN_SUFFIXES)
+            ):
+                self.create_index(name)
+
+        all_columns = [KEY_COLUMN, HASH_COLUMN] + columns
+        column_list = ", ".join(quote_identifier(name) for name in all_columns)
+        placeholders = ", ".join("?" for _ in all_columns)
+        updates = ", ".join(
+            f"{quote_identifier(name)} = excluded.{quote_identifier(name)}"
+            for name in all_columns[1:]
+        )
+        statement = (
+            f"INSERT INTO {RECORDS_TABLE} ({column_list}) VALUES ({placeholders}) "
+            f"ON CONFLICT({quote_identifier(KEY_COLUMN)}) DO UPDATE SET {updates} "
+            f"WHERE {RECORDS_TABLE}.{quote_identifier(HASH_COLUMN)} "
+            f"!= excluded.{quote_identifier(HASH_COLUMN)}"
+        )
+
+        def to_row(record: Dict[str, Any]) -> List[Any]:
+            row = [build_record_key(record, primary_keys), hash_record(record)]
+            for name in columns:
+                value = record.get(name)
+                if name in json_columns and value is not None:
+                    value = json.dumps(value, ensure_ascii=False)
+                row.append(value)
+            return row
+
+        changes_before = self.connection.total_changes
+        with self.connection:
+            self.connection.executemany(statement, (to_row(r) for r in records))
+        changed = self.connection.total_changes - changes_before
+        # keeps the statistics of the query planner up to date for the indexes
+        self.connection.execute("PRAGMA optimize")
+        return {
+            "received": len(records),
+            "changed": changed,
+            "unchanged": len(records) - changed,
+        }
+
+    def create_index(self, column: str) -> None:
+        """Creates an index on a column if it doesn't exist yet.
+
+        Args:
+            column (str): Name of the column.
+        """
+        self.connection.execute(
+            f"CREATE INDEX IF NOT EXISTS {quote_identifier(f'index_{column}')} "
+            f"ON {RECORDS_TABLE} ({quote_identifier(column)})"
+        )
+
+    def select_df(
+        self,
+        columns: Optional[List[str]] = None,
+        not_null: Optional[List[str]] = None,
+        is_null: Optional[List[str]] = None,
+        limit: Optional[int] = None,
+    ) -> "pd.DataFrame":
+        """Selects columns of the records matching null conditions, in the order the records were stored.
+
+        Args:
+            columns (Optional[List[str]], optional): Columns to select. Defaults to None; in that case, all columns are selected.
+            not_null (Optional[List[str]], optional): Columns that must have a value. Defaults to None.
+            is_null (Optional[List[str]], optional): Columns that must not have a value. Defaults to None.
+            limit (Optional[int], optional): Maximum number of records. Defaults to None.
+
+        Raises:
+            exceptions.UnknownItemError: If a column doesn't exist in the snapshot.
+
+        Returns:
+            pd.DataFrame: The selected records.
+        """
+        from refinery import exceptions
+
+        not_null = not_null or []
+        is_null = is_null or []
+        stored_columns = self.columns
+        for name in (columns or []) + not_null + is_null:
+            if name not in stored_columns:
+                raise exceptions.UnknownItemError(
+                    f"Can't find column '{name}' in the snapshot: {stored_columns}"
+                )
+
+        selection = (
+            ", ".join(quote_identifier(name) for name in columns)
+            if columns is not None
+            else "*"
+        )
+        conditions = [f"{quote_identifier(name)} IS NOT NULL" for name in not_null]
+        conditions += [f"{quote_identifier(name)} IS NULL" for name in is_null]
+        query = f"SELECT {selection} FROM {RECORDS_TABLE}"
+        if conditions:
+            query += " WHERE " + " AND ".join(conditions)
+        query += " ORDER BY rowid"
+        params = []
+        if limit is not None:
+            query += " LIMIT ?"
+            params.append(limit)
+        return self.query_df(query, params)
+
+    def to_df(self) -> "pd.DataFrame":
+        """Loads the snapshot into a DataFrame in the shape of `Client.get_record_export(tokenize=False)`.
+
+        Returns:
+            pd.DataFrame: DataFrame containing the stored records.
+        """
+        return self.query_df(f"SELECT * FROM {RECORDS_TABLE}")
+
+    def query_df(self, query: str, params: Iterable[Any] = ()) -> "pd.DataFrame":
+        """Runs a SQL query against the snapshot; the internal key and hash columns are dropped.
+
+        Args:
+            query (str): SQL query, e.g. `SELECT * FROM records WHERE ...`.
+            params (Iterable[Any], optional): Parameters of the query. Defaults to ().
+
+        Returns:
+            pd.DataFrame: Result of the query.
+        """
+        import pandas as pd
+
+        df = pd.read_sql_query(query, self.connection, params=tuple(params))
+        df = df.drop(columns=[KEY_COLUMN, HASH_COLUMN], errors="ignore")
+        for name in self.json_columns:
+            if name in df.columns:
+                df[name] = df[name].apply(
+                    lambda x: json.loads(x) if isinstance(x, str) else x
+                )
+        return df
@@ -0,0 +1,80 @@
+# -*- coding: utf-8 -*-
+from collections import Counter
+from typing import Any, Dict, Iterable
+
+MANUAL = "MANUAL"
+WEAK_SUPERVISION = "WEAK_SUPERVISION"
+# labels of model callbacks are not part of the record export, so they can only be
+# counted by the server
+LABEL_SOURCES = (MANUAL, WEAK_SUPERVISION)
+
+
+def get_label_columns(columns: Iterable[str]) -> Dict[str, Dict[str, str]]:
+    """Groups the label columns of an export by label task.
+
+    Args:
+        columns (Iterable[str]): Column names of an export.
+
+    Returns:
+        Dict[str, Dict[str, str]]: For each label task, the column of each label source.
+    """
+    label_columns = {}
+    for column in columns:
+        for source in LABEL_SOURCES:
+            suffix = f"__{source}"
+            if column.endswith(suffix):
+                label_task = column[: -len(suffix)]
+                label_columns.setdefault(label_task, {})[source] = column
+    return label_columns
+
+
+def compute_label_statistics(
+    records: Iterable[Dict[str, Any]], label_columns: Dict[str, Dict[str, str]]
+) -> Dict[str, Dict[str, Any]]:
+    """Counts the labels per label task and source, and how often manual and weakly supervised labels agree.
+
+    The records are consumed in a single pass and only the counters are kept. Token-level
+    labels of extraction tasks are not counted, and neither are labels of model callbacks,
+    as the export only contains manual and weakly supervised labels.
+
+    Args:
+        records (Iterable[Dict[str, Any]]): Records of an export; only the label columns are read.
+        label_columns (Dict[str, Dict[str, str]]): Label columns as returned by `get_label_columns`.
+
+    Returns:
+        Dict[str, Dict[str, Any]]: For each label task, the label counts per source and the agreement.
+    """
+    counts = {
+        label_task: {source: Counter() for source in columns}
+        for label_task, columns in label_columns.items()
+    }
+    num_compared = Counter()
+    num_agreed = Counter()
+    for record in records:
+        for label_task, columns in label_columns.items():
+            labels = {}
+            for source, column in columns.items():
+                label = record.get(column)
+                if label is None or isinstance(label, (list, dict)):
+                    continue
+                counts[label_task][source][label] += 1
+                labels[source] = label
+            if len(labels) == len(LABEL_SOURCES):
+                num_compared[label_task] += 1
+                num_agreed[label_task] += labels[MANUAL] == labels[WEAK_SUPERVISION]
+
+    return {
+        label_task: {
+            **{source: dict(counter) for source, counter in counts[label_task].items()},
+            "agreement": {
+                "compared": num_compared[label_task],
+                "agreed": num_agreed[label_task],
+                "rate": (
+                    num_agreed[label_task] / num_compared[label_task]
+                    if num_compared[label_task] > 0
+                    else None
+                ),
+            },
+        }
+        for label_task in label_columns
+    }
@@ -1,6 +1,7 @@
-import boto3
-from botocore.client import Config
-from typing import List, Dict, Any
+import json
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, List, Optional
 
 
 def s3_upload(
@@ -17,6 +18,10 @@ def s3_upload(
     Connects to the object storage with temporary credentials generated for the
     given user_id, project_id and bucket
     """
+    # boto3 is only needed for file imports, so it is not imported with the package
+    import boto3
+    from botocore.client import Config
+
     s3 = boto3.resource(
         "s3",
         endpoint_url=url,
@@ -44,3 +49,52 @@ def batch(records: List[Dict[str, Any]], batch_size: int):
     """
     for i in range(0, len(records), batch_size):
         yield records[i : i + batch_size]
+
+
+def build_record_key(record: Dict[str, Any], primary_keys: List[str]) -> str:
+    """Builds a hashable key of a record from its primary key values.
+
+    Args:
+        record (Dict[str, Any]): Record or index containing the primary keys.
+        primary_keys (List[str]): Primary keys of the project.
+
+    Returns:
+        str: The key.
+    """
+    return json.dumps([record.get(key) for key in primary_keys], default=str)
+
+
+class LRUCache:
+    """Thread-safe mapping that evicts the least recently used entry once `maxsize` is reached.
+
+    Args:
+        maxsize (int): Maximum number of entries.
+    """
+
+    def __init__(self, maxsize: int):
+        self.maxsize = maxsize
+        self.entries: "OrderedDict[Hashable, Any]" = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        with self.lock:
+            if key not in self.entries:
+                return None
+            self.entries.move_to_end(key)
+            return self.entries[key]
+
+    def put(self, key: Hashable, value: Any) -> None:
+        if self.maxsize <= 0:
+            return
+        with self.lock:
+            self.entries[key] = value
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.maxsize:
+                self.entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self.lock:
+            self.entries.clear()
+
+    def __len__(self) -> int:
+        return len(self.entries)
@@ -0,0 +1,249 @@
+# -*- coding: utf-8 -*-
+import numbers
+from typing import Any, Dict, Iterable, List, Optional, Union
+import numpy as np
+import pandas as pd
+from refinery import exceptions
+from refinery.export import CONFIDENCE_SUFFIX, is_label_column
+
+# number of offending records listed per problem
+MAX_EXAMPLES = 5
+
+
+def _format_examples(positions: np.ndarray, values: Optional[pd.Series] = None) -> str:
+    examples = []
+    if values is not None:
+        # plain Python values read better than numpy scalars
+        values = values.iloc[:MAX_EXAMPLES].tolist()
+    for idx, position in enumerate(positions[:MAX_EXAMPLES]):
+        if values is not None:
+            examples.append(f"record {position} ({values[idx]!r})")
+        else:
+            examples.append(f"record {position}")
+    if len(positions) > MAX_EXAMPLES:
+        examples.append("...")
+    return ", ".join(examples)
+
+
+def _is_text(column: pd.Series) -> np.ndarray:
+    if pd.api.types.is_string_dtype(column.dtype) and not column.dtype == object:
+        return np.ones(len(column), dtype=bool)
+    if pd.api.types.infer_dtype(column, skipna=True) in ("string", "empty"):
+        return np.ones(len(column), dtype=bool)
+    return column.map(lambda value: isinstance(value, str)).to_numpy(dtype=bool)
+
+
+def _is_number(column: pd.Series) -> np.ndarray:
+    if pd.api.types.is_bool_dtype(column.dtype):
+        return np.zeros(len(column), dtype=bool)
+    if pd.api.types.is_numeric_dtype(column.dtype) or pd.api.types.infer_dtype(
+        column, skipna=True
+    ) in ("integer", "floating", "mixed-integer-float", "empty"):
+        return np.ones(len(column), dtype=bool)
+    return column.map(
+        lambda value: isinstance(value, numbers.Number)
+        and not isinstance(value, (bool, np.bool_))
+    ).to_numpy(dtype=bool)
+
+
+def _is_integer(column: pd.Series) -> np.ndarray:
+    if pd.api.types.is_integer_dtype(column.dtype):
+        return np.ones(len(column), dtype=bool)
+    is_number = _is_number(column)
+    numeric = pd.to_numeric(column.where(is_number), errors="coerce").to_numpy(
+        dtype=float, na_value=np.nan
+    )
+    with np.errstate(invalid="ignore"):
+        return is_number & (np.mod(numeric, 1) == 0)
+
+
+def _is_boolean(column: pd.Series) -> np.ndarray:
+    if pd.api.types.is_bool_dtype(column.dtype):
+        return np.ones(len(column), dtype=bool)
+    return column.map(lambda value: isinstance(value, (bool, np.bool_))).to_numpy(
+        dtype=bool
+    )
+
+
+def _key_to_str(value: Any) -> str:
+    # a batch with nulls is inferred as float64, so the integer key 1 may arrive as 1.0
+    if isinstance(value, (float, np.floating)) and float(value).is_integer():
+        return str(int(value))
+    return str(value)
+
+
+TYPE_CHECKS = {
+    "TEXT": _is_text,
+    "CATEGORY": _is_text,
+    "INTEGER": _is_integer,
+    "FLOAT": _is_number,
+    "BOOLEAN": _is_boolean,
+}
+
+
+class SchemaValidator:
+    """Checks records against the attributes of a project before they are uploaded.
+
+    Batches are validated with vectorized checks as they are added, so files too large
+    for memory can be validated in a single pass; only a 64-bit hash of the primary key and
+    the position of each record are kept to find duplicates across batches. Problems are collected instead of
+    raised, so all of them can be reported at once.
+
+    Checks are:
+    - columns that are not attributes of the project (label columns are allowed)
+    - missing primary key columns and null primary keys
+    - values that don't match the `data_type` of their attribute (nulls are allowed)
+    - duplicated primary keys
+    """
+
+    def __init__(self, project_details: Dict[str, Any]):
+        """
+
+        Args:
+            project_details (Dict[str, Any]): project details as returned by the API.
+        """
+        self.data_types = {
+            attribute["name"]: attribute["data_type"]
+            for attribute in project_details["attributes"]
+        }
+        self.primary_keys = [
+            attribute["name"]
+            for attribute in project_details["attributes"]
+            if attribute["is_primary_key"]
+        ]
+        self.num_records = 0
+        self._problems: Dict[str, List[Any]] = {}
+        self._key_hashes: List[np.ndarray] = []
+        self._key_positions: List[np.ndarray] = []
+
+    def add(self, records: Union[List[Dict[str, Any]], pd.DataFrame]) -> None:
+        """Validates a batch of records.
+
+        Args:
+            records (Union[List[Dict[str, Any]], pd.DataFrame]): Records or DataFrame to validate.
+        """
+        df = records if isinstance(records, pd.DataFrame) else pd.DataFrame(records)
+        offset = self.num_records
+        self.num_records += len(df)
+        # projects without attributes get them from their first import
+        if not self.data_types or len(df) == 0:
+            return
+
+        for name in df.columns:
+            if name not in self.data_types and not (
+                is_label_column(name) or str(name).endswith(CONFIDENCE_SUFFIX)
+            ):
+                self.__report(
+                    f"unknown:{name}", f"Column '{name}' is not an attribute."
+                )
+
+        for name, data_type in self.data_types.items():
+            check = TYPE_CHECKS.get(data_type)
+            if name not in df.columns or check is None:
+                continue
+            column = df[name].reset_index(drop=True)
+            is_valid = check(column) | column.isna().to_numpy()
+            if not is_valid.all():
+                positions = np.flatnonzero(~is_valid)
+                self.__report(
+                    f"type:{name}",
+                    f"Column '{name}' ({data_type}): "
+                    + _format_examples(positions + offset, column.iloc[positions]),
+                    len(positions),
+                )
+
+        self.__add_primary_keys(df, offset)
+
+    def __add_primary_keys(self, df: pd.DataFrame, offset: int) -> None:
+        if not self.primary_keys:
+            return
+        missing = [name for name in self.primary_keys if name not in df.columns]
+        if missing:
+            self.__report(
+                "primary_key_columns",
+                f"Primary key column(s) {', '.join(missing)} missing.",
+            )
+            return
+
+        keys = df[self.primary_keys].reset_index(drop=True)
+        is_null = keys.isna().any(axis=1).to_numpy()
+        if is_null.any():
+            positions = np.flatnonzero(is_null)
+            self.__report(
+                "primary_key_null",
+                "Primary key is null: " + _format_examples(positions + offset),
+                len(positions),
+            )
+        # strings hash the same regardless of the dtype inferred for a batch
+        keys = keys[~is_null].apply(lambda column: column.map(_key_to_str))
+        self._key_hashes.append(
+            pd.util.hash_pandas_object(keys, index=False).to_numpy()
+        )
+        self._key_positions.append(np.flatnonzero(~is_null) + offset)
+
+    def __report(self, key: str, problem: str, count: int = 0) -> None:
+        # the first batch with a problem provides the examples, later ones the count
+        if key in self._problems:
+            self._problems[key][1] += count
+        else:
+            self._problems[key] = [problem, count]
+
+    def problems(self) -> List[str]:
+        """Collects the problems of all added batches, including duplicated primary keys.
+
+        Returns:
+            List[str]: Descriptions of the problems; empty if the records are valid.
+        """
+        problems = []
+        for problem, count in self._problems.values():
+            if count > 1:
+                problem = f"{problem} [{count} records]"
+            problems.append(problem)
+
+        if self._key_hashes:
+            hashes = np.concatenate(self._key_hashes)
+            order = np.argsort(hashes, kind="stable")
+            sorted_hashes = hashes[order]
+            is_duplicate = np.zeros(len(hashes), dtype=bool)
+            # every occurrence after the first of a key is a duplicate
+            is_duplicate[order[1:]] = sorted_hashes[1:] == sorted_hashes[:-1]
+            if is_duplicate.any():
+                positions = np.concatenate(self._key_positions)[is_duplicate]
+                problem = "Primary key is duplicated: " + _format_examples(positions)
+                if len(positions) > 1:
+                    problem = f"{problem} [{len(positions)} records]"
+                problems.append(problem)
+        return problems
+
+    def raise_for_problems(self) -> None:
+        """Raises if any added batch is invalid.
+
+        Raises:
+            exceptions.SchemaValidationError: Containing all problems.
+        """
+        problems = self.problems()
+        if problems:
+            raise exceptions.SchemaValidationError(problems, self.num_records)
+
+
+def validate_records(
+    record_batches: Iterable[Union[List[Dict[str, Any]], pd.DataFrame]],
+    project_details: Dict[str, Any],
+) -> int:
+    """Validates batches of records against the attributes of a project, see `SchemaValidator`.
+
+    Args:
+        record_batches (Iterable[Union[List[Dict[str, Any]], pd.DataFrame]]): Batches of records or DataFrames.
+        project_details (Dict[str, Any]): project details as returned by the API.
+
+    Raises:
+        exceptions.SchemaValidationError: Containing all problems, if any batch is invalid.
+
+    Returns:
+        int: Number of validated records.
+    """
+    validator = SchemaValidator(project_details)
+    for records in record_batches:
+        validator.add(records)
+    validator.raise_for_problems()
+    return validator.num_records
@@ -37,6 +37,7 @@ setup(
         "numpy",
         "pandas",
         "requests",
+        "aiohttp",
         "boto3",
         "botocore",
         "spacy",